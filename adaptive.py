@@ -0,0 +1,192 @@
+import math
+from bisect import bisect_left
+
+# Rasch difficulty assumed for a question before anyone has answered it
+LABEL_DIFFICULTY = {"easy": -1.0, "medium": 0.0, "hard": 1.0}
+
+# Observed answers outweigh the label prior after this many attempts
+PRIOR_ATTEMPTS = 10
+
+# Stop once the ability estimate is this precise. Each answer adds at most
+# 0.25 to the information (1 from the prior), so 0.6 takes 8 well-targeted
+# answers and fits in the default 10 questions; 0.5 would need 12
+TARGET_ERROR = 0.6
+MAX_QUESTIONS = 10
+
+# Ability below/above these maps to the Easy/Hard labels
+EASY_ABILITY = -0.5
+HARD_ABILITY = 0.5
+
+
+def probability(theta, b):
+    """Chance a player of ability `theta` answers an item of difficulty `b`"""
+    return 1 / (1 + math.exp(b - theta))
+
+
+def item_difficulty(label, attempts=0, correct=0):
+    """Rasch difficulty from the label prior and the observed answers
+
+    The label contributes PRIOR_ATTEMPTS pseudo-answers, so fresh
+    questions sit at their label's difficulty and move towards what
+    players actually do as answers come in.
+    """
+    prior = LABEL_DIFFICULTY.get(str(label).strip().lower(), 0.0)
+    p = (correct + PRIOR_ATTEMPTS * probability(0.0, prior)) / (attempts + PRIOR_ATTEMPTS)
+    return math.log((1 - p) / p)
+
+
+def ability_label(theta):
+    if theta < EASY_ABILITY:
+        return "Easy"
+    if theta > HARD_ABILITY:
+        return "Hard"
+    return "Medium"
+
+
+class AbilityEstimate:
+    """Running maximum a posteriori ability estimate with a N(0, 1) prior"""
+
+    def __init__(self, theta=0.0):
+        self.theta = theta
+        self.responses = []
+
+    def update(self, b, correct):
+        self.responses.append((b, bool(correct)))
+        theta = self.theta
+        # A few Newton steps are plenty, the previous estimate is close
+        for _ in range(10):
+            gradient = -theta
+            information = 1.0
+            for item_b, item_correct in self.responses:
+                p = probability(theta, item_b)
+                gradient += item_correct - p
+                information += p * (1 - p)
+            step = gradient / information
+            theta = max(-4.0, min(4.0, theta + step))
+            if abs(step) < 1e-4:
+                break
+        self.theta = theta
+        return theta
+
+    def standard_error(self):
+        information = 1.0
+        for b, _ in self.responses:
+            p = probability(self.theta, b)
+            information += p * (1 - p)
+        return 1 / math.sqrt(information)
+
+
+class ItemPool:
+    """Question ids sorted by difficulty for O(log n) nearest-item lookups"""
+
+    def __init__(self, items):
+        # items are (difficulty, question_id) pairs
+        items = sorted(items)
+        self.difficulties = [b for b, _ in items]
+        self.ids = [question_id for _, question_id in items]
+
+    @classmethod
+    def from_bank(cls, bank, topic):
+        """Pool reading the bank's difficulty index as needed, instead of loading the topic"""
+        return BankItemPool(bank, topic)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nearest(self, target, exclude=()):
+        """(question_id, difficulty) of the unused item closest to `target`"""
+        right = bisect_left(self.difficulties, target)
+        left = right - 1
+        # Walk outwards past items already used, which are few
+        while left >= 0 or right < len(self.ids):
+            if right >= len(self.ids) or (
+                left >= 0 and target - self.difficulties[left] <= self.difficulties[right] - target
+            ):
+                i, left = left, left - 1
+            else:
+                i, right = right, right + 1
+            if self.ids[i] not in exclude:
+                return self.ids[i], self.difficulties[i]
+        return None
+
+
+class BankItemPool:
+    """ItemPool over one topic's items in the bank, looked up with indexed queries
+
+    The nearest unused item is always among the len(exclude) + 1 closest
+    on one side of the target, so a pick reads a few rows of the
+    (topic, difficulty) index no matter how many questions the topic has.
+    """
+
+    def __init__(self, bank, topic):
+        self.bank = bank
+        self.topic = topic
+
+    def __len__(self):
+        return self.bank.count(self.topic)
+
+    def nearest(self, target, exclude=()):
+        """(question_id, difficulty) of the unused item closest to `target`"""
+        best = None
+        for b, question_id in self.bank.items_near(self.topic, target, len(exclude) + 1):
+            if question_id not in exclude and (best is None or abs(b - target) < abs(best[1] - target)):
+                best = (question_id, b)
+        return best
+
+
+class AdaptiveQuiz:
+    """Pick each next question at the player's current ability estimate
+
+    Under the Rasch model the most informative item is the one whose
+    difficulty equals the ability estimate, so each pick is a nearest
+    lookup in the pool. The quiz stops after `max_questions`, or earlier
+    once the estimate's standard error drops to `target_error`.
+
+    With items matched to the player, the defaults stop after 8 answers:
+
+    >>> pool = ItemPool([(0.0, i) for i in range(20)])
+    >>> bank = type("Bank", (), {"get": lambda self, ids: [{"id": i} for i in ids]})()
+    >>> quiz = AdaptiveQuiz(pool, bank)
+    >>> answers = 0
+    >>> while quiz.next_question() is not None:
+    ...     quiz.record(answers % 2 == 0)
+    ...     answers += 1
+    >>> answers, round(quiz.estimate.standard_error(), 2)
+    (8, 0.58)
+    """
+
+    def __init__(self, pool, bank, max_questions=MAX_QUESTIONS, min_questions=3, target_error=TARGET_ERROR):
+        self.pool = pool
+        self.bank = bank
+        self.max_questions = max_questions
+        self.min_questions = min_questions
+        self.target_error = target_error
+        self.estimate = AbilityEstimate()
+        self.asked = set()
+        self.current = None
+
+    def next_question(self):
+        """The next question dict, or None when the quiz is over"""
+        if self.finished():
+            return None
+        found = self.pool.nearest(self.estimate.theta, self.asked)
+        if found is None:
+            return None
+        question_id, b = found
+        self.asked.add(question_id)
+        self.current = b
+        questions = self.bank.get([question_id])
+        return questions[0] if questions else self.next_question()
+
+    def record(self, correct):
+        """Update the ability estimate with the answer to the current question"""
+        self.estimate.update(self.current, correct)
+
+    def finished(self):
+        answered = len(self.estimate.responses)
+        if answered >= self.max_questions or len(self.asked) >= len(self.pool):
+            return True
+        return answered >= self.min_questions and self.estimate.standard_error() <= self.target_error
+
+    def level(self):
+        return ability_label(self.estimate.theta)
@@ -0,0 +1,270 @@
+import re
+import threading
+import unicodedata
+from collections import OrderedDict, namedtuple
+
+ARTICLES = {"a", "an", "the"}
+
+NUMBER_WORDS = {
+    "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4",
+    "five": "5", "six": "6", "seven": "7", "eight": "8", "nine": "9",
+    "ten": "10", "eleven": "11", "twelve": "12", "twenty": "20",
+    "hundred": "100", "thousand": "1000",
+}
+
+# Acronyms players commonly type instead of the full answer
+ACRONYMS = {
+    "cpu": "central processing unit",
+    "gpu": "graphics processing unit",
+    "ram": "random access memory",
+    "rom": "read only memory",
+    "os": "operating system",
+    "ai": "artificial intelligence",
+    "ml": "machine learning",
+    "url": "uniform resource locator",
+    "html": "hypertext markup language",
+    "css": "cascading style sheets",
+    "http": "hypertext transfer protocol",
+    "sql": "structured query language",
+    "usa": "united states of america",
+    "uk": "united kingdom",
+    "un": "united nations",
+    "dna": "deoxyribonucleic acid",
+}
+
+# Local similarity at or above ACCEPT is correct, below REJECT is wrong,
+# anything in between is ambiguous and only a model can accept it
+ACCEPT_SCORE = 0.9
+REJECT_SCORE = 0.55
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+# Topics keep "+" and "#" so "C++" and "C#" don't collapse to "C"
+_TOPIC_PUNCTUATION = re.compile(r"[^\w\s+#]")
+
+Verdict = namedtuple("Verdict", "correct score method")
+
+
+def normalize_answer(text, keep_symbols=False):
+    """Lowercase, strip accents and punctuation, drop articles, unify numbers
+
+    With keep_symbols, "+" and "#" stay as part of the word, as topic
+    names need.
+    """
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    punctuation = _TOPIC_PUNCTUATION if keep_symbols else _PUNCTUATION
+    text = punctuation.sub(" ", text.lower())
+    words = [NUMBER_WORDS.get(w, w) for w in text.split() if w not in ARTICLES]
+    return " ".join(words)
+
+
+def numbers(text):
+    """The numeric words of a normalized answer"""
+    return [w for w in text.split() if w.isdigit()]
+
+
+def initials(text):
+    return "".join(word[0] for word in text.split())
+
+
+def expand_acronym(text):
+    """Full form of a known acronym, or the text unchanged"""
+    return ACRONYMS.get(text.replace(" ", ""), text)
+
+
+def token_set_similarity(a, b):
+    """Shared words as a share of the longer answer's words
+
+    Dividing by the longer answer keeps "paris" from fully matching
+    "paris france".
+    """
+    a_words, b_words = set(a.split()), set(b.split())
+    if not a_words or not b_words:
+        return 0.0
+    overlap = len(a_words & b_words)
+    return overlap / max(len(a_words), len(b_words))
+
+
+def edit_distance(a, b, limit=None):
+    """Levenshtein distance, or limit + 1 once it must exceed `limit`
+
+    With a limit only the diagonal band of width `limit` is computed.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is None:
+        limit = len(a)
+    if len(a) - len(b) > limit:
+        return limit + 1
+
+    too_far = limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        lo = max(1, i - limit)
+        hi = min(len(b), i + limit)
+        current = [too_far] * (len(b) + 1)
+        if lo == 1:
+            current[0] = i
+        best = current[lo - 1]
+        for j in range(lo, hi + 1):
+            cost = previous[j - 1] + (ca != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < best:
+                best = cost
+        if best > limit:
+            return too_far
+        previous = current
+    return min(previous[-1], too_far)
+
+
+def edit_similarity(a, b):
+    longest = max(len(a), len(b))
+    if not longest:
+        return 1.0
+    # Anything below REJECT_SCORE is treated the same, so stop early
+    limit = int(longest * (1 - REJECT_SCORE))
+    distance = edit_distance(a, b, limit)
+    if distance > limit:
+        return 0.0
+    return 1 - distance / longest
+
+
+def is_initials(short, full):
+    """Whether `short` spells the initials of a multi-word `full` answer"""
+    return len(short) >= 2 and " " not in short and " " in full and short == initials(full)
+
+
+def local_score(answer, expected):
+    """Similarity of two normalized answers between 0 and 1
+
+    A lone letter never passes as the initials of a one-word answer:
+
+    >>> local_score("p", "paris"), local_score("h", "hydrogen")
+    (0.0, 0.0)
+    >>> local_score("cpu", "central processing unit"), local_score("pu", "processing unit")
+    (1.0, 1.0)
+    """
+    if answer == expected:
+        return 1.0
+    if not answer or not expected:
+        return 0.0
+
+    answer_full = expand_acronym(answer)
+    expected_full = expand_acronym(expected)
+    if answer_full == expected_full:
+        return 1.0
+    # "cpu" for "central processing unit" and the other way round
+    if is_initials(answer, expected_full) or is_initials(expected, answer_full):
+        return 1.0
+
+    # "1944" is never a typo of "1945"
+    expected_numbers = numbers(expected_full)
+    if expected_numbers and numbers(answer_full) != expected_numbers:
+        return 0.0
+
+    score = token_set_similarity(answer_full, expected_full)
+    if score >= ACCEPT_SCORE:
+        return score
+    score = max(score, edit_similarity(answer_full, expected_full))
+    if score < ACCEPT_SCORE and " " in answer_full:
+        # Same words in a different order, possibly with typos
+        answer_sorted = " ".join(sorted(answer_full.split()))
+        expected_sorted = " ".join(sorted(expected_full.split()))
+        if answer_sorted != answer_full or expected_sorted != expected_full:
+            score = max(score, edit_similarity(answer_sorted, expected_sorted))
+    return score
+
+
+class AnswerChecker:
+    """Grade free-text answers locally, asking the model only when unsure
+
+    Answers are normalized and compared to every accepted answer with
+    acronym expansion, token-set and edit-distance similarity. Clear
+    matches and clear misses are decided locally; only scores between
+    REJECT_SCORE and ACCEPT_SCORE are sent to `backend`; without one, or
+    when it gives no clear reply, they count as wrong. Numbers in an
+    accepted answer must be matched exactly. Verdicts are cached by (question, normalized answer).
+    """
+
+    def __init__(self, backend=None, max_cached=10_000):
+        self.backend = backend
+        self.max_cached = max_cached
+        self._verdicts = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.checks = 0
+        self.cache_hits = 0
+        self.llm_calls = 0
+
+    def check(self, question, answer, accepted):
+        """Return a Verdict for `answer` against one or more accepted answers"""
+        if isinstance(accepted, str):
+            accepted = [accepted]
+        normalized = normalize_answer(answer)
+        key = (question, normalized)
+
+        with self._lock:
+            self.checks += 1
+            verdict = self._verdicts.get(key)
+            if verdict is not None:
+                self._verdicts.move_to_end(key)
+                self.cache_hits += 1
+                return verdict
+
+        score = max(local_score(normalized, normalize_answer(a)) for a in accepted)
+        if score >= ACCEPT_SCORE:
+            verdict = Verdict(True, score, "local")
+        elif score < REJECT_SCORE:
+            verdict = Verdict(False, score, "local")
+        else:
+            verdict = self._ask_model(question, answer, accepted, score)
+
+        with self._lock:
+            self._verdicts[key] = verdict
+            if len(self._verdicts) > self.max_cached:
+                self._verdicts.popitem(last=False)
+        return verdict
+
+    def is_correct(self, question, answer, accepted):
+        return self.check(question, answer, accepted).correct
+
+    def _ask_model(self, question, answer, accepted, score):
+        # Near misses like "Austria" for "Australia" need a model to be accepted
+        fallback = Verdict(False, score, "local")
+        if self.backend is None:
+            return fallback
+
+        prompt = f"""You are grading a quiz answer.
+Question: {question}
+Accepted answer(s): {"; ".join(accepted)}
+Player's answer: {answer}
+
+Is the player's answer correct, allowing for spelling mistakes and equivalent wording?
+Reply with only YES or NO."""
+
+        self.llm_calls += 1
+        try:
+            reply = self.backend.generate(prompt)
+        except Exception as e:
+            print(f"Answer check failed: {e}")
+            return fallback
+
+        words = reply.strip().upper().split()
+        if words and words[0].strip(".!") == "YES":
+            return Verdict(True, score, "llm")
+        if words and words[0].strip(".!") == "NO":
+            return Verdict(False, score, "llm")
+        return fallback
+
+    def stats(self):
+        return {
+            "checks": self.checks,
+            "cache_hits": self.cache_hits,
+            "llm_calls": self.llm_calls,
+            "cached": len(self._verdicts),
+        }
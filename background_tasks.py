@@ -0,0 +1,136 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Shared worker pool for generation work kept off the Tk event loop"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="quiz-worker")
+        return _executor
+
+
+class BackgroundTask:
+    """Run a producer on the worker pool and hand its results to the Tk loop
+
+    `func(*args)` may return any iterable (a list or a generator); each item
+    is queued as soon as it is produced. The Tk side drains the queue with
+    `after()` polling via attach(), so the UI thread never blocks.
+    Cancelling or timing out drops the in-flight request: the worker stops
+    at the next item and nothing it produces afterwards is delivered.
+    """
+
+    def __init__(self, func, *args, timeout=None, executor=None):
+        self.timeout = timeout
+        self.started_at = time.monotonic()
+        self.status = "running"
+        self.error = None
+        self.items_received = 0
+
+        self._queue = queue.Queue()
+        self._cancelled = threading.Event()
+        self._widget = None
+        self._after_id = None
+
+        executor = executor or get_executor()
+        self.future = executor.submit(self._run, func, args)
+
+    def _run(self, func, args):
+        iterator = None
+        try:
+            iterator = iter(func(*args))
+            for item in iterator:
+                if self._cancelled.is_set():
+                    break
+                self._queue.put(("item", item))
+        except Exception as e:
+            self._queue.put(("error", e))
+        finally:
+            if iterator is not None and hasattr(iterator, "close"):
+                iterator.close()
+            self._queue.put(("done", None))
+
+    def cancel(self):
+        """Stop delivering results and tell the worker to stop"""
+        if self.status == "running":
+            self.status = "cancelled"
+        self._cancelled.set()
+        self.detach()
+
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def timed_out(self):
+        return self.timeout is not None and self.elapsed() > self.timeout
+
+    def attach(self, widget, on_item, on_finish, interval=50):
+        """Poll for results from `widget`'s event loop
+
+        on_item(item) is called for every produced item and
+        on_finish(status, error) once with "done", "error" or "timeout".
+        """
+        self.detach()
+        self._widget = widget
+        self._on_item = on_item
+        self._on_finish = on_finish
+        self._interval = interval
+        self._schedule(0)
+
+    def detach(self):
+        """Stop polling without cancelling the worker"""
+        if self._widget is not None and self._after_id is not None:
+            try:
+                self._widget.after_cancel(self._after_id)
+            except Exception:
+                pass
+        self._widget = None
+        self._after_id = None
+
+    def _schedule(self, delay):
+        # Exactly one poll is ever pending, however often attach() is called
+        if self._after_id is not None:
+            self._widget.after_cancel(self._after_id)
+        self._after_id = self._widget.after(delay, self._poll)
+
+    def _poll(self):
+        widget = self._widget
+        self._after_id = None
+        if widget is None or self._cancelled.is_set():
+            return
+
+        while True:
+            try:
+                kind, value = self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "item":
+                self.items_received += 1
+                self._on_item(value)
+            elif kind == "error":
+                self.error = value
+            else:
+                self.status = "error" if self.error is not None and not self.items_received else "done"
+                self.detach()
+                self._on_finish(self.status, self.error)
+                return
+
+            # A callback may have detached, cancelled or re-attached us; a
+            # re-attach has already scheduled the poll that takes over
+            if self._widget is not widget or self._after_id is not None or self._cancelled.is_set():
+                return
+
+        if self.timed_out():
+            self.status = "timeout"
+            self._cancelled.set()
+            self.detach()
+            self._on_finish(self.status, self.error)
+            return
+
+        self._schedule(self._interval)
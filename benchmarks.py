@@ -0,0 +1,488 @@
+"""Offline benchmarks for parsing, generation and quiz UI transitions
+
+    python benchmarks.py                   # run and compare to the baseline
+    python benchmarks.py --save-baseline   # store this run as the new baseline
+    python benchmarks.py -k parse          # only benchmarks whose name contains "parse"
+    python benchmarks.py --import-profile quiz_game_1   # slowest imports of a module
+    python benchmarks.py --wire-report     # tokens and latency per question, JSON vs lines
+
+Everything runs against FakeBackend, so no network or API key is needed.
+The UI benchmarks need a display; on a headless machine run them under
+xvfb-run, otherwise they are skipped. A benchmark regresses when its
+median is more than `--tolerance` slower than the stored baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from llm_backends import FakeBackend, LatencyModel, estimate_tokens
+from question_parser import (IncrementalArrayParser, IncrementalLineParser, coerce_question,
+                             parse_line_questions, parse_questions, parse_response)
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baselines.json")
+DEFAULT_TOLERANCE = 0.25
+
+# Simulated model latency for the end-to-end benchmarks
+FAKE_LATENCY = LatencyModel(0.05, 0.01, "normal")
+
+# Simulated output speed for wire format comparisons: 16 characters
+# (about 4 tokens) every 4ms, roughly 1000 tokens per second
+TOKEN_CHUNK_SIZE = 16
+TOKEN_CHUNK_DELAY = 0.004
+
+BENCHMARKS = []
+
+
+class SkipBenchmark(Exception):
+    pass
+
+
+def benchmark(name, repeat=7, max_calls=10_000, min_time=0.2):
+    """Register a benchmark
+
+    The decorated function does any setup and returns the zero-argument
+    callable to time. Each of `repeat` rounds runs it until `min_time`
+    has passed (at most `max_calls` times) and records the mean call time.
+    """
+    def register(setup):
+        BENCHMARKS.append((name, setup, repeat, max_calls, min_time))
+        return setup
+    return register
+
+
+def measure(func, repeat, max_calls, min_time):
+    rounds = []
+    for _ in range(repeat):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            func()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time or calls >= max_calls:
+                break
+        rounds.append(elapsed / calls)
+    return {
+        "median": statistics.median(rounds),
+        "min": min(rounds),
+        "max": max(rounds),
+        "calls": calls,
+    }
+
+
+def fake_payload(num_questions, seed=0, wire_format="json"):
+    backend = FakeBackend(seed=seed, wire_format=wire_format)
+    return backend.render(backend.build_questions(f"exactly {num_questions} questions about Science with"))
+
+
+def malformed_payloads(num_questions, count=20, wire_format="json"):
+    # A fixed seed gives the same mix of truncated, wrapped, bad-item and trailing-comma payloads
+    backend = FakeBackend(seed=1, wire_format=wire_format)
+    return [
+        backend._corrupt(fake_payload(num_questions, seed=i, wire_format=wire_format))
+        for i in range(count)
+    ]
+
+
+# Response extraction and validation
+
+for _size in (5, 50, 500):
+    def _setup(size=_size):
+        text = fake_payload(size)
+        return lambda: parse_questions(text)
+    benchmark(f"parse.valid.{_size}")(_setup)
+
+    def _setup(size=_size):
+        payloads = malformed_payloads(size)
+        return lambda: [parse_questions(text) for text in payloads]
+    benchmark(f"parse.malformed.{_size}x20", max_calls=2000)(_setup)
+
+
+for _size in (5, 50, 500):
+    def _setup(size=_size):
+        text = fake_payload(size, wire_format="lines")
+        return lambda: parse_line_questions(text)
+    benchmark(f"parse.lines.{_size}")(_setup)
+
+    def _setup(size=_size):
+        payloads = malformed_payloads(size, wire_format="lines")
+        return lambda: [parse_line_questions(text) for text in payloads]
+    benchmark(f"parse.lines.malformed.{_size}x20", max_calls=2000)(_setup)
+
+
+@benchmark("topic.lookup.5000")
+def _topic_lookup():
+    from topic_index import TopicIndex
+    rng = random.Random(0)
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 10)))
+             for _ in range(3000)]
+    index = TopicIndex(" ".join(rng.sample(words, rng.randint(1, 3))) for _ in range(5000))
+    queries = [" ".join(rng.sample(words, 2)) for _ in range(50)] + ["pyhton programing"] * 50
+    index.lookup("warm up")
+    return lambda: [index.lookup(query) for query in queries]
+
+
+@benchmark("topic.novel.5000", max_calls=20)
+def _topic_novel():
+    from topic_index import TopicIndex
+    rng = random.Random(0)
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 10)))
+             for _ in range(3000)]
+    index = TopicIndex(" ".join(rng.sample(words, rng.randint(1, 3))) for _ in range(5000))
+    counter = iter(range(10 ** 9))
+    # 100 topics the index has never seen, each registered as it is looked up
+    return lambda: [index.canonical(f"{rng.choice(words)} {rng.choice(words)} {next(counter)}")
+                    for _ in range(100)]
+
+
+@benchmark("history.record.10000", repeat=5)
+def _history_record():
+    from play_history import PlayHistory
+    history = PlayHistory(tempfile.mkdtemp(prefix="quiz-history-"), compact_interval=None, fsync=False)
+
+    def run():
+        for i in range(10000):
+            history.record(f"player{i % 100}", i // 10, "Science", "Medium", i % 500, i % 4, i % 3 == 0, 2.5)
+        history.flush()
+    return run
+
+
+@benchmark("history.compact.100000", repeat=3, max_calls=3)
+def _history_compact():
+    from play_history import PlayHistory
+    history = PlayHistory(tempfile.mkdtemp(prefix="quiz-history-"), compact_interval=None, fsync=False)
+
+    def run():
+        for i in range(100000):
+            history.record(f"player{i % 1000}", i // 10, "Science", "Medium", i % 5000, i % 4, i % 3 == 0, 2.5)
+        history.flush()
+        history.compact()
+    return run
+
+
+@benchmark("leaderboard.record.10000", repeat=5)
+def _leaderboard_record():
+    from leaderboard import LeaderboardSet
+    boards = LeaderboardSet()
+    topics = ["Science", "History", "Geography"]
+    for i in range(50000):
+        boards.record(f"player{i}", topics[i % 3], "Medium", i % 40)
+
+    def run():
+        for i in range(10000):
+            boards.record(f"player{i * 7 % 50000}", topics[i % 3], "Hard", 3)
+            boards.top(10, "topic", topics[i % 3], "weekly")
+    return run
+
+
+@benchmark("parse.validate.500")
+def _validate():
+    items = json.loads(fake_payload(500))
+    return lambda: [coerce_question(item) for item in items]
+
+
+@benchmark("parse.stream.50")
+def _stream_parse():
+    text = fake_payload(50)
+    chunks = [text[i:i + 64] for i in range(0, len(text), 64)]
+
+    def run():
+        parser = IncrementalArrayParser()
+        for chunk in chunks:
+            parser.feed(chunk)
+    return run
+
+
+@benchmark("parse.lines.stream.50")
+def _line_stream_parse():
+    text = fake_payload(50, wire_format="lines")
+    chunks = [text[i:i + 64] for i in range(0, len(text), 64)]
+
+    def run():
+        parser = IncrementalLineParser()
+        for chunk in chunks:
+            parser.feed(chunk)
+        parser.close()
+    return run
+
+
+# End-to-end quiz creation against the fake model
+
+def fake_generator(seed, wire_format="json", chunk_size=64, chunk_delay=0.002):
+    from quiz_engine import QuizGenerator
+    backend = FakeBackend(latency=FAKE_LATENCY, chunk_size=chunk_size, chunk_delay=LatencyModel(chunk_delay),
+                          seed=seed, wire_format=wire_format)
+    return QuizGenerator(backend=backend, use_cache=False)
+
+
+@benchmark("generate.5", repeat=5, max_calls=5)
+def _generate_small():
+    generator = fake_generator(2)
+    return lambda: generator.generate_questions("Science", "Medium", 5, fallback=False)
+
+
+@benchmark("generate.stream.5", repeat=5, max_calls=5)
+def _generate_stream():
+    generator = fake_generator(3)
+    return lambda: list(generator.generate_questions_stream("Science", "Medium", 5))
+
+
+for _format in ("json", "lines"):
+    def _setup(wire_format=_format):
+        # Output-speed bound, so response size shows up as latency
+        generator = fake_generator(5, wire_format, TOKEN_CHUNK_SIZE, TOKEN_CHUNK_DELAY)
+        return lambda: list(generator.generate_questions_stream("Science", "Medium", 10))
+    benchmark(f"generate.stream.10.{_format}", repeat=3, max_calls=2)(_setup)
+
+
+@benchmark("generate.chunked.40", repeat=5, max_calls=3)
+def _generate_chunked():
+    from quiz_engine import LARGE_QUIZ_REQUESTS_PER_SECOND, LARGE_QUIZ_WORKERS
+    from rate_limiter import RateLimiter
+
+    generator = fake_generator(4)
+    # A fresh limiter per quiz, so the shared one doesn't throttle repeated runs
+    return lambda: list(generator.generate_questions_chunked(
+        "Science", "Medium", 40, fallback=False,
+        rate_limiter=RateLimiter(LARGE_QUIZ_REQUESTS_PER_SECOND, burst=LARGE_QUIZ_WORKERS)
+    ))
+
+
+# Cold start
+
+def python_command(*args):
+    return lambda: subprocess.run([sys.executable, *args], check=True, capture_output=True)
+
+
+@benchmark("startup.import.quiz_engine", repeat=5, max_calls=5)
+def _import_engine():
+    return python_command("-c", "import quiz_engine")
+
+
+@benchmark("startup.cli.bank_quiz", repeat=5, max_calls=5)
+def _cli_start():
+    # Time to the first question of a bank-served quiz, stdin closed right after
+    bank_path = os.path.join(tempfile.mkdtemp(), "bank.sqlite3")
+    from question_bank import QuestionBank
+    bank = QuestionBank(bank_path)
+    bank.add_questions(json.loads(fake_payload(50)), "Science", "Medium")
+    bank.close()
+
+    cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), "quiz_game_1.py")
+    env = dict(os.environ, QUIZ_BANK_PATH=bank_path)
+    return lambda: subprocess.run(
+        [sys.executable, cli, "-y", "--topic", "Science", "-n", "5"],
+        check=True, capture_output=True, stdin=subprocess.DEVNULL, env=env
+    )
+
+
+def import_profile(module, top=15):
+    """Slowest imports of `module` by cumulative time, from python -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    rows.sort(reverse=True)
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for cumulative_us, self_us, name in rows[:top]:
+        print(f"{cumulative_us / 1000:>10.1f}ms {self_us / 1000:>8.1f}ms  {name}")
+
+
+# Quiz UI transitions
+
+def quiz_window(num_questions=50):
+    import tkinter as tk
+    from quiz_game_3 import QuizGame
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        raise SkipBenchmark(f"no display ({e})")
+    questions = json.loads(fake_payload(num_questions))
+    game = QuizGame(root, questions, "Science", "Medium", on_complete=lambda results: None)
+    game.frame.pack(fill="both", expand=True)
+    root.update()
+    return root, game
+
+
+@benchmark("ui.load_question", max_calls=2000)
+def _load_question():
+    root, game = quiz_window()
+
+    def run():
+        game.current_question = (game.current_question + 1) % len(game.questions)
+        game.load_question()
+        root.update_idletasks()
+    return run
+
+
+@benchmark("ui.submit_answer", max_calls=2000)
+def _submit_answer():
+    root, game = quiz_window()
+
+    def run():
+        # Stay off the last question so the quiz never finishes
+        game.current_question = (game.current_question + 1) % (len(game.questions) - 1)
+        game.load_question()
+        game.selected_option.set(0)
+        game.submit_answer()
+        root.update_idletasks()
+    return run
+
+
+def wire_report(num_questions=10):
+    """Compare prompt/response tokens and simulated latency per question by wire format"""
+    print(f"{'format':<8} {'prompt tok':>11} {'response tok':>13} {'tok/question':>13} "
+          f"{'ms/question':>12} {'first question':>15} {'parse us/question':>18}")
+    for wire_format in ("json", "lines"):
+        generator = fake_generator(6, wire_format, TOKEN_CHUNK_SIZE, TOKEN_CHUNK_DELAY)
+        prompt_tokens = estimate_tokens(generator.build_prompt("Science", "Medium", num_questions))
+        payload = fake_payload(num_questions, wire_format=wire_format)
+        response_tokens = estimate_tokens(payload)
+        # Whole-response parse, as used without streaming
+        parse = measure(lambda: parse_response(payload, wire_format), 5, 1000, 0.05)["median"]
+
+        started = time.perf_counter()
+        first = None
+        count = 0
+        for _ in generator.generate_questions_stream("Science", "Medium", num_questions):
+            count += 1
+            if first is None:
+                first = time.perf_counter() - started
+        elapsed = time.perf_counter() - started
+
+        print(f"{wire_format:<8} {prompt_tokens:>11} {response_tokens:>13} "
+              f"{(prompt_tokens + response_tokens) / num_questions:>13.1f} "
+              f"{elapsed / max(count, 1) * 1000:>12.1f} {first * 1000:>13.1f}ms "
+              f"{parse / num_questions * 1e6:>18.1f}")
+
+
+def run_benchmarks(pattern=None):
+    results = {}
+    for name, setup, repeat, max_calls, min_time in BENCHMARKS:
+        if pattern and pattern not in name:
+            continue
+        try:
+            func = setup()
+        except SkipBenchmark as e:
+            print(f"{name:<28} skipped: {e}")
+            continue
+        result = measure(func, repeat, max_calls, min_time)
+        results[name] = result
+        print(f"{name:<28} {format_time(result['median']):>10}  (min {format_time(result['min'])})")
+    return results
+
+
+def format_time(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f}us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds:.2f}s"
+
+
+def machine_info():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    baseline = load_baseline(path) or {"benchmarks": {}}
+    baseline["machine"] = machine_info()
+    baseline["saved_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    baseline["benchmarks"].update(
+        {name: {"median": r["median"], "min": r["min"]} for name, r in results.items()}
+    )
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def compare(results, baseline, tolerance):
+    """Print a comparison table and return the names that regressed"""
+    if baseline.get("machine") != machine_info():
+        print("\nWarning: baseline was recorded on a different machine or Python version")
+
+    regressions = []
+    print(f"\n{'benchmark':<28} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in results.items():
+        stored = baseline["benchmarks"].get(name)
+        if stored is None:
+            print(f"{name:<28} {'-':>10} {format_time(result['median']):>10}      new")
+            continue
+        change = result["median"] / stored["median"] - 1
+        flag = ""
+        if change > tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<28} {format_time(stored['median']):>10} "
+              f"{format_time(result['median']):>10} {change:>+7.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline quiz benchmarks")
+    parser.add_argument("-k", dest="pattern", help="only run benchmarks whose name contains this")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown before a benchmark counts as a regression")
+    parser.add_argument("--json", dest="json_path", help="also write the raw results here")
+    parser.add_argument("--import-profile", metavar="MODULE", help="show the slowest imports of MODULE and exit")
+    parser.add_argument("--wire-report", action="store_true", help="compare the JSON and line wire formats and exit")
+    args = parser.parse_args()
+
+    if args.wire_report:
+        wire_report()
+        return 0
+
+    if args.import_profile:
+        import_profile(args.import_profile)
+        return 0
+
+    results = run_benchmarks(args.pattern)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"machine": machine_info(), "benchmarks": results}, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print("\nNo baseline yet, run with --save-baseline to create one")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
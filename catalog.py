@@ -0,0 +1,21 @@
+"""Topics and difficulties offered in the quiz setup screen
+
+catalog_warmer keeps the question bank stocked for every catalog entry,
+so these quizzes are served from the bank instead of waiting on a model.
+"""
+
+CATALOG_TOPICS = ["Python Programming", "Mathematics", "Science", "History", "Geography", "Literature"]
+
+DIFFICULTY_LEVELS = ["Easy", "Medium", "Hard"]
+
+_BY_KEY = {" ".join(topic.lower().split()): topic for topic in CATALOG_TOPICS}
+
+
+def catalog_topic(topic):
+    """The catalog spelling of `topic`, or None for custom topics"""
+    return _BY_KEY.get(" ".join(str(topic).lower().split()))
+
+
+def catalog_entries():
+    """Every (topic, difficulty) pair in the catalog"""
+    return [(topic, difficulty) for topic in CATALOG_TOPICS for difficulty in DIFFICULTY_LEVELS]
@@ -0,0 +1,408 @@
+"""Background worker keeping the question bank stocked for every catalog quiz
+
+    python catalog_warmer.py                       # run until interrupted
+    python catalog_warmer.py --once                # refill what is low, then exit
+    python catalog_warmer.py --backend fake --target 40 --watermark 20
+
+Every `--scan-interval` seconds each catalog (topic, difficulty) whose
+bank stock is under the low watermark gets a refill job. Jobs generate
+`--batch` questions at a time until the slot reaches `--target`. Model
+calls go through a rate limiter and an hourly token budget. Jobs and
+token usage are kept in SQLite, so a restarted worker picks up where the
+last one stopped.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import metrics
+from catalog import catalog_entries, catalog_topic
+from llm_backends import BackendError, LazyBackend, LLMBackend, estimate_tokens
+from question_bank import QuestionBank
+from quiz_engine import QuizGenerator
+from rate_limiter import RateLimiter
+from resilience import ResilientBackend, backoff_delay
+
+DEFAULT_WARMER_PATH = os.environ.get(
+    "QUIZ_WARMER_PATH",
+    os.path.join(os.path.expanduser("~"), ".quiz_catalog_warmer.sqlite3")
+)
+
+DEFAULT_TARGET_STOCK = 50
+DEFAULT_LOW_WATERMARK = 25
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_REQUESTS_PER_SECOND = 0.2
+DEFAULT_TOKENS_PER_HOUR = 200_000
+
+# Failed jobs wait between RETRY_BASE and RETRY_CAP seconds before retrying
+RETRY_BASE = 30.0
+RETRY_CAP = 30 * 60.0
+
+# Existing questions loaded into the duplicate index before refilling a topic
+DEDUP_SEED_QUESTIONS = 200
+
+
+class BudgetExhausted(BackendError):
+    """The token budget for the current window is used up"""
+
+
+class WarmJobQueue:
+    """Persistent refill jobs, one per catalog (topic, difficulty)
+
+    A job is pending, running or done. Enqueueing a slot that already has
+    a job only raises its priority, so repeated scans don't pile up
+    duplicates. With `recover`, jobs left running by a warmer that stopped
+    are made pending again when the queue is opened; only the warmer
+    itself should do that, not the apps that just enqueue refills.
+    """
+
+    def __init__(self, path=DEFAULT_WARMER_PATH, recover=False):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS warm_jobs (
+                topic TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                not_before REAL NOT NULL,
+                last_error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (topic, difficulty)
+            );
+            CREATE INDEX IF NOT EXISTS idx_warm_jobs_status ON warm_jobs (status, priority, updated_at);
+
+            CREATE TABLE IF NOT EXISTS token_usage (
+                at REAL NOT NULL,
+                tokens INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_token_usage_at ON token_usage (at);
+            """
+        )
+        if recover:
+            self._conn.execute("UPDATE warm_jobs SET status = 'pending' WHERE status = 'running'")
+        self._conn.commit()
+
+    def enqueue(self, topic, difficulty, priority=0):
+        """Ask for a refill of this slot; returns False for non-catalog topics"""
+        topic = catalog_topic(topic)
+        if topic is None:
+            return False
+        difficulty = str(difficulty).strip().capitalize()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO warm_jobs (topic, difficulty, priority, status, attempts, not_before, updated_at)
+                VALUES (?, ?, ?, 'pending', 0, 0, ?)
+                ON CONFLICT (topic, difficulty) DO UPDATE SET
+                    priority = MAX(priority, excluded.priority),
+                    attempts = CASE status WHEN 'done' THEN 0 ELSE attempts END,
+                    not_before = CASE status WHEN 'done' THEN 0 ELSE not_before END,
+                    status = CASE status WHEN 'running' THEN 'running' ELSE 'pending' END,
+                    updated_at = excluded.updated_at
+                """,
+                (topic, difficulty, priority, time.time())
+            )
+            self._conn.commit()
+        return True
+
+    def claim(self, now=None):
+        """Mark the most urgent due job running and return (topic, difficulty, attempts)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT topic, difficulty, attempts FROM warm_jobs
+                WHERE status = 'pending' AND not_before <= ?
+                ORDER BY priority DESC, updated_at LIMIT 1
+                """,
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE warm_jobs SET status = 'running', updated_at = ? WHERE topic = ? AND difficulty = ?",
+                (now, row[0], row[1])
+            )
+            self._conn.commit()
+        return row
+
+    def _finish(self, topic, difficulty, status, attempts, not_before, error=None):
+        with self._lock:
+            self._conn.execute(
+                """
+                UPDATE warm_jobs SET status = ?, attempts = ?, not_before = ?, last_error = ?,
+                    priority = CASE ? WHEN 'done' THEN 0 ELSE priority END, updated_at = ?
+                WHERE topic = ? AND difficulty = ?
+                """,
+                (status, attempts, not_before, error, status, time.time(), topic, difficulty)
+            )
+            self._conn.commit()
+
+    def complete(self, topic, difficulty):
+        self._finish(topic, difficulty, "done", 0, 0)
+
+    def requeue(self, topic, difficulty):
+        """Put a job that made progress back in line for its next batch"""
+        self._finish(topic, difficulty, "pending", 0, 0)
+
+    def retry(self, topic, difficulty, attempts, delay, error):
+        """Put a failed job back after `delay` seconds"""
+        self._finish(topic, difficulty, "pending", attempts, time.time() + delay, error)
+
+    def record_tokens(self, tokens, now=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO token_usage (at, tokens) VALUES (?, ?)",
+                (time.time() if now is None else now, tokens)
+            )
+            self._conn.commit()
+
+    def tokens_since(self, since):
+        with self._lock:
+            # Older rows can never count again
+            self._conn.execute("DELETE FROM token_usage WHERE at < ?", (since - 24 * 3600,))
+            return self._conn.execute(
+                "SELECT COALESCE(SUM(tokens), 0) FROM token_usage WHERE at >= ?", (since,)
+            ).fetchone()[0]
+
+    def counts(self):
+        """{status: number of jobs}"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM warm_jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class TokenBudget:
+    """At most `limit` estimated tokens per sliding `window` seconds
+
+    Usage is stored in the job queue's database, so restarting the
+    worker doesn't hand it a fresh budget.
+    """
+
+    def __init__(self, queue, limit=DEFAULT_TOKENS_PER_HOUR, window=3600):
+        self.queue = queue
+        self.limit = limit
+        self.window = window
+
+    def used(self):
+        return self.queue.tokens_since(time.time() - self.window)
+
+    def remaining(self):
+        return max(0, self.limit - self.used())
+
+    def spend(self, tokens):
+        self.queue.record_tokens(tokens)
+
+
+class BudgetedBackend(LLMBackend):
+    """Rate limit every model call and charge its tokens to a budget"""
+
+    def __init__(self, backend, rate_limiter, budget):
+        self.backend = backend
+        self.rate_limiter = rate_limiter
+        self.budget = budget
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    @property
+    def supports_json_mode(self):
+        return self.backend.supports_json_mode
+
+    @property
+    def wire_format(self):
+        return self.backend.wire_format
+
+    def available(self):
+        available = getattr(self.backend, "available", None)
+        return available is None or available()
+
+    def _before_call(self):
+        if self.budget.remaining() <= 0:
+            raise BudgetExhausted("Token budget used up for this hour")
+        self.rate_limiter.acquire()
+
+    def generate(self, prompt, json_schema=None):
+        self._before_call()
+        text = self.backend.generate(prompt, json_schema)
+        self.budget.spend(estimate_tokens(prompt) + estimate_tokens(text))
+        return text
+
+    def generate_stream(self, prompt, json_schema=None):
+        self._before_call()
+        tokens = estimate_tokens(prompt)
+        try:
+            for chunk in self.backend.generate_stream(prompt, json_schema):
+                tokens += estimate_tokens(chunk)
+                yield chunk
+        finally:
+            self.budget.spend(tokens)
+
+
+class CatalogWarmer:
+    """Refill catalog slots in the bank from the job queue
+
+    Progress is measured by the bank's own stock count, so duplicates the
+    bank refuses and questions served from stock while the circuit
+    breaker is open never count as a refill.
+    """
+
+    def __init__(self, bank, queue, backend=None, target_stock=DEFAULT_TARGET_STOCK,
+                 low_watermark=DEFAULT_LOW_WATERMARK, batch_size=DEFAULT_BATCH_SIZE,
+                 requests_per_second=DEFAULT_REQUESTS_PER_SECOND, tokens_per_hour=DEFAULT_TOKENS_PER_HOUR):
+        if low_watermark > target_stock:
+            raise ValueError("low_watermark must not exceed target_stock")
+        self.bank = bank
+        self.queue = queue
+        self.target_stock = target_stock
+        self.low_watermark = low_watermark
+        self.batch_size = batch_size
+        self.budget = TokenBudget(queue, tokens_per_hour)
+
+        if backend is None:
+            # No user is waiting, so skip hedging and give calls more time
+            backend = ResilientBackend(LazyBackend(), deadline=90.0, hedge=False)
+        rate_limiter = RateLimiter(requests_per_second, burst=1)
+        self.generator = QuizGenerator(
+            backend=BudgetedBackend(backend, rate_limiter, self.budget), use_cache=False, bank=bank
+        )
+        self._seeded_topics = set()
+
+        # Counters
+        self.jobs_run = 0
+        self.jobs_failed = 0
+        self.questions_added = 0
+
+    def scan(self):
+        """Queue a refill for every catalog slot under the low watermark"""
+        queued = 0
+        for topic, difficulty in catalog_entries():
+            if self.bank.count(topic, difficulty) < self.low_watermark:
+                self.queue.enqueue(topic, difficulty)
+                queued += 1
+        return queued
+
+    def seed_dedup_index(self, topic):
+        """Load stored questions so new ones aren't rewordings of them"""
+        if topic in self._seeded_topics:
+            return
+        self._seeded_topics.add(topic)
+        self.generator.remember(topic, self.bank.sample(DEDUP_SEED_QUESTIONS, topic))
+
+    def run_once(self):
+        """Run one batch of the most urgent due job; False when there was nothing to do"""
+        if self.budget.remaining() <= 0:
+            return False
+        job = self.queue.claim()
+        if job is None:
+            return False
+        topic, difficulty, attempts = job
+
+        before = self.bank.count(topic, difficulty)
+        if before >= self.target_stock:
+            self.queue.complete(topic, difficulty)
+            return True
+
+        self.jobs_run += 1
+        self.seed_dedup_index(topic)
+        error = None
+        with metrics.span("warmer.batch"):
+            try:
+                self.generator.generate_questions(
+                    topic, difficulty, min(self.batch_size, self.target_stock - before), fallback=False
+                )
+            except Exception as e:
+                error = e
+
+        added = self.bank.count(topic, difficulty) - before
+        if added > 0:
+            self.questions_added += added
+            metrics.increment("warmer.questions_added", added)
+            print(f"{topic} ({difficulty}): +{added}, {before + added}/{self.target_stock}")
+            if before + added >= self.target_stock:
+                self.queue.complete(topic, difficulty)
+            else:
+                self.queue.requeue(topic, difficulty)
+            return True
+
+        self.jobs_failed += 1
+        metrics.increment("warmer.failed_batches")
+        delay = backoff_delay(attempts, base=RETRY_BASE, cap=RETRY_CAP)
+        error = str(error or "no new questions")
+        print(f"{topic} ({difficulty}): {error}, retrying in {delay:.0f}s")
+        self.queue.retry(topic, difficulty, attempts + 1, delay, error)
+        return True
+
+    def run(self, stop=None, scan_interval=60.0, idle_sleep=5.0, once=False):
+        """Scan and work through jobs until `stop` is set
+
+        With once=True, return after a scan and as soon as no job is due.
+        """
+        stop = stop or threading.Event()
+        next_scan = 0.0
+        while not stop.is_set():
+            if time.monotonic() >= next_scan:
+                self.scan()
+                next_scan = time.monotonic() + scan_interval
+            if self.run_once():
+                continue
+            if once:
+                break
+            stop.wait(idle_sleep)
+
+    def stats(self):
+        return {
+            "jobs": self.queue.counts(),
+            "jobs_run": self.jobs_run,
+            "jobs_failed": self.jobs_failed,
+            "questions_added": self.questions_added,
+            "tokens_used": self.budget.used(),
+            "tokens_remaining": self.budget.remaining(),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep the question bank stocked for every catalog quiz")
+    parser.add_argument("--backend", help='"gemini", "fake" or a model server URL (default: $QUIZ_LLM_BACKEND)')
+    parser.add_argument("--target", type=int, default=DEFAULT_TARGET_STOCK, help="questions kept per topic and difficulty")
+    parser.add_argument("--watermark", type=int, default=DEFAULT_LOW_WATERMARK, help="refill when stock drops below this")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH_SIZE, help="questions requested per job run")
+    parser.add_argument("--rate", type=float, default=DEFAULT_REQUESTS_PER_SECOND, help="model requests per second")
+    parser.add_argument("--tokens-per-hour", type=int, default=DEFAULT_TOKENS_PER_HOUR)
+    parser.add_argument("--scan-interval", type=float, default=60.0)
+    parser.add_argument("--once", action="store_true", help="refill what is low now, then exit")
+    args = parser.parse_args(argv)
+
+    bank = QuestionBank()
+    queue = WarmJobQueue(recover=True)
+    backend = ResilientBackend(LazyBackend(args.backend), deadline=90.0, hedge=False)
+    warmer = CatalogWarmer(
+        bank, queue, backend, target_stock=args.target, low_watermark=args.watermark,
+        batch_size=args.batch, requests_per_second=args.rate, tokens_per_hour=args.tokens_per_hour
+    )
+    try:
+        warmer.run(scan_interval=args.scan_interval, once=args.once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(warmer.stats())
+        queue.close()
+        bank.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
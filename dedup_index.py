@@ -0,0 +1,157 @@
+import random
+import threading
+import zlib
+from collections import OrderedDict
+
+from question_parser import normalize_question_text
+
+# Words that carry no meaning for "is this the same question"
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how in is it its of on or "
+    "that the these this to was what when where which who whom why with".split()
+)
+
+
+# Questions kept per index by default, about 60MB; the bank rejects exact
+# repeats of anything older
+DEFAULT_MAX_ITEMS = 10_000
+
+
+def _stem(word):
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def content_words(text):
+    """Normalized content words of `text` with stopwords removed"""
+    words = normalize_question_text(text).split()
+    return frozenset(_stem(w) for w in words if w not in STOPWORDS) or frozenset(words)
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def question_features(question):
+    """(question words, option set) used to compare two questions"""
+    options = frozenset(normalize_question_text(o) for o in question.get("options", []))
+    return content_words(question["question"]), options
+
+
+def similarity(a, b):
+    """Weighted similarity of two feature pairs, dominated by the question wording"""
+    return 0.7 * jaccard(a[0], b[0]) + 0.3 * jaccard(a[1], b[1])
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index for spotting reworded repeats of the same question
+
+    Each question is reduced to a MinHash signature of its content words
+    and filed into `bands` LSH buckets. Candidates sharing a bucket are
+    confirmed with similarity() over the question words and options, so
+    lookups touch only a handful of stored questions regardless of index
+    size. The rewording of a question rarely changes many content words,
+    while two different questions with the same options do, so options
+    only carry a small weight.
+
+    Questions live in namespaces (usually a topic) and are only compared
+    within the same namespace. Once the index holds `max_items` questions
+    the least recently added or matched ones are dropped; None keeps all.
+    """
+
+    def __init__(self, threshold=0.6, num_perm=48, bands=16, seed=1, max_items=DEFAULT_MAX_ITEMS):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_items = max_items
+
+        # XOR with a random mask reorders the hashes, one mask per permutation
+        rng = random.Random(seed)
+        self._masks = [rng.getrandbits(32) for _ in range(num_perm)]
+        self._buckets = {}
+        # item id -> (features, band keys), least recently used first
+        self._items = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        # Counters
+        self.evicted = 0
+
+    def signature(self, words):
+        hashes = [zlib.crc32(w.encode("utf-8")) for w in words] or [0]
+        return [min(map(mask.__xor__, hashes)) for mask in self._masks]
+
+    def _band_keys(self, signature, namespace):
+        rows = self.rows
+        return [
+            (namespace, band, tuple(signature[band * rows:(band + 1) * rows]))
+            for band in range(self.bands)
+        ]
+
+    def _find(self, features, band_keys):
+        checked = set()
+        for key in band_keys:
+            for item_id in self._buckets.get(key, ()):
+                if item_id in checked:
+                    continue
+                checked.add(item_id)
+                if similarity(features, self._items[item_id][0]) >= self.threshold:
+                    self._items.move_to_end(item_id)
+                    return item_id
+        return None
+
+    def find_duplicate(self, question, namespace=""):
+        """Return the id of a stored near-duplicate of `question`, or None"""
+        features = question_features(question)
+        band_keys = self._band_keys(self.signature(features[0]), namespace)
+        with self._lock:
+            return self._find(features, band_keys)
+
+    def add(self, question, namespace=""):
+        """Store `question` unless it duplicates one already stored
+
+        Returns True if it was added and False if it was a duplicate.
+        """
+        features = question_features(question)
+        band_keys = self._band_keys(self.signature(features[0]), namespace)
+        with self._lock:
+            if self._find(features, band_keys) is not None:
+                return False
+            item_id = self._next_id
+            self._next_id += 1
+            self._items[item_id] = (features, band_keys)
+            for key in band_keys:
+                self._buckets.setdefault(key, []).append(item_id)
+            if self.max_items is not None and len(self._items) > self.max_items:
+                self._evict()
+            return True
+
+    def _evict(self):
+        # Called with self._lock held
+        item_id, (_, band_keys) = self._items.popitem(last=False)
+        for key in band_keys:
+            bucket = self._buckets[key]
+            bucket.remove(item_id)
+            if not bucket:
+                del self._buckets[key]
+        self.evicted += 1
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+def remove_near_duplicates(questions, threshold=0.6):
+    """Return `questions` with near-duplicates of earlier items dropped"""
+    index = NearDuplicateIndex(threshold=threshold, max_items=None)
+    return [q for q in questions if index.add(q)]
@@ -0,0 +1,138 @@
+"""Local HTTP stand-in for the LLM so generation can be benchmarked offline
+
+    python fake_llm_server.py --port 8765 --latency 1.2 --spread 0.5 --error-rate 0.05
+    QUIZ_LLM_BACKEND=http://127.0.0.1:8765 python quiz_game_3.py
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from llm_backends import BackendError, FakeBackend, LatencyModel
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between requests
+    protocol_version = "HTTP/1.1"
+    backend = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        # Always consume the body so a kept-alive connection stays in sync
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+
+        url = urlparse(self.path)
+        if url.path != "/generate":
+            self.send_json(404, {"error": "Not found"})
+            return
+
+        try:
+            prompt = json.loads(body)["prompt"]
+        except (ValueError, KeyError):
+            self.send_json(400, {"error": "Expected a JSON body with a prompt"})
+            return
+
+        if parse_qs(url.query).get("stream") == ["1"]:
+            self.stream(prompt)
+            return
+
+        try:
+            text = self.backend.generate(prompt)
+        except BackendError as e:
+            self.send_json(503, {"error": str(e)})
+            return
+        self.send_json(200, {"text": text})
+
+    def stream(self, prompt):
+        chunks = self.backend.generate_stream(prompt)
+        try:
+            first = next(chunks)
+        except BackendError as e:
+            self.send_json(503, {"error": str(e)})
+            return
+        except StopIteration:
+            first = ""
+
+        # No Content-Length: the body ends when the connection closes
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        self.write_line({"text": first})
+        for chunk in chunks:
+            self.write_line({"text": chunk})
+
+    def write_line(self, message):
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+def make_server(backend, host="127.0.0.1", port=0):
+    """Build a server for `backend`; port 0 picks a free port"""
+    handler = type("BoundFakeLLMHandler", (FakeLLMHandler,), {"backend": backend})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_server_in_thread(backend, host="127.0.0.1", port=0):
+    """Serve `backend` from a daemon thread and return (server, base_url)"""
+    server = make_server(backend, host, port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake LLM server for offline quiz generation")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=1.0, help="mean/median response latency in seconds")
+    parser.add_argument("--spread", type=float, default=0.3)
+    parser.add_argument("--distribution", default="lognormal",
+                        choices=["constant", "uniform", "normal", "lognormal"])
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--wire-format", default="json", choices=["json", "lines"],
+                        help="response format; clients must be configured with the same one")
+    args = parser.parse_args()
+
+    backend = FakeBackend(
+        latency=LatencyModel(args.latency, args.spread, args.distribution),
+        chunk_size=args.chunk_size,
+        chunk_delay=LatencyModel(args.chunk_delay),
+        malformed_rate=args.malformed_rate,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        wire_format=args.wire_format
+    )
+    server = make_server(backend, args.host, args.port)
+    print(f"Fake LLM server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
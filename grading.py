@@ -0,0 +1,183 @@
+"""Vectorized bulk grading and per-question analytics
+
+    pip install numpy
+
+Answer sheets are integer arrays with one row per submission and one
+column per question; UNANSWERED marks skipped questions. Everything is
+computed with whole-array operations, so a million ten-question sheets
+grade in a fraction of a second.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+UNANSWERED = -1
+
+# Share of correct answers above which a question counts as Easy, and
+# below which it counts as Hard
+EASY_P_VALUE = 0.8
+HARD_P_VALUE = 0.4
+
+# Questions need this many attempts before their label is trusted
+MIN_ATTEMPTS_FOR_LABEL = 30
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Bulk grading needs numpy: pip install numpy")
+
+
+def _point_biserial(item_correct, ability_sum, ability_total, ability_sq_total, n):
+    """Correlation between answering an item right and overall ability
+
+    Works from per-item sums so it is shared by the dense and long
+    formats: `ability_sum` is the summed ability of the players who got
+    the item right, the totals are over all `n` attempts at the item.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = item_correct / n
+        mean = ability_total / n
+        std = np.sqrt(np.maximum(ability_sq_total / n - mean ** 2, 0.0))
+        mean_correct = ability_sum / item_correct
+        r = (mean_correct - mean) / std * np.sqrt(p / (1 - p))
+    # Items everyone (or no one) got right say nothing about ability
+    return np.where(np.isfinite(r), r, 0.0)
+
+
+def grade_sheets(answers, key, num_options=4):
+    """Grade many submissions of the same quiz
+
+    `answers` is an (n_sheets, n_questions) integer array and `key` the
+    correct option per question. Returns per-sheet scores plus per-
+    question correctness rates, discrimination indices, option counts
+    and omission counts.
+    """
+    _require_numpy()
+    answers = np.asarray(answers)
+    key = np.asarray(key)
+    n_sheets, n_questions = answers.shape
+
+    correct = answers == key
+    scores = correct.sum(axis=1, dtype=np.int32)
+    answered = answers != UNANSWERED
+
+    item_correct = correct.sum(axis=0, dtype=np.int64)
+    p_values = item_correct / max(n_sheets, 1)
+
+    # Ability is the share of the quiz a player got right
+    ability = scores / max(n_questions, 1)
+    ability_sum = ability @ correct.astype(np.float64) if n_sheets else np.zeros(n_questions)
+    discrimination = _point_biserial(
+        item_correct, ability_sum,
+        ability.sum(), (ability ** 2).sum(), max(n_sheets, 1)
+    )
+
+    # Option counts through one bincount over (question, option) cells
+    columns = np.broadcast_to(np.arange(n_questions), answers.shape)
+    cells = columns[answered] * num_options + answers[answered]
+    option_counts = np.bincount(
+        cells, minlength=n_questions * num_options
+    ).reshape(n_questions, num_options)
+
+    return {
+        "scores": scores,
+        "percentages": ability * 100,
+        "p_values": p_values,
+        "discrimination": discrimination,
+        "option_counts": option_counts,
+        "omitted": n_sheets - answered.sum(axis=0),
+    }
+
+
+def item_statistics(question_ids, choices, correct_choices, sheet_ids, num_options=4):
+    """Per-question statistics from answers to different quizzes
+
+    Takes one entry per answer: the bank question id, the chosen option,
+    the correct option and which sheet it came from. Questions and
+    sheets can be any mix, as with server sessions. Returns a dict of
+    arrays aligned with the sorted unique `ids`.
+    """
+    _require_numpy()
+    question_ids = np.asarray(question_ids)
+    choices = np.asarray(choices)
+    correct_choices = np.asarray(correct_choices)
+    sheet_ids = np.asarray(sheet_ids)
+
+    answered = choices != UNANSWERED
+    correct = (choices == correct_choices) & answered
+
+    ids, item_index = np.unique(question_ids, return_inverse=True)
+    _, sheet_index = np.unique(sheet_ids, return_inverse=True)
+    n_items = len(ids)
+
+    # A sheet's ability is its share of answered questions that were right
+    sheet_answered = np.bincount(sheet_index, weights=answered)
+    sheet_correct = np.bincount(sheet_index, weights=correct)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sheet_ability = np.where(sheet_answered > 0, sheet_correct / sheet_answered, 0.0)
+    ability = np.where(answered, sheet_ability[sheet_index], 0.0)
+
+    attempts = np.bincount(item_index, weights=answered, minlength=n_items)
+    item_correct = np.bincount(item_index, weights=correct, minlength=n_items)
+    discrimination = _point_biserial(
+        item_correct,
+        np.bincount(item_index, weights=ability * correct, minlength=n_items),
+        np.bincount(item_index, weights=ability, minlength=n_items),
+        np.bincount(item_index, weights=ability ** 2, minlength=n_items),
+        attempts
+    )
+
+    cells = item_index[answered] * num_options + choices[answered]
+    option_counts = np.bincount(cells, minlength=n_items * num_options).reshape(n_items, num_options)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p_values = np.where(attempts > 0, item_correct / attempts, np.nan)
+
+    return {
+        "ids": ids,
+        "attempts": attempts.astype(np.int64),
+        "correct": item_correct.astype(np.int64),
+        "p_values": p_values,
+        "discrimination": discrimination,
+        "option_counts": option_counts,
+    }
+
+
+def difficulty_labels(p_values):
+    """Easy/Medium/Hard label for each correctness rate"""
+    _require_numpy()
+    p_values = np.asarray(p_values, dtype=np.float64)
+    return np.select(
+        [p_values >= EASY_P_VALUE, p_values < HARD_P_VALUE],
+        ["Easy", "Hard"],
+        "Medium"
+    )
+
+
+def apply_to_bank(bank, stats, min_attempts=MIN_ATTEMPTS_FOR_LABEL):
+    """Store item statistics in the bank and relabel well-measured questions
+
+    Labels come from each question's running totals in the bank, not
+    just this batch, and the adaptive difficulty parameters of every
+    question in the batch are refreshed. Returns how many questions
+    changed difficulty.
+    """
+    _require_numpy()
+    totals = bank.record_item_stats(zip(
+        stats["ids"].tolist(),
+        stats["attempts"].tolist(),
+        stats["correct"].tolist(),
+        stats["discrimination"].tolist()
+    ))
+    measured = [(qid, correct / attempts) for qid, (attempts, correct) in totals.items()
+                if attempts >= min_attempts]
+    changed = 0
+    if measured:
+        ids, p_values = zip(*measured)
+        labels = difficulty_labels(p_values)
+        changed = bank.relabel(dict(zip(ids, labels.tolist())))
+    # Adaptive quizzes pick questions by these parameters and only read them
+    bank.backfill_item_params()
+    bank.refresh_item_params(totals)
+    return changed
@@ -0,0 +1,321 @@
+"""Player rankings by quiz points, all-time and per day or week
+
+Every result adds points to a set of boards: global, per topic and per
+difficulty, each all-time, for the current day and for the current
+week. A board is an indexable skip list, so adding points, the top k
+and a player's rank are all O(log n). Daily and weekly boards are keyed
+by period; once a period is older than `keep_periods` its boards are
+dropped whole instead of expiring players one by one.
+
+    boards = LeaderboardSet()
+    boards.record("alice", "Science", "Hard", quiz_points(4, "Hard"))
+    boards.top(10, scope="topic", key="Science", window="weekly")
+    boards.rank("alice", window="daily")
+"""
+import random
+import threading
+import time
+
+from question_bank import normalize_topic
+
+# Points per correct answer; adaptive and unknown difficulties count as medium
+DIFFICULTY_POINTS = {"easy": 1, "medium": 2, "hard": 3}
+DEFAULT_POINTS = 2
+
+DAY = 24 * 3600
+
+# Period length in seconds and offset; weeks start on Monday (1970-01-01 was a Thursday)
+WINDOWS = {
+    "all": None,
+    "daily": (DAY, 0),
+    "weekly": (7 * DAY, 3 * DAY),
+}
+
+SCOPES = ("global", "topic", "difficulty")
+
+MAX_LEVEL = 32
+
+
+def difficulty_key(difficulty):
+    """"Adaptive (Hard level)" -> "adaptive", "Medium" -> "medium" """
+    return str(difficulty).split("(")[0].strip().lower()
+
+
+def quiz_points(correct, difficulty):
+    return correct * DIFFICULTY_POINTS.get(difficulty_key(difficulty), DEFAULT_POINTS)
+
+
+def period_of(window, at):
+    """Index of the day or week containing `at`, 0 for the all-time window"""
+    if WINDOWS[window] is None:
+        return 0
+    length, offset = WINDOWS[window]
+    return int((at + offset) // length)
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, level):
+        self.key = key
+        self.next = [None] * level
+        # width[i] is how many bottom-level steps next[i] is ahead of this node
+        self.width = [1] * level
+
+
+class IndexableSkipList:
+    """Sorted keys with O(log n) insert, remove, rank and access by position"""
+
+    def __init__(self, seed=None):
+        self._head = _Node(None, MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+        self._rng = random.Random(seed)
+
+    def __len__(self):
+        return self._size
+
+    def _random_level(self):
+        level = 1
+        while level < MAX_LEVEL and self._rng.random() < 0.5:
+            level += 1
+        return level
+
+    def _path(self, key):
+        """Last node before `key` on every level in use, and its position"""
+        update = [self._head] * self._level
+        positions = [0] * self._level
+        node = self._head
+        position = 0
+        for i in reversed(range(self._level)):
+            while node.next[i] is not None and node.next[i].key < key:
+                position += node.width[i]
+                node = node.next[i]
+            update[i] = node
+            positions[i] = position
+        return update, positions
+
+    def insert(self, key):
+        update, positions = self._path(key)
+        level = self._random_level()
+        for i in range(self._level, level):
+            # Levels above the current height start out empty, spanning the whole list
+            self._head.next[i] = None
+            self._head.width[i] = self._size + 1
+            update.append(self._head)
+            positions.append(0)
+        self._level = max(self._level, level)
+        rank = positions[0] + 1
+        node = _Node(key, level)
+        for i in range(level):
+            before = update[i]
+            node.next[i] = before.next[i]
+            node.width[i] = positions[i] + before.width[i] + 1 - rank
+            before.next[i] = node
+            before.width[i] = rank - positions[i]
+        for i in range(level, self._level):
+            update[i].width[i] += 1
+        self._size += 1
+
+    def remove(self, key):
+        """Remove `key`; raises KeyError if it isn't there"""
+        update, _ = self._path(key)
+        node = update[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        level = len(node.next)
+        for i in range(level):
+            update[i].width[i] += node.width[i] - 1
+            update[i].next[i] = node.next[i]
+        for i in range(level, self._level):
+            update[i].width[i] -= 1
+        self._size -= 1
+
+    def rank(self, key):
+        """0-based position of `key`, or None if it isn't there"""
+        update, positions = self._path(key)
+        node = update[0].next[0]
+        if node is None or node.key != key:
+            return None
+        return positions[0]
+
+    def _node_at(self, index):
+        target = index + 1
+        node = self._head
+        position = 0
+        for i in reversed(range(self._level)):
+            while node.next[i] is not None and position + node.width[i] <= target:
+                position += node.width[i]
+                node = node.next[i]
+        return node
+
+    def __getitem__(self, index):
+        if not 0 <= index < self._size:
+            raise IndexError("skip list index out of range")
+        return self._node_at(index).key
+
+    def slice(self, start, stop):
+        """Keys at positions start..stop-1"""
+        start = max(0, start)
+        stop = min(stop, self._size)
+        if start >= stop:
+            return []
+        node = self._node_at(start)
+        keys = []
+        for _ in range(stop - start):
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+class Leaderboard:
+    """Points per player, highest first; ties go to whoever got there first"""
+
+    def __init__(self):
+        self._ranking = IndexableSkipList()
+        # player -> (-points, reached_at, player), the player's key in the ranking
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, player, points, at):
+        """Add points to `player` and return their new total"""
+        old = self._entries.get(player)
+        total = points
+        if old is not None:
+            total -= old[0]
+            if points == 0:
+                return total
+            self._ranking.remove(old)
+        key = (-total, at, player)
+        self._ranking.insert(key)
+        self._entries[player] = key
+        return total
+
+    def score(self, player):
+        key = self._entries.get(player)
+        return None if key is None else -key[0]
+
+    def rank(self, player):
+        """1-based rank of `player`, or None if they have no entry"""
+        key = self._entries.get(player)
+        return None if key is None else self._ranking.rank(key) + 1
+
+    def top(self, k):
+        return [
+            {"rank": i + 1, "player": player, "points": -points}
+            for i, (points, _, player) in enumerate(self._ranking.slice(0, k))
+        ]
+
+    def around(self, player, n=2):
+        """Entries from `n` places above `player` to `n` below"""
+        rank = self.rank(player)
+        if rank is None:
+            return []
+        start = max(0, rank - 1 - n)
+        return [
+            {"rank": start + i + 1, "player": name, "points": -points}
+            for i, (points, _, name) in enumerate(self._ranking.slice(start, rank + n))
+        ]
+
+
+class LeaderboardSet:
+    """Global, per-topic and per-difficulty boards for every time window"""
+
+    def __init__(self, keep_periods=2):
+        # The current period plus keep_periods - 1 earlier ones stay queryable
+        self.keep_periods = keep_periods
+        self._lock = threading.Lock()
+        # (window, period, scope, key) -> Leaderboard
+        self._boards = {}
+        # window -> {period: [board keys]}, so expiry only touches what it drops
+        self._periods = {window: {} for window in WINDOWS if WINDOWS[window] is not None}
+
+        # Counters
+        self.results = 0
+        self.boards_expired = 0
+
+    def _scope_keys(self, topic, difficulty):
+        return (("global", ""), ("topic", normalize_topic(topic)), ("difficulty", difficulty_key(difficulty)))
+
+    def _board(self, window, period, scope, key, create=False):
+        board_key = (window, period, scope, key)
+        board = self._boards.get(board_key)
+        if board is None and create:
+            board = self._boards[board_key] = Leaderboard()
+            if window in self._periods:
+                self._periods[window].setdefault(period, []).append(board_key)
+        return board
+
+    def _expire(self, now):
+        for window, periods in self._periods.items():
+            oldest = period_of(window, now) - self.keep_periods + 1
+            for period in [p for p in periods if p < oldest]:
+                for board_key in periods.pop(period):
+                    del self._boards[board_key]
+                    self.boards_expired += 1
+
+    def record(self, player, topic, difficulty, points, at=None):
+        """Add a result's points to every board it belongs to"""
+        at = time.time() if at is None else at
+        with self._lock:
+            self._expire(time.time())
+            for window in WINDOWS:
+                period = period_of(window, at)
+                if window in self._periods and period < period_of(window, time.time()) - self.keep_periods + 1:
+                    # Too old for this window, e.g. while loading history
+                    continue
+                for scope, key in self._scope_keys(topic, difficulty):
+                    self._board(window, period, scope, key, create=True).add(player, points, at)
+            self.results += 1
+
+    def _lookup(self, scope, key, window, period):
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown leaderboard scope: {scope}")
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown leaderboard window: {window}")
+        if scope == "topic":
+            key = normalize_topic(key)
+        elif scope == "difficulty":
+            key = difficulty_key(key)
+        else:
+            key = ""
+        if period is None:
+            period = period_of(window, time.time())
+        return self._board(window, period, scope, key)
+
+    def top(self, k=10, scope="global", key="", window="all", period=None):
+        """The `k` highest-scoring players on one board"""
+        with self._lock:
+            self._expire(time.time())
+            board = self._lookup(scope, key, window, period)
+            return board.top(k) if board is not None else []
+
+    def rank(self, player, scope="global", key="", window="all", period=None):
+        """{rank, points, players} for `player` on one board, or None"""
+        with self._lock:
+            self._expire(time.time())
+            board = self._lookup(scope, key, window, period)
+            rank = board.rank(player) if board is not None else None
+            if rank is None:
+                return None
+            return {"rank": rank, "points": board.score(player), "players": len(board)}
+
+    def around(self, player, n=2, scope="global", key="", window="all", period=None):
+        with self._lock:
+            self._expire(time.time())
+            board = self._lookup(scope, key, window, period)
+            return board.around(player, n) if board is not None else []
+
+    def load_history(self, history, until=None):
+        """Rebuild the boards from quizzes in a PlayHistory; returns how many were added"""
+        count = 0
+        for player, topic, difficulty, correct, finished_at in history.quiz_results(until=until):
+            self.record(player, topic, difficulty, quiz_points(correct, difficulty), finished_at)
+            count += 1
+        return count
+
+    def stats(self):
+        with self._lock:
+            return {"boards": len(self._boards), "results": self.results, "boards_expired": self.boards_expired}
@@ -0,0 +1,419 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+import queue
+import urllib.parse
+
+import metrics
+from question_parser import format_line_question
+
+DEFAULT_MODEL_NAME = "gemini-1.5-flash"
+
+# "json" (an array of objects) or "lines" (one pipe-delimited question per line)
+WIRE_FORMATS = ("json", "lines")
+
+# google.generativeai, imported on first use because the SDK is slow to load
+genai = None
+
+
+def _import_genai():
+    global genai
+    if genai is None:
+        import google.generativeai
+        genai = google.generativeai
+    return genai
+
+
+def estimate_tokens(text):
+    """Rough BPE-style token count: words, numbers and punctuation marks"""
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+class BackendError(Exception):
+    """Raised when a backend fails to produce a response"""
+
+
+class LLMBackend:
+    """Interface every model backend implements
+
+    generate() returns the full response text. generate_stream() yields
+    the text in chunks as it arrives; backends without real streaming
+    fall back to a single chunk. Backends with supports_json_mode set
+    constrain their output to `json_schema` when one is given, the others
+    ignore it. `wire_format` is the response format quiz prompts ask for.
+    """
+
+    name = "base"
+    supports_json_mode = False
+    wire_format = "json"
+
+    def generate(self, prompt, json_schema=None):
+        raise NotImplementedError
+
+    def generate_stream(self, prompt, json_schema=None):
+        yield self.generate(prompt, json_schema)
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through the google-generativeai SDK"""
+
+    name = "gemini"
+    supports_json_mode = True
+
+    def __init__(self, model_name=DEFAULT_MODEL_NAME, api_key=None, wire_format="json"):
+        self.wire_format = wire_format
+        if api_key is None:
+            api_key = os.environ.get("GEMINI_API_KEY", os.environ.get("GOOGLE_API_KEY", ""))
+        _import_genai()
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name=model_name)
+
+    def _generation_config(self, json_schema):
+        if json_schema is None:
+            return None
+        return genai.GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=json_schema
+        )
+
+    def generate(self, prompt, json_schema=None):
+        response = self.model.generate_content(
+            prompt, generation_config=self._generation_config(json_schema)
+        )
+        return response.text
+
+    def generate_stream(self, prompt, json_schema=None):
+        response = self.model.generate_content(
+            prompt, generation_config=self._generation_config(json_schema), stream=True
+        )
+        for chunk in response:
+            yield chunk.text
+
+
+class LatencyModel:
+    """Random latency distribution used by the fake backend
+
+    kind is one of "constant", "uniform", "normal" or "lognormal".
+    For "uniform" the range is mean +/- spread, for "normal" spread is the
+    standard deviation and for "lognormal" it is the sigma of the
+    underlying normal (so `mean` is the median).
+    """
+
+    def __init__(self, mean=0.0, spread=0.0, kind="constant"):
+        if kind not in ("constant", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.mean = mean
+        self.spread = spread
+        self.kind = kind
+
+    def sample(self, rng):
+        if self.kind == "constant" or self.mean <= 0:
+            value = self.mean
+        elif self.kind == "uniform":
+            value = rng.uniform(self.mean - self.spread, self.mean + self.spread)
+        elif self.kind == "normal":
+            value = rng.gauss(self.mean, self.spread)
+        else:
+            value = self.mean * rng.lognormvariate(0, self.spread)
+        return max(0.0, value)
+
+
+class FakeBackend(LLMBackend):
+    """Offline stand-in that answers quiz prompts with synthetic questions
+
+    First-chunk latency, per-chunk delay, how often the output is malformed
+    and how often the call fails are all configurable, and a fixed `seed`
+    makes runs reproducible.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency=None, chunk_size=64, chunk_delay=None,
+                 malformed_rate=0.0, error_rate=0.0, seed=None, wire_format="json"):
+        if wire_format not in WIRE_FORMATS:
+            raise ValueError(f"Unknown wire format: {wire_format}")
+        self.wire_format = wire_format
+        self.latency = latency or LatencyModel()
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay or LatencyModel()
+        self.malformed_rate = malformed_rate
+        self.error_rate = error_rate
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counter = 0
+
+        # Counters
+        self.calls = 0
+        self.errors = 0
+        self.malformed = 0
+
+    def _next_id(self):
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    def _random(self, method, *args):
+        with self._lock:
+            return getattr(self._rng, method)(*args)
+
+    def _sleep(self, latency):
+        with self._lock:
+            delay = latency.sample(self._rng)
+        time.sleep(delay)
+
+    def build_questions(self, prompt):
+        """Synthetic question list matching what the prompt asks for"""
+        count_match = re.search(r"exactly (\d+)", prompt)
+        topic_match = re.search(r"about (.+?) with", prompt)
+        num_questions = int(count_match.group(1)) if count_match else 5
+        topic = topic_match.group(1) if topic_match else "general knowledge"
+
+        questions = []
+        for _ in range(num_questions):
+            n = self._next_id()
+            correct = self._random("randrange", 4)
+            options = [f"{topic} answer {n}.{i}" for i in range(4)]
+            questions.append({
+                "question": f"Sample question {n} about {topic}?",
+                "options": options,
+                "correct": correct
+            })
+        return questions
+
+    def render(self, questions):
+        """Serialize questions the way the prompt asks for them"""
+        if self.wire_format == "lines":
+            return "\n".join(format_line_question(q) for q in questions) + "\n"
+        return json.dumps(questions, indent=2)
+
+    def _corrupt(self, text):
+        self.malformed += 1
+        kind = self._random("randrange", 4)
+        if kind == 0:
+            # Truncated mid-item
+            return text[: max(1, int(len(text) * self._random("uniform", 0.3, 0.9)))]
+        if kind == 1:
+            # Chatty wrapper around the JSON
+            return f"Sure! Here are your questions:\n```json\n{text}\n```\nLet me know if you need more."
+        if kind == 2:
+            # One item with a bad option count
+            if self.wire_format == "lines":
+                return text.replace("|", "|Extra option|", 1)
+            return text.replace('"options": [', '"options": ["Extra option", ', 1)
+        # Trailing comma the strict JSON parser rejects
+        return text.rstrip().rstrip("]").rstrip() + ",\n]"
+
+    def _respond(self, prompt):
+        self.calls += 1
+        self._sleep(self.latency)
+        if self._random("random") < self.error_rate:
+            self.errors += 1
+            raise BackendError("Simulated upstream error")
+
+        text = self.render(self.build_questions(prompt))
+        if self._random("random") < self.malformed_rate:
+            text = self._corrupt(text)
+        return text
+
+    def generate(self, prompt, json_schema=None):
+        return self._respond(prompt)
+
+    def generate_stream(self, prompt, json_schema=None):
+        text = self._respond(prompt)
+        for start in range(0, len(text), self.chunk_size):
+            if start:
+                self._sleep(self.chunk_delay)
+            yield text[start:start + self.chunk_size]
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections reused across requests and threads
+
+    Up to `max_idle` idle connections are kept for reuse; busy connections
+    are not limited, so concurrency is bounded by the caller.
+    """
+
+    def __init__(self, base_url, max_idle=16, timeout=60):
+        url = urllib.parse.urlparse(base_url)
+        self.https = url.scheme == "https"
+        self.host = url.hostname
+        self.port = url.port
+        self.base_path = url.path.rstrip("/")
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+
+        # Counters
+        self.created = 0
+        self.reused = 0
+
+    def new_connection(self):
+        # http.client pulls in email and ssl, only load it for HTTP backends
+        import http.client
+        self.created += 1
+        if self.https:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def acquire(self):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            return self.new_connection(), False
+        self.reused += 1
+        return connection, True
+
+    def release(self, connection, response):
+        """Return a connection whose response has been fully read"""
+        if response.will_close or self._idle.qsize() >= self.max_idle:
+            connection.close()
+        else:
+            self._idle.put(connection)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class HTTPBackend(LLMBackend):
+    """Client for an HTTP model server such as fake_llm_server.py
+
+    POST /generate with {"prompt": ...} returns {"text": ...};
+    POST /generate?stream=1 returns one JSON object per line, each with a
+    "text" chunk. Connections are kept alive and pooled between calls.
+    """
+
+    name = "http"
+
+    def __init__(self, base_url, timeout=60, max_idle_connections=16, wire_format="json"):
+        self.wire_format = wire_format
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.pool = ConnectionPool(self.base_url, max_idle=max_idle_connections, timeout=timeout)
+
+    def _post(self, path, prompt, json_schema):
+        import http.client
+        body = {"prompt": prompt}
+        if json_schema is not None:
+            body["json_schema"] = json_schema
+        data = json.dumps(body).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+
+        connection, reused = self.pool.acquire()
+        try:
+            connection.request("POST", self.pool.base_path + path, body=data, headers=headers)
+            response = connection.getresponse()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            if not reused:
+                raise
+            # The server may have closed an idle keep-alive connection, retry on a fresh one
+            metrics.increment("http.retries")
+            connection = self.pool.new_connection()
+            connection.request("POST", self.pool.base_path + path, body=data, headers=headers)
+            response = connection.getresponse()
+
+        if response.status >= 400:
+            response.read()
+            self.pool.release(connection, response)
+            raise BackendError(f"HTTP {response.status} from model server")
+        return connection, response
+
+    def generate(self, prompt, json_schema=None):
+        connection, response = self._post("/generate", prompt, json_schema)
+        try:
+            data = response.read()
+        except Exception:
+            connection.close()
+            raise
+        self.pool.release(connection, response)
+        return json.loads(data)["text"]
+
+    def generate_stream(self, prompt, json_schema=None):
+        connection, response = self._post("/generate?stream=1", prompt, json_schema)
+        finished = False
+        try:
+            while True:
+                line = response.readline()
+                if not line:
+                    finished = True
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                message = json.loads(line)
+                if "error" in message:
+                    raise BackendError(message["error"])
+                yield message["text"]
+        finally:
+            if finished:
+                self.pool.release(connection, response)
+            else:
+                # Abandoned mid-stream, the connection can't be reused
+                connection.close()
+
+
+def create_backend(spec=None):
+    """Build a backend from a spec string
+
+    "gemini" (the default), "fake", or an http:// URL of a model server.
+    The QUIZ_LLM_BACKEND environment variable is used when no spec is given,
+    and QUIZ_WIRE_FORMAT picks the response format ("json" or "lines").
+    """
+    if spec is None:
+        spec = os.environ.get("QUIZ_LLM_BACKEND", "gemini")
+    wire_format = os.environ.get("QUIZ_WIRE_FORMAT", "json")
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError(f"Unknown wire format: {wire_format}")
+    if spec == "gemini":
+        return GeminiBackend(wire_format=wire_format)
+    if spec == "fake":
+        return FakeBackend(latency=LatencyModel(1.0, 0.4, "lognormal"), wire_format=wire_format)
+    if spec.startswith(("http://", "https://")):
+        return HTTPBackend(spec, wire_format=wire_format)
+    raise ValueError(f"Unknown LLM backend: {spec}")
+
+
+class LazyBackend(LLMBackend):
+    """Backend built by create_backend(spec) the first time it is used
+
+    Lets callers hold a backend from startup without paying for SDK
+    imports or model construction until a quiz actually needs generating.
+    """
+
+    def __init__(self, spec=None):
+        self.spec = spec
+        self._backend = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = create_backend(self.spec)
+        return self._backend
+
+    @property
+    def name(self):
+        return self.get().name
+
+    @property
+    def supports_json_mode(self):
+        return self.get().supports_json_mode
+
+    @property
+    def wire_format(self):
+        return self.get().wire_format
+
+    def generate(self, prompt, json_schema=None):
+        return self.get().generate(prompt, json_schema)
+
+    def generate_stream(self, prompt, json_schema=None):
+        return self.get().generate_stream(prompt, json_schema)
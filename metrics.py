@@ -0,0 +1,216 @@
+"""Lightweight timers, histograms and counters
+
+Disabled by default: span() then returns a shared no-op context manager
+and increment()/observe() return immediately, so instrumented code pays
+one global lookup per call. Enable with enable() or by setting
+QUIZ_METRICS=1; setting QUIZ_METRICS_FILE also writes a JSON snapshot
+there when the process exits.
+
+    with metrics.span("llm.generate"):
+        text = backend.generate(prompt)
+    metrics.increment("cache.hits")
+
+    metrics.export_json("metrics.json")
+    print(metrics.export_prometheus())
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds, roughly x2.5 apart from 100us to 2 minutes
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+_enabled = bool(os.environ.get("QUIZ_METRICS") or os.environ.get("QUIZ_METRICS_FILE"))
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with interpolated percentiles
+
+    Memory stays constant however many samples are observed, and the
+    buckets map directly onto Prometheus histogram series.
+    """
+
+    def __init__(self, name, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, q):
+        """Estimate the q-th quantile (0-1) by interpolating inside its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self.start)
+        if exc_type is not None:
+            increment(self.name + ".errors")
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def span(name):
+    """Context manager timing its block into the `name` histogram"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def histogram(name):
+    h = _histograms.get(name)
+    if h is None:
+        with _lock:
+            h = _histograms.setdefault(name, Histogram(name))
+    return h
+
+
+def observe(name, seconds):
+    if _enabled:
+        histogram(name).observe(seconds)
+
+
+def increment(name, amount=1):
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + amount
+
+
+def snapshot():
+    """Counters and histogram summaries as plain dicts"""
+    with _lock:
+        histograms = list(_histograms.values())
+        counters = dict(_counters)
+    return {
+        "counters": counters,
+        "histograms": {h.name: h.summary() for h in histograms},
+    }
+
+
+def export_json(path):
+    with open(path, "w") as f:
+        json.dump(snapshot(), f, indent=2, sort_keys=True)
+
+
+def _prometheus_name(name):
+    return "quiz_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def export_prometheus():
+    """Metrics in the Prometheus text exposition format"""
+    with _lock:
+        histograms = list(_histograms.values())
+        counters = dict(_counters)
+
+    lines = []
+    for name, value in sorted(counters.items()):
+        metric = _prometheus_name(name) + "_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+
+    for h in sorted(histograms, key=lambda h: h.name):
+        metric = _prometheus_name(h.name) + "_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        with h._lock:
+            counts = list(h.counts)
+            total, count = h.sum, h.count
+        cumulative = 0
+        for bound, bucket_count in zip(h.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{metric}_sum {total}")
+        lines.append(f"{metric}_count {count}")
+    return "\n".join(lines) + "\n"
+
+
+def _export_at_exit():
+    path = os.environ.get("QUIZ_METRICS_FILE")
+    if path and _enabled:
+        export_json(path)
+
+
+atexit.register(_export_at_exit)
@@ -0,0 +1,646 @@
+"""Append-only log of every answer, compacted into indexed summaries
+
+    history = PlayHistory()
+    history.record("alice", quiz_id, "Science", "Medium", question_id=42,
+                   choice=1, correct=True, response_time=3.2)
+    history.recent_quizzes("alice")
+    history.question_history(42)
+
+record() only appends to an in-memory batch. A writer thread packs each
+batch into fixed-size binary records and appends them to the current
+segment file with one write (and one fsync) per batch, so many answers
+share a single disk flush. Segments roll over at `segment_bytes`.
+
+Every `compact_interval` seconds the events written since the last
+compaction are folded into SQLite summary tables (per question, per
+player and question, per player and topic, per quiz) together with the
+log position reached, so queries are index lookups no matter how long
+the log gets and each event is counted exactly once. Player, topic and
+difficulty strings are stored once in a names table and referenced by id.
+
+Only one process may write to a history directory at a time; a lock
+file in the directory enforces it, so the Tk app and the HTTP service
+default to separate directories.
+"""
+import os
+import sqlite3
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+import metrics
+
+DEFAULT_HISTORY_DIR = os.environ.get(
+    "QUIZ_HISTORY_DIR",
+    os.path.join(os.path.expanduser("~"), ".quiz_play_history")
+)
+
+SERVER_HISTORY_DIR = os.environ.get(
+    "QUIZ_SERVER_HISTORY_DIR",
+    os.path.join(os.path.expanduser("~"), ".quiz_server_play_history")
+)
+
+# at, quiz_id, player, topic, difficulty, question_id, choice, correct, response_ms
+EVENT = struct.Struct("<dqIIIqbbI")
+
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+
+# Compaction reads segments in pieces of this many events
+READ_EVENTS = 64 * 1024
+
+# Largest response time the record format holds, about 49 days
+MAX_RESPONSE_MS = 0xFFFFFFFF
+
+# Questions without a bank id are logged with this id and left out of per-question summaries
+UNKNOWN_QUESTION = -1
+
+_MAX_QUIZ_ID = (1 << 63) - 1
+
+
+def quiz_id_from_token(token):
+    """63-bit quiz id for a hex session token"""
+    return int(token, 16) & _MAX_QUIZ_ID
+
+
+class HistoryLocked(RuntimeError):
+    """Another process is writing to the history directory"""
+
+
+def _lock_directory(directory):
+    """Hold an exclusive lock on the directory's lock file until it is closed"""
+    lock_file = open(os.path.join(directory, "writer.lock"), "a+")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock_file.close()
+        raise HistoryLocked(f"Play history {directory} is in use by another process")
+    return lock_file
+
+
+def _segment_name(number):
+    return f"segment-{number:08d}.log"
+
+
+class PlayHistory:
+    """Answer events in a segment log plus indexed summaries built from it"""
+
+    def __init__(self, directory=DEFAULT_HISTORY_DIR, flush_interval=0.2, batch_size=1000,
+                 segment_bytes=DEFAULT_SEGMENT_BYTES, fsync=True, compact_interval=60.0,
+                 keep_segments=True):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.compact_interval = compact_interval
+        self.keep_segments = keep_segments
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = _lock_directory(directory)
+
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS names (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            );
+
+            CREATE TABLE IF NOT EXISTS compaction_state (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                segment INTEGER NOT NULL,
+                offset INTEGER NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS question_history (
+                question_id INTEGER PRIMARY KEY,
+                attempts INTEGER NOT NULL,
+                correct INTEGER NOT NULL,
+                total_ms INTEGER NOT NULL,
+                choice_0 INTEGER NOT NULL,
+                choice_1 INTEGER NOT NULL,
+                choice_2 INTEGER NOT NULL,
+                choice_3 INTEGER NOT NULL,
+                last_at REAL NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS player_questions (
+                player INTEGER NOT NULL,
+                question_id INTEGER NOT NULL,
+                attempts INTEGER NOT NULL,
+                correct INTEGER NOT NULL,
+                last_correct INTEGER NOT NULL,
+                last_at REAL NOT NULL,
+                PRIMARY KEY (player, question_id)
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS player_topics (
+                player INTEGER NOT NULL,
+                topic INTEGER NOT NULL,
+                difficulty INTEGER NOT NULL,
+                attempts INTEGER NOT NULL,
+                correct INTEGER NOT NULL,
+                total_ms INTEGER NOT NULL,
+                last_at REAL NOT NULL,
+                PRIMARY KEY (player, topic, difficulty)
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS quizzes (
+                quiz_id INTEGER PRIMARY KEY,
+                player INTEGER NOT NULL,
+                topic INTEGER NOT NULL,
+                difficulty INTEGER NOT NULL,
+                answered INTEGER NOT NULL,
+                correct INTEGER NOT NULL,
+                total_ms INTEGER NOT NULL,
+                started_at REAL NOT NULL,
+                finished_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_quizzes_player ON quizzes (player, finished_at);
+            """
+        )
+        self._conn.execute("INSERT OR IGNORE INTO compaction_state (id, segment, offset) VALUES (0, 1, 0)")
+        self._conn.commit()
+        self._name_ids = dict(self._conn.execute("SELECT name, id FROM names"))
+        self._names = {i: name for name, i in self._name_ids.items()}
+
+        self._open_last_segment()
+
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._pending = []
+        self._new_names = []
+        self._closed = False
+        self._write_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._last_compaction = time.monotonic()
+
+        # Counters
+        self.events_written = 0
+        self.batches_written = 0
+        self.events_compacted = 0
+
+        self._writer = threading.Thread(target=self._write_loop, name="play-history", daemon=True)
+        self._writer.start()
+
+    def _segment_path(self, number):
+        return os.path.join(self.directory, _segment_name(number))
+
+    def _segment_numbers(self):
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith("segment-") and name.endswith(".log"):
+                numbers.append(int(name[len("segment-"):-len(".log")]))
+        return sorted(numbers)
+
+    def _open_last_segment(self):
+        numbers = self._segment_numbers()
+        self._segment = numbers[-1] if numbers else self._compaction_state()[0]
+        self._file = open(self._segment_path(self._segment), "ab")
+        # A crash mid-write can leave part of a record at the end
+        size = self._file.seek(0, os.SEEK_END)
+        if size % EVENT.size:
+            self._file.truncate(size - size % EVENT.size)
+        self._durable = (self._segment, self._file.seek(0, os.SEEK_END))
+
+    def _compaction_state(self):
+        with self._db_lock:
+            return self._conn.execute("SELECT segment, offset FROM compaction_state").fetchone()
+
+    def _name_id(self, name):
+        # Called with self._lock held
+        name = str(name)
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = len(self._name_ids) + 1
+            self._name_ids[name] = name_id
+            self._names[name_id] = name
+            self._new_names.append((name_id, name))
+        return name_id
+
+    def record(self, player, quiz_id, topic, difficulty, question_id, choice, correct, response_time, at=None):
+        """Queue one answer event; returns without touching the disk
+
+        Raises ValueError for an event the record format can't hold, so
+        one bad answer never reaches the writer.
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Play history is closed")
+            try:
+                record = EVENT.pack(
+                    time.time() if at is None else at,
+                    quiz_id,
+                    self._name_id(player),
+                    self._name_id(topic),
+                    self._name_id(difficulty),
+                    UNKNOWN_QUESTION if question_id is None else question_id,
+                    choice,
+                    bool(correct),
+                    min(MAX_RESPONSE_MS, max(0, int(response_time * 1000))),
+                )
+            except struct.error as e:
+                raise ValueError(f"Answer event can't be recorded: {e}")
+            self._pending.append(record)
+            if len(self._pending) >= self.batch_size:
+                self._wake.notify()
+
+    def _write_loop(self):
+        while True:
+            with self._lock:
+                if not self._pending and not self._closed:
+                    self._wake.wait(self.flush_interval)
+                closing = self._closed
+            try:
+                self._flush()
+            except Exception as e:
+                # The batch was put back; keep the writer alive and try again
+                print(f"error writing play history {e}")
+                metrics.increment("history.write_errors")
+                if not closing:
+                    time.sleep(self.flush_interval)
+                    continue
+            if closing:
+                return
+            if self.compact_interval is not None and \
+                    time.monotonic() - self._last_compaction >= self.compact_interval:
+                try:
+                    self.compact()
+                except Exception as e:
+                    print(f"error compacting play history {e}")
+
+    def _flush(self):
+        # One flush at a time keeps batches, and the names they use, in order
+        with self._write_lock:
+            with self._lock:
+                events, self._pending = self._pending, []
+                names, self._new_names = self._new_names, []
+            try:
+                self._write_batch(events, names)
+            except Exception:
+                self._restore(events, names)
+                raise
+
+    def _restore(self, events, names):
+        """Put a batch that failed to write back in front of newer ones"""
+        with self._lock:
+            self._pending[:0] = events
+            self._new_names[:0] = names
+        # Drop anything the failed write left past the last complete batch
+        segment, offset = self._durable
+        try:
+            self._file.close()
+        except OSError:
+            # Unwritten buffered data is discarded, the file is still closed
+            pass
+        if self._segment != segment:
+            os.remove(self._segment_path(self._segment))
+            self._segment = segment
+        os.truncate(self._segment_path(segment), offset)
+        self._file = open(self._segment_path(segment), "ab")
+
+    def _write_batch(self, events, names):
+        if not events and not names:
+            return
+
+        with metrics.span("history.flush"):
+            if names:
+                # Names reach the index before any record that refers to them
+                with self._db_lock:
+                    self._conn.executemany("INSERT OR IGNORE INTO names (id, name) VALUES (?, ?)", names)
+                    self._conn.commit()
+            if not events:
+                return
+
+            if self._file.tell() >= self.segment_bytes:
+                self._file.close()
+                self._segment += 1
+                self._file = open(self._segment_path(self._segment), "ab")
+            self._file.write(b"".join(events))
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+        self._durable = (self._segment, self._file.tell())
+        self.events_written += len(events)
+        self.batches_written += 1
+        metrics.increment("history.events", len(events))
+
+    def flush(self):
+        """Write everything recorded so far before returning"""
+        with self._lock:
+            if self._closed:
+                return
+        self._flush()
+
+    def compact(self):
+        """Fold events written since the last compaction into the summary tables"""
+        with self._compact_lock, metrics.span("history.compact"):
+            self._last_compaction = time.monotonic()
+            segment, offset = self._compaction_state()
+            durable_segment, durable_offset = self._durable
+            compacted = 0
+            while segment <= durable_segment:
+                path = self._segment_path(segment)
+                if segment == durable_segment:
+                    end = durable_offset
+                elif os.path.exists(path):
+                    end = os.path.getsize(path) // EVENT.size * EVENT.size
+                else:
+                    end = 0
+                if end > offset:
+                    compacted += self._compact_range(path, segment, offset, end)
+                if segment == durable_segment:
+                    break
+                # Sealed and fully summarized
+                segment, offset = segment + 1, 0
+                self._save_state(segment, offset)
+                if not self.keep_segments and os.path.exists(path):
+                    os.remove(path)
+            self.events_compacted += compacted
+            return compacted
+
+    def _save_state(self, segment, offset):
+        with self._db_lock:
+            self._conn.execute("UPDATE compaction_state SET segment = ?, offset = ?", (segment, offset))
+            self._conn.commit()
+
+    def _compact_range(self, path, segment, start, end):
+        questions = {}
+        player_questions = {}
+        player_topics = {}
+        quizzes = {}
+        count = 0
+
+        with open(path, "rb") as f:
+            f.seek(start)
+            position = start
+            while position < end:
+                data = f.read(min(READ_EVENTS * EVENT.size, end - position))
+                position += len(data)
+                for at, quiz_id, player, topic, difficulty, question_id, choice, correct, ms in \
+                        EVENT.iter_unpack(data):
+                    count += 1
+                    if question_id != UNKNOWN_QUESTION:
+                        row = questions.get(question_id)
+                        if row is None:
+                            row = questions[question_id] = [0, 0, 0, 0, 0, 0, 0, at]
+                        row[0] += 1
+                        row[1] += correct
+                        row[2] += ms
+                        if 0 <= choice < 4:
+                            row[3 + choice] += 1
+                        row[7] = max(row[7], at)
+
+                        row = player_questions.get((player, question_id))
+                        if row is None:
+                            row = player_questions[(player, question_id)] = [0, 0, 0, 0.0]
+                        row[0] += 1
+                        row[1] += correct
+                        if at >= row[3]:
+                            row[2], row[3] = correct, at
+
+                    row = player_topics.get((player, topic, difficulty))
+                    if row is None:
+                        row = player_topics[(player, topic, difficulty)] = [0, 0, 0, at]
+                    row[0] += 1
+                    row[1] += correct
+                    row[2] += ms
+                    row[3] = max(row[3], at)
+
+                    row = quizzes.get(quiz_id)
+                    if row is None:
+                        row = quizzes[quiz_id] = [player, topic, difficulty, 0, 0, 0, at, at]
+                    row[3] += 1
+                    row[4] += correct
+                    row[5] += ms
+                    row[6] = min(row[6], at)
+                    row[7] = max(row[7], at)
+
+        with self._db_lock:
+            # Summaries and the new log position commit together, so no event counts twice
+            self._conn.executemany(
+                """
+                INSERT INTO question_history
+                    (question_id, attempts, correct, total_ms, choice_0, choice_1, choice_2, choice_3, last_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (question_id) DO UPDATE SET
+                    attempts = attempts + excluded.attempts,
+                    correct = correct + excluded.correct,
+                    total_ms = total_ms + excluded.total_ms,
+                    choice_0 = choice_0 + excluded.choice_0,
+                    choice_1 = choice_1 + excluded.choice_1,
+                    choice_2 = choice_2 + excluded.choice_2,
+                    choice_3 = choice_3 + excluded.choice_3,
+                    last_at = MAX(last_at, excluded.last_at)
+                """,
+                [(qid, *row) for qid, row in questions.items()]
+            )
+            self._conn.executemany(
+                """
+                INSERT INTO player_questions (player, question_id, attempts, correct, last_correct, last_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (player, question_id) DO UPDATE SET
+                    attempts = attempts + excluded.attempts,
+                    correct = correct + excluded.correct,
+                    last_correct = CASE WHEN excluded.last_at >= last_at
+                                        THEN excluded.last_correct ELSE last_correct END,
+                    last_at = MAX(last_at, excluded.last_at)
+                """,
+                [(*key, *row) for key, row in player_questions.items()]
+            )
+            self._conn.executemany(
+                """
+                INSERT INTO player_topics (player, topic, difficulty, attempts, correct, total_ms, last_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (player, topic, difficulty) DO UPDATE SET
+                    attempts = attempts + excluded.attempts,
+                    correct = correct + excluded.correct,
+                    total_ms = total_ms + excluded.total_ms,
+                    last_at = MAX(last_at, excluded.last_at)
+                """,
+                [(*key, *row) for key, row in player_topics.items()]
+            )
+            self._conn.executemany(
+                """
+                INSERT INTO quizzes
+                    (quiz_id, player, topic, difficulty, answered, correct, total_ms, started_at, finished_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (quiz_id) DO UPDATE SET
+                    answered = answered + excluded.answered,
+                    correct = correct + excluded.correct,
+                    total_ms = total_ms + excluded.total_ms,
+                    started_at = MIN(started_at, excluded.started_at),
+                    finished_at = MAX(finished_at, excluded.finished_at)
+                """,
+                [(quiz_id, *row) for quiz_id, row in quizzes.items()]
+            )
+            self._conn.execute("UPDATE compaction_state SET segment = ?, offset = ?", (segment, end))
+            self._conn.commit()
+
+        metrics.increment("history.compacted", count)
+        return count
+
+    def _lookup_name(self, name):
+        with self._lock:
+            return self._name_ids.get(str(name))
+
+    def recent_quizzes(self, player, limit=10):
+        """Latest quizzes of `player`, newest first"""
+        player_id = self._lookup_name(player)
+        if player_id is None:
+            return []
+        with self._db_lock:
+            rows = self._conn.execute(
+                """
+                SELECT quiz_id, topic, difficulty, answered, correct, total_ms, started_at, finished_at
+                FROM quizzes WHERE player = ? ORDER BY finished_at DESC LIMIT ?
+                """,
+                (player_id, limit)
+            ).fetchall()
+        return [
+            {
+                "quiz_id": quiz_id,
+                "topic": self._names.get(topic),
+                "difficulty": self._names.get(difficulty),
+                "answered": answered,
+                "score": correct,
+                "percentage": correct / answered * 100 if answered else 0.0,
+                "mean_response_time": total_ms / answered / 1000 if answered else 0.0,
+                "started_at": started_at,
+                "finished_at": finished_at,
+            }
+            for quiz_id, topic, difficulty, answered, correct, total_ms, started_at, finished_at in rows
+        ]
+
+    def player_topics(self, player):
+        """Answer totals of `player` per (topic, difficulty), most recent first"""
+        player_id = self._lookup_name(player)
+        if player_id is None:
+            return []
+        with self._db_lock:
+            rows = self._conn.execute(
+                """
+                SELECT topic, difficulty, attempts, correct, total_ms, last_at
+                FROM player_topics WHERE player = ? ORDER BY last_at DESC
+                """,
+                (player_id,)
+            ).fetchall()
+        return [
+            {
+                "topic": self._names.get(topic),
+                "difficulty": self._names.get(difficulty),
+                "attempts": attempts,
+                "correct": correct,
+                "mean_response_time": total_ms / attempts / 1000 if attempts else 0.0,
+                "last_played": last_at,
+            }
+            for topic, difficulty, attempts, correct, total_ms, last_at in rows
+        ]
+
+    def seen_questions(self, player, question_ids):
+        """{question_id: (attempts, correct, last_correct)} for questions `player` has answered"""
+        player_id = self._lookup_name(player)
+        question_ids = [int(i) for i in question_ids]
+        if player_id is None or not question_ids:
+            return {}
+        seen = {}
+        with self._db_lock:
+            # Stay under SQLite's bound parameter limit
+            for start in range(0, len(question_ids), 500):
+                batch = question_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for question_id, attempts, correct, last_correct in self._conn.execute(
+                    f"""
+                    SELECT question_id, attempts, correct, last_correct FROM player_questions
+                    WHERE player = ? AND question_id IN ({placeholders})
+                    """,
+                    [player_id] + batch
+                ):
+                    seen[question_id] = (attempts, correct, bool(last_correct))
+        return seen
+
+    def question_history(self, question_id):
+        """Answer totals and choice counts for one question, or None if never answered"""
+        with self._db_lock:
+            row = self._conn.execute(
+                """
+                SELECT attempts, correct, total_ms, choice_0, choice_1, choice_2, choice_3, last_at
+                FROM question_history WHERE question_id = ?
+                """,
+                (int(question_id),)
+            ).fetchone()
+        if row is None:
+            return None
+        attempts, correct, total_ms, *choices, last_at = row
+        return {
+            "question_id": int(question_id),
+            "attempts": attempts,
+            "correct": correct,
+            "mean_response_time": total_ms / attempts / 1000 if attempts else 0.0,
+            "choices": choices,
+            "last_answered": last_at,
+        }
+
+    def quiz_results(self, until=None, batch_size=10000):
+        """Yield (player, topic, difficulty, correct, finished_at) for every summarized quiz
+
+        Only quizzes started before `until` are included when it is given.
+        Rows are read in batches so the index isn't locked while callers
+        work through them.
+        """
+        last_id = -1
+        until = float("inf") if until is None else until
+        while True:
+            with self._db_lock:
+                rows = self._conn.execute(
+                    """
+                    SELECT quiz_id, player, topic, difficulty, correct, finished_at FROM quizzes
+                    WHERE quiz_id > ? AND started_at < ? ORDER BY quiz_id LIMIT ?
+                    """,
+                    (last_id, until, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for quiz_id, player, topic, difficulty, correct, finished_at in rows:
+                yield self._names.get(player), self._names.get(topic), self._names.get(difficulty), \
+                    correct, finished_at
+            last_id = rows[-1][0]
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        segment, offset = self._compaction_state()
+        return {
+            "pending": pending,
+            "events_written": self.events_written,
+            "batches_written": self.batches_written,
+            "events_compacted": self.events_compacted,
+            "segment": self._durable[0],
+            "compacted_to": [segment, offset],
+        }
+
+    def close(self):
+        """Write pending events, run a last compaction and stop the writer"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wake.notify()
+        self._writer.join()
+        if self.compact_interval is not None:
+            self.compact()
+        self._file.close()
+        with self._db_lock:
+            self._conn.close()
+        self._lock_file.close()
@@ -0,0 +1,395 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from adaptive import LABEL_DIFFICULTY, item_difficulty
+from question_parser import normalize_question_text
+
+DEFAULT_BANK_PATH = os.environ.get(
+    "QUIZ_BANK_PATH",
+    os.path.join(os.path.expanduser("~"), ".quiz_question_bank.sqlite3")
+)
+
+
+def normalize_topic(topic):
+    return " ".join(str(topic).lower().split())
+
+
+def normalize_difficulty(difficulty):
+    return str(difficulty).strip().lower()
+
+
+class QuestionBank:
+    """Persistent SQLite store of questions indexed by topic, difficulty and tag
+
+    Every question gets a random sort key when it is inserted. Sampling
+    seeks to a random point of the (filter, key) index and takes the next
+    row, so picking a question costs one O(log n) index lookup and the
+    bank never has to be loaded into memory. Question counts per
+    (topic, difficulty) are kept in a separate table so stock checks are
+    O(1) as well.
+    """
+
+    def __init__(self, path=DEFAULT_BANK_PATH):
+        self.path = path
+        self._rng = random.Random()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY,
+                topic TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                question TEXT NOT NULL,
+                question_key TEXT NOT NULL,
+                options TEXT NOT NULL,
+                correct INTEGER NOT NULL,
+                source TEXT NOT NULL,
+                rand REAL NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_questions_key ON questions (topic, question_key);
+            CREATE INDEX IF NOT EXISTS idx_questions_topic_difficulty ON questions (topic, difficulty, rand);
+            CREATE INDEX IF NOT EXISTS idx_questions_topic ON questions (topic, rand);
+            CREATE INDEX IF NOT EXISTS idx_questions_difficulty ON questions (difficulty, rand);
+            CREATE INDEX IF NOT EXISTS idx_questions_rand ON questions (rand);
+
+            CREATE TABLE IF NOT EXISTS question_tags (
+                tag TEXT NOT NULL,
+                rand REAL NOT NULL,
+                question_id INTEGER NOT NULL,
+                PRIMARY KEY (tag, rand, question_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_question_tags_question ON question_tags (question_id);
+
+            CREATE TABLE IF NOT EXISTS question_stock (
+                topic TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (topic, difficulty)
+            );
+
+            CREATE TABLE IF NOT EXISTS question_stats (
+                question_id INTEGER PRIMARY KEY,
+                attempts INTEGER NOT NULL,
+                correct INTEGER NOT NULL,
+                discrimination REAL,
+                updated_at REAL NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS question_params (
+                question_id INTEGER PRIMARY KEY,
+                topic TEXT NOT NULL,
+                b REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_question_params_topic ON question_params (topic, b);
+            """
+        )
+        self._conn.commit()
+        self._params_backfilled = False
+
+    def add_questions(self, questions, topic, difficulty, tags=(), source="llm"):
+        """Insert questions and return their ids
+
+        Questions already in the bank for this topic (same normalized text)
+        are skipped and their existing id is returned instead.
+        """
+        topic = normalize_topic(topic)
+        difficulty = normalize_difficulty(difficulty)
+        tags = [t.strip().lower() for t in tags if t.strip()]
+        now = time.time()
+        ids = []
+
+        with self._lock:
+            added = 0
+            for q in questions:
+                question_key = normalize_question_text(q["question"])
+                rand = self._rng.random()
+                cursor = self._conn.execute(
+                    """
+                    INSERT OR IGNORE INTO questions
+                        (topic, difficulty, question, question_key, options, correct, source, rand, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (topic, difficulty, q["question"], question_key,
+                     json.dumps(q["options"]), q["correct"], source, rand, now)
+                )
+                if cursor.rowcount:
+                    question_id = cursor.lastrowid
+                    added += 1
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO question_params (question_id, topic, b) VALUES (?, ?, ?)",
+                        (question_id, topic, item_difficulty(difficulty))
+                    )
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO question_tags (tag, rand, question_id) VALUES (?, ?, ?)",
+                        [(tag, rand, question_id) for tag in tags]
+                    )
+                else:
+                    question_id = self._conn.execute(
+                        "SELECT id FROM questions WHERE topic = ? AND question_key = ?",
+                        (topic, question_key)
+                    ).fetchone()[0]
+                ids.append(question_id)
+
+            if added:
+                self._conn.execute(
+                    """
+                    INSERT INTO question_stock (topic, difficulty, count) VALUES (?, ?, ?)
+                    ON CONFLICT (topic, difficulty) DO UPDATE SET count = count + excluded.count
+                    """,
+                    (topic, difficulty, added)
+                )
+            self._conn.commit()
+        return ids
+
+    def count(self, topic=None, difficulty=None):
+        """Number of stored questions matching the filter"""
+        where, params = [], []
+        if topic is not None:
+            where.append("topic = ?")
+            params.append(normalize_topic(topic))
+        if difficulty is not None:
+            where.append("difficulty = ?")
+            params.append(normalize_difficulty(difficulty))
+        sql = "SELECT COALESCE(SUM(count), 0) FROM question_stock"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+
+    def topics(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT topic FROM question_stock").fetchall()
+        return [row[0] for row in rows]
+
+    def _row_to_question(self, row):
+        question_id, topic, difficulty, question, options, correct = row
+        return {
+            "id": question_id,
+            "question": question,
+            "options": json.loads(options),
+            "correct": correct,
+            "topic": topic,
+            "difficulty": difficulty,
+        }
+
+    def get(self, question_ids):
+        """Fetch questions by id, in the order given"""
+        question_ids = list(question_ids)
+        if not question_ids:
+            return []
+        placeholders = ",".join("?" * len(question_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT id, topic, difficulty, question, options, correct
+                FROM questions WHERE id IN ({placeholders})
+                """,
+                question_ids
+            ).fetchall()
+        by_id = {row[0]: self._row_to_question(row) for row in rows}
+        return [by_id[i] for i in question_ids if i in by_id]
+
+    def _seek_sql(self, topic, difficulty, tag):
+        if tag is not None:
+            return (
+                "SELECT question_id FROM question_tags WHERE tag = ? AND rand >= ? "
+                "ORDER BY rand LIMIT ?",
+                [tag.strip().lower()]
+            )
+        where, params = [], []
+        if topic is not None:
+            where.append("topic = ?")
+            params.append(normalize_topic(topic))
+        if difficulty is not None:
+            where.append("difficulty = ?")
+            params.append(normalize_difficulty(difficulty))
+        where.append("rand >= ?")
+        return (
+            f"SELECT id FROM questions WHERE {' AND '.join(where)} ORDER BY rand LIMIT ?",
+            params
+        )
+
+    def sample_ids(self, k, topic=None, difficulty=None, tag=None):
+        """Ids of up to `k` distinct random questions matching the filter"""
+        sql, params = self._seek_sql(topic, difficulty, tag)
+        ids = []
+        seen = set()
+        attempts = 0
+
+        with self._lock:
+            while len(ids) < k and attempts < k * 4:
+                attempts += 1
+                row = self._conn.execute(sql, params + [self._rng.random(), 1]).fetchone()
+                if row is None:
+                    # Ran off the end of the index, wrap around to the start
+                    row = self._conn.execute(sql, params + [0.0, 1]).fetchone()
+                    if row is None:
+                        break
+                if row[0] not in seen:
+                    seen.add(row[0])
+                    ids.append(row[0])
+
+            if len(ids) < k and attempts:
+                # Small pools keep colliding, take a run of rows instead
+                for start in (self._rng.random(), 0.0):
+                    rows = self._conn.execute(sql, params + [start, 2 * k]).fetchall()
+                    for (question_id,) in rows:
+                        if len(ids) == k:
+                            break
+                        if question_id not in seen:
+                            seen.add(question_id)
+                            ids.append(question_id)
+        return ids
+
+    def sample(self, k, topic=None, difficulty=None, tag=None):
+        """Up to `k` distinct random questions matching the filter"""
+        return self.get(self.sample_ids(k, topic, difficulty, tag))
+
+    def record_item_stats(self, rows):
+        """Add (question_id, attempts, correct, discrimination) results
+
+        Attempt and correct counts accumulate across calls, the
+        discrimination index is replaced. Returns the running
+        {question_id: (attempts, correct)} totals for the given questions.
+        """
+        rows = [(int(qid), int(attempts), int(correct), discrimination, time.time())
+                for qid, attempts, correct, discrimination in rows]
+        if not rows:
+            return {}
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT INTO question_stats (question_id, attempts, correct, discrimination, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (question_id) DO UPDATE SET
+                    attempts = attempts + excluded.attempts,
+                    correct = correct + excluded.correct,
+                    discrimination = COALESCE(excluded.discrimination, discrimination),
+                    updated_at = excluded.updated_at
+                """,
+                rows
+            )
+            self._conn.commit()
+            totals = {}
+            ids = [row[0] for row in rows]
+            # Stay under SQLite's bound parameter limit
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for qid, attempts, correct in self._conn.execute(
+                    f"SELECT question_id, attempts, correct FROM question_stats "
+                    f"WHERE question_id IN ({placeholders})",
+                    batch
+                ):
+                    totals[qid] = (attempts, correct)
+        return totals
+
+    def relabel(self, difficulties):
+        """Move questions to new difficulty labels; returns how many changed
+
+        `difficulties` maps question ids to labels. Stock counts are
+        adjusted so count() stays exact.
+        """
+        changed = 0
+        with self._lock:
+            for question_id, difficulty in difficulties.items():
+                difficulty = normalize_difficulty(difficulty)
+                row = self._conn.execute(
+                    "SELECT topic, difficulty FROM questions WHERE id = ?", (int(question_id),)
+                ).fetchone()
+                if row is None or row[1] == difficulty:
+                    continue
+                topic, old = row
+                self._conn.execute(
+                    "UPDATE questions SET difficulty = ? WHERE id = ?", (difficulty, int(question_id))
+                )
+                self._conn.execute(
+                    "UPDATE question_stock SET count = count - 1 WHERE topic = ? AND difficulty = ?",
+                    (topic, old)
+                )
+                self._conn.execute(
+                    """
+                    INSERT INTO question_stock (topic, difficulty, count) VALUES (?, ?, 1)
+                    ON CONFLICT (topic, difficulty) DO UPDATE SET count = count + 1
+                    """,
+                    (topic, difficulty)
+                )
+                changed += 1
+            self._conn.commit()
+        return changed
+
+    def item_params(self, topic):
+        """(difficulty, question_id) for every question on `topic`, easiest first"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT b, question_id FROM question_params WHERE topic = ? ORDER BY b",
+                (normalize_topic(topic),)
+            ).fetchall()
+
+    def items_near(self, topic, b, k):
+        """Up to `k` (difficulty, question_id) pairs on each side of difficulty `b`"""
+        topic = normalize_topic(topic)
+        with self._lock:
+            above = self._conn.execute(
+                "SELECT b, question_id FROM question_params WHERE topic = ? AND b >= ? ORDER BY b LIMIT ?",
+                (topic, b, k)
+            ).fetchall()
+            below = self._conn.execute(
+                "SELECT b, question_id FROM question_params WHERE topic = ? AND b < ? ORDER BY b DESC LIMIT ?",
+                (topic, b, k)
+            ).fetchall()
+        return below[::-1] + above
+
+    def backfill_item_params(self):
+        """Give questions stored before item parameters existed one from their label
+
+        Runs once per bank; returns how many questions were filled in.
+        """
+        if self._params_backfilled:
+            return 0
+        prior = " ".join(f"WHEN '{label}' THEN {item_difficulty(label)}" for label in LABEL_DIFFICULTY)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"""
+                INSERT OR IGNORE INTO question_params (question_id, topic, b)
+                SELECT q.id, q.topic, CASE q.difficulty {prior} ELSE 0.0 END
+                FROM questions q LEFT JOIN question_params p ON p.question_id = q.id
+                WHERE p.question_id IS NULL
+                """
+            )
+            self._conn.commit()
+            self._params_backfilled = True
+            return cursor.rowcount
+
+    def refresh_item_params(self, question_ids):
+        """Recompute difficulty parameters from labels and answer statistics"""
+        question_ids = [int(i) for i in question_ids]
+        with self._lock:
+            for start in range(0, len(question_ids), 500):
+                batch = question_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"""
+                    SELECT q.id, q.topic, q.difficulty, COALESCE(s.attempts, 0), COALESCE(s.correct, 0)
+                    FROM questions q LEFT JOIN question_stats s ON s.question_id = q.id
+                    WHERE q.id IN ({placeholders})
+                    """,
+                    batch
+                ).fetchall()
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO question_params (question_id, topic, b) VALUES (?, ?, ?)",
+                    [(qid, topic, item_difficulty(difficulty, attempts, correct))
+                     for qid, topic, difficulty, attempts, correct in rows]
+                )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
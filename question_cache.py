@@ -0,0 +1,168 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+from dedup_index import remove_near_duplicates
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "QUIZ_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".quiz_question_cache.sqlite3")
+)
+
+
+class QuestionCache:
+    """Persistent SQLite cache of validated question lists
+
+    Entries are keyed on the normalized (topic, difficulty, num_questions),
+    only ever hold exactly num_questions questions and expire after `ttl`
+    seconds. When more than `max_entries` rows are
+    stored the least recently used ones are evicted.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=7 * 24 * 3600, max_entries=500):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS question_cache (
+                key TEXT PRIMARY KEY,
+                questions TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cache_last_access ON question_cache (last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(topic, difficulty, num_questions):
+        """Normalize the lookup parameters into a single cache key"""
+        topic = " ".join(str(topic).lower().split())
+        difficulty = str(difficulty).strip().lower()
+        return f"{topic}|{difficulty}|{int(num_questions)}"
+
+    def get(self, topic, difficulty, num_questions):
+        """Return the cached question list or None on a miss"""
+        key = self.make_key(topic, difficulty, num_questions)
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT questions, created_at FROM question_cache WHERE key = ?",
+                (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                metrics.increment("cache.misses")
+                return None
+
+            questions_json, created_at = row
+            questions = json.loads(questions_json)
+            # Short lists from before put() refused them are misses too
+            if (self.ttl is not None and now - created_at > self.ttl) or len(questions) != num_questions:
+                # Expired or short entry, drop it
+                self._conn.execute("DELETE FROM question_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                self.misses += 1
+                metrics.increment("cache.evictions")
+                metrics.increment("cache.misses")
+                return None
+
+            self._conn.execute(
+                "UPDATE question_cache SET last_access = ? WHERE key = ?",
+                (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            metrics.increment("cache.hits")
+
+        return questions
+
+    def put(self, topic, difficulty, num_questions, questions):
+        """Store a validated question list; returns False if it isn't cached
+
+        Near-duplicate items are dropped first, and a list left shorter
+        than `num_questions` isn't stored, so a hit is always a full quiz.
+        """
+        questions = remove_near_duplicates(questions)
+        if len(questions) != num_questions:
+            return False
+        key = self.make_key(topic, difficulty, num_questions)
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO question_cache (key, questions, created_at, last_access)
+                VALUES (?, ?, ?, ?)
+                """,
+                (key, json.dumps(questions), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+        return True
+
+    def _evict(self, now):
+        # Drop expired entries first, then the least recently used ones
+        if self.ttl is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM question_cache WHERE created_at < ?",
+                (now - self.ttl,)
+            )
+            self.evictions += cursor.rowcount
+            metrics.increment("cache.evictions", cursor.rowcount)
+
+        count = self._conn.execute("SELECT COUNT(*) FROM question_cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                """
+                DELETE FROM question_cache WHERE key IN (
+                    SELECT key FROM question_cache ORDER BY last_access ASC LIMIT ?
+                )
+                """,
+                (overflow,)
+            )
+            self.evictions += overflow
+            metrics.increment("cache.evictions", overflow)
+
+    def clear(self):
+        """Remove every cached entry"""
+        with self._lock:
+            self._conn.execute("DELETE FROM question_cache")
+            self._conn.commit()
+
+    def stats(self):
+        """Return hit/miss counters and the current size"""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM question_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": size,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
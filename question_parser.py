@@ -0,0 +1,313 @@
+import json
+import re
+
+REQUIRED_KEYS = ("question", "options", "correct")
+
+# Response schema for backends with JSON-constrained output
+QUESTION_LIST_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "question": {"type": "STRING"},
+            "options": {"type": "ARRAY", "items": {"type": "STRING"}},
+            "correct": {"type": "INTEGER"}
+        },
+        "required": ["question", "options", "correct"]
+    }
+}
+
+
+def validate_question(q):
+    """Raise ValueError if a question dict doesn't have the expected structure"""
+    if not isinstance(q, dict):
+        raise ValueError("Question is not an object")
+    if not all(key in q for key in REQUIRED_KEYS):
+        raise ValueError("Missing required keys in question")
+    if not isinstance(q["options"], list) or len(q["options"]) != 4:
+        raise ValueError("Each question must have exactly 4 options")
+    if not isinstance(q["correct"], int) or not (0 <= q["correct"] <= 3):
+        raise ValueError("Correct answer index must be between 0-3")
+
+
+def is_valid_question(q):
+    try:
+        validate_question(q)
+    except ValueError:
+        return False
+    return True
+
+
+def normalize_question_text(text):
+    """Lowercase and strip punctuation so trivially different questions compare equal"""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", str(text).lower()).split())
+
+
+class IncrementalArrayParser:
+    """Parse a JSON array of objects while its text is still arriving
+
+    Call feed() with each chunk of the response; it returns the objects
+    that became complete with that chunk. Every character is scanned once,
+    so the cost stays linear in the response size.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self.finished = False
+
+        # Scanner state for the object currently being read
+        self._obj_start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk):
+        items = []
+        if self.finished or not chunk:
+            return items
+
+        self._buffer += chunk
+        buffer = self._buffer
+        pos = self._pos
+
+        if not self._started:
+            start = buffer.find("[", pos)
+            if start == -1:
+                self._pos = len(buffer)
+                return items
+            self._started = True
+            pos = start + 1
+
+        while pos < len(buffer):
+            ch = buffer[pos]
+
+            if self._obj_start is None:
+                # Between items: skip separators until the next object or the end
+                if ch == "{":
+                    self._obj_start = pos
+                    self._depth = 1
+                elif ch == "]":
+                    self.finished = True
+                    pos += 1
+                    break
+                pos += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    text = buffer[self._obj_start:pos + 1]
+                    self._obj_start = None
+                    try:
+                        items.append(json.loads(text))
+                    except json.JSONDecodeError:
+                        pass
+            pos += 1
+
+        # Drop the consumed prefix so the buffer only holds the open item
+        keep_from = self._obj_start if self._obj_start is not None else pos
+        self._buffer = buffer[keep_from:]
+        if self._obj_start is not None:
+            self._obj_start = 0
+        self._pos = pos - keep_from
+        return items
+
+    def close(self):
+        """End of the stream; an unfinished object is dropped"""
+        self.finished = True
+        return []
+
+
+def coerce_question(q):
+    """Repair common near-misses in a question object, or return None
+
+    Accepts the correct answer as a numeric string, an option letter
+    ("C") or the option text itself, and strips surrounding whitespace.
+    """
+    if not isinstance(q, dict) or not all(key in q for key in REQUIRED_KEYS):
+        return None
+    options = q["options"]
+    if not isinstance(options, list):
+        return None
+
+    options = [str(option).strip() for option in options]
+    correct = q["correct"]
+    if isinstance(correct, str):
+        text = correct.strip()
+        if text.isdigit():
+            correct = int(text)
+        elif len(text) == 1 and text.upper() in "ABCD":
+            correct = "ABCD".index(text.upper())
+        elif text in options:
+            correct = options.index(text)
+
+    fixed = dict(q, question=str(q["question"]).strip(), options=options, correct=correct)
+    if not is_valid_question(fixed):
+        return None
+    return fixed
+
+
+def parse_questions(text):
+    """Salvage every valid question from a possibly malformed response
+
+    Handles code fences and chatty text around the array, trailing commas,
+    truncated output (the incomplete last item is dropped) and individual
+    bad items. Returns (questions, rejected) where rejected counts the
+    items that were found but could not be used.
+    """
+    questions = []
+    rejected = 0
+
+    start = text.find("[")
+    end = text.rfind("]")
+    if start != -1 and end > start:
+        # Well-formed responses are the common case and json.loads is far
+        # faster than the salvaging parser, which only runs when this fails
+        try:
+            items = json.loads(text[start:end + 1])
+        except ValueError:
+            items = None
+        if isinstance(items, list):
+            for item in items:
+                fixed = coerce_question(item)
+                if fixed is None:
+                    rejected += 1
+                else:
+                    questions.append(fixed)
+            return questions, rejected
+
+    while start != -1:
+        parser = IncrementalArrayParser()
+        items = parser.feed(text[start:])
+        if items:
+            for item in items:
+                fixed = coerce_question(item)
+                if fixed is None:
+                    rejected += 1
+                else:
+                    questions.append(fixed)
+            return questions, rejected
+        # A stray bracket in the text before the real array, try the next one
+        start = text.find("[", start + 1)
+
+    # No array at all, maybe the model returned a single object
+    brace = text.find("{")
+    if brace != -1:
+        items = IncrementalArrayParser().feed("[" + text[brace:])
+        for item in items:
+            fixed = coerce_question(item)
+            if fixed is None:
+                rejected += 1
+            else:
+                questions.append(fixed)
+    return questions, rejected
+
+
+# Compact alternative to JSON: one question per line,
+#     question|option A|option B|option C|option D|answer letter
+# No keys are repeated per item, so responses need far fewer output tokens.
+LINE_SEPARATOR = "|"
+LINE_FIELDS = 6
+
+
+def format_line_question(q):
+    """Render a question dict in the line format"""
+    fields = [q["question"]] + list(q["options"]) + ["ABCD"[q["correct"]]]
+    return LINE_SEPARATOR.join(str(field).replace(LINE_SEPARATOR, "/") for field in fields)
+
+
+def parse_line_question(line):
+    """Question dict from one line, None for prose lines, False if malformed"""
+    if LINE_SEPARATOR not in line:
+        return None
+    fields = line.split(LINE_SEPARATOR)
+    if len(fields) != LINE_FIELDS:
+        return False
+
+    question = fields[0].strip()
+    # Models sometimes number the lines anyway: "3. What is..." or "3) What is..."
+    head = question[:4]
+    for marker in (". ", ") "):
+        cut = head.find(marker)
+        if cut > 0 and head[:cut].isdigit():
+            question = question[cut + 2:]
+            break
+
+    answer = fields[5].strip().upper()
+    if len(answer) == 1 and answer in "ABCD":
+        correct = "ABCD".index(answer)
+    elif answer.isdigit() and int(answer) <= 3:
+        correct = int(answer)
+    else:
+        return False
+
+    options = [field.strip() for field in fields[1:5]]
+    if not question or not all(options):
+        return False
+    return {"question": question, "options": options, "correct": correct}
+
+
+class IncrementalLineParser:
+    """Line-format counterpart of IncrementalArrayParser
+
+    feed() returns the questions completed by each chunk. Only the
+    trailing partial line is kept between chunks, and lines are split
+    with str methods, never decoded as JSON. Call close() at the end of
+    the stream to parse a final line without a newline.
+    """
+
+    def __init__(self):
+        self._partial = ""
+        self.rejected = 0
+
+    def _parse(self, lines):
+        questions = []
+        for line in lines:
+            q = parse_line_question(line)
+            if q is False:
+                self.rejected += 1
+            elif q is not None:
+                questions.append(q)
+        return questions
+
+    def feed(self, chunk):
+        if not chunk:
+            return []
+        lines = (self._partial + chunk).split("\n")
+        self._partial = lines.pop()
+        return self._parse(lines)
+
+    def close(self):
+        partial, self._partial = self._partial, ""
+        return self._parse([partial])
+
+
+def parse_line_questions(text):
+    """Line-format counterpart of parse_questions, returns (questions, rejected)
+
+    A truncated last line is dropped like a truncated JSON item, since it
+    fails the field count or the answer check.
+    """
+    parser = IncrementalLineParser()
+    questions = parser.feed(text)
+    questions += parser.close()
+    return questions, parser.rejected
+
+
+def parse_response(text, wire_format="json"):
+    if wire_format == "lines":
+        return parse_line_questions(text)
+    return parse_questions(text)
@@ -0,0 +1,488 @@
+"""UI-independent quiz logic shared by the Tk app and the HTTP service"""
+import itertools
+import threading
+import time
+import weakref
+
+import metrics
+from catalog import catalog_topic
+from dedup_index import NearDuplicateIndex
+from llm_backends import LazyBackend
+from question_cache import QuestionCache
+from question_parser import (QUESTION_LIST_SCHEMA, IncrementalArrayParser, IncrementalLineParser,
+                             coerce_question, parse_response)
+from rate_limiter import RateLimiter
+from resilience import CircuitOpenError, ResilientBackend
+
+# Quizzes larger than one chunk are generated as concurrent chunks
+LARGE_QUIZ_CHUNK_SIZE = 10
+LARGE_QUIZ_WORKERS = 4
+LARGE_QUIZ_REQUESTS_PER_SECOND = 2
+
+# backend -> RateLimiter shared by every large quiz on that backend
+_large_quiz_limiters = weakref.WeakKeyDictionary()
+_large_quiz_limiters_lock = threading.Lock()
+
+# Follow-up requests for questions missing from an imperfect response
+MAX_TOP_UP_REQUESTS = 2
+
+# Serve quizzes from the bank once it holds this many times the quiz size
+BANK_MIN_STOCK_FACTOR = 3
+
+
+def large_quiz_rate_limiter(backend):
+    """The chunk rate limiter for `backend`, shared by concurrent large quizzes"""
+    with _large_quiz_limiters_lock:
+        limiter = _large_quiz_limiters.get(backend)
+        if limiter is None:
+            limiter = _large_quiz_limiters[backend] = RateLimiter(
+                LARGE_QUIZ_REQUESTS_PER_SECOND, burst=LARGE_QUIZ_WORKERS
+            )
+        return limiter
+
+
+def min_bank_stock(topic, num_questions):
+    """Bank stock needed to serve a quiz without calling the model
+
+    catalog_warmer keeps catalog topics topped up with fresh questions,
+    so one quiz's worth is enough there. Other topics need several times
+    the quiz size for a varied quiz.
+    """
+    if catalog_topic(topic) is not None:
+        return num_questions
+    return num_questions * BANK_MIN_STOCK_FACTOR
+
+
+class QuizGenerator:
+    def __init__(self, backend=None, cache=None, use_cache=True, dedup_index=None, bank=None):
+        # Gemini by default, see llm_backends.create_backend for the others.
+        # Built on first generation so cached and bank quizzes start fast, and
+        # wrapped with deadlines, hedging, retries and a circuit breaker
+        self.backend = backend if backend is not None else ResilientBackend(LazyBackend())
+        # Persistent cache so repeat quizzes don't hit the network
+        if cache is None and use_cache:
+            cache = QuestionCache()
+        self.cache = cache
+        # Questions already produced this session, so reworded repeats are rejected
+        self.dedup_index = dedup_index if dedup_index is not None else NearDuplicateIndex()
+        # Every generated question is also kept in the bank when one is given
+        self.bank = bank
+
+        # Counters
+        self.requests = 0
+        self.top_up_requests = 0
+        self.rejected_items = 0
+        self.duplicates_rejected = 0
+        self.degraded = 0
+
+    def wire_format(self):
+        return getattr(self.backend, "wire_format", "json")
+
+    def json_schema(self):
+        if self.wire_format() == "json" and getattr(self.backend, "supports_json_mode", False):
+            return QUESTION_LIST_SCHEMA
+        return None
+
+    def build_prompt(self, topic, difficulty, num_questions, extra_instructions=""):
+        if self.wire_format() == "lines":
+            return self.build_line_prompt(topic, difficulty, num_questions, extra_instructions)
+        if extra_instructions:
+            extra_instructions = f"\n        - {extra_instructions}"
+        return f"""
+        Create exactly {num_questions} multiple choice quiz questions about {topic} with {difficulty} difficulty level.
+
+        Requirements:
+        - Each question should have exactly 4 options (A, B, C, D)
+        - Only one correct answer per question
+        - Questions should be appropriate for {difficulty} level
+        - Return the response in valid JSON format only, no additional text{extra_instructions}
+
+        Format your response as a JSON array like this:
+        [
+            {{
+                "question": "Your question here?",
+                "options": ["Option A", "Option B", "Option C", "Option D"],
+                "correct": 0
+            }},
+            {{
+                "question": "Another question?",
+                "options": ["Option A", "Option B", "Option C", "Option D"], 
+                "correct": 2
+            }}
+        ]
+
+        Topic: {topic}
+        Difficulty: {difficulty}
+        Number of questions: {num_questions}
+        """
+
+    def build_line_prompt(self, topic, difficulty, num_questions, extra_instructions=""):
+        """Short prompt for the pipe-delimited line format"""
+        if extra_instructions:
+            extra_instructions = f"\n{extra_instructions}"
+        return (
+            f"Write exactly {num_questions} multiple choice questions about {topic} with {difficulty} difficulty.\n"
+            f"One question per line, no numbering or other text:\n"
+            f"question|option A|option B|option C|option D|correct letter\n"
+            f"Never use | inside a field.{extra_instructions}"
+        )
+
+    def request_questions(self, prompt):
+        """Send one prompt to the model and return every valid question in the response"""
+        self.requests += 1
+        metrics.increment("generator.requests")
+        with metrics.span("llm.generate"):
+            response_text = self.backend.generate(prompt, json_schema=self.json_schema())
+
+        # Keep the good items even if others are broken or the array is cut off
+        with metrics.span("parse.questions"):
+            questions, rejected = parse_response(response_text, self.wire_format())
+        self.rejected_items += rejected
+        metrics.increment("generator.rejected_items", rejected)
+        if not questions:
+            raise ValueError("No valid questions in response")
+
+        return questions
+
+    def top_up_prompt(self, topic, difficulty, missing, questions):
+        """Prompt asking only for the questions still missing"""
+        have = "; ".join(q["question"] for q in questions)
+        return self.build_prompt(
+            topic, difficulty, missing,
+            extra_instructions=f"Do not repeat any of these questions: {have}"
+        )
+
+    def save_generated(self, topic, difficulty, num_questions, questions):
+        """Keep freshly generated questions, never the fallback ones"""
+        if self.bank is not None:
+            ids = self.bank.add_questions(questions, topic, difficulty)
+            for q, question_id in zip(questions, ids):
+                q["id"] = question_id
+
+        # Only complete lists are cached
+        if self.cache is not None and len(questions) == num_questions:
+            self.cache.put(topic, difficulty, num_questions, questions)
+
+    def upstream_available(self):
+        """False while the backend's circuit breaker is refusing calls"""
+        available = getattr(self.backend, "available", None)
+        return available is None or available()
+
+    def degraded_questions(self, topic, difficulty, num_questions):
+        """Stored questions to serve when the model can't be used
+
+        Prefers the requested difficulty and tops up from the rest of the
+        topic. Returns an empty list without a bank.
+        """
+        if self.bank is None:
+            return []
+        questions = self.bank.sample(num_questions, topic, difficulty)
+        if len(questions) < num_questions:
+            have = {q["id"] for q in questions}
+            extra = [q for q in self.bank.sample(num_questions, topic) if q["id"] not in have]
+            questions += extra[:num_questions - len(questions)]
+        if questions:
+            self.degraded += 1
+            metrics.increment("generator.degraded")
+        return questions
+
+    def dedup_namespace(self, topic):
+        return " ".join(str(topic).lower().split())
+
+    def remember(self, topic, questions):
+        """Record questions served without generation, e.g. from the cache"""
+        namespace = self.dedup_namespace(topic)
+        for q in questions:
+            self.dedup_index.add(q, namespace)
+
+    def add_unique(self, questions, topic, new_questions, limit):
+        """Append questions that don't near-duplicate one seen before, up to `limit` total"""
+        namespace = self.dedup_namespace(topic)
+        added = []
+        for q in new_questions:
+            if len(questions) >= limit:
+                break
+            if not self.dedup_index.add(q, namespace):
+                self.duplicates_rejected += 1
+                metrics.increment("generator.duplicates_rejected")
+                continue
+            questions.append(q)
+            added.append(q)
+        return added
+
+    def generate_questions(self, topic, difficulty, num_questions = 5, fallback=True):
+        """Generate quiz questions using the configured LLM backend
+
+        A response with some bad items keeps the good ones and only the
+        missing count is requested again, up to MAX_TOP_UP_REQUESTS times.
+        """
+        if num_questions > LARGE_QUIZ_CHUNK_SIZE:
+            return list(self.generate_questions_chunked(topic, difficulty, num_questions, fallback=fallback))
+
+        if self.cache is not None:
+            cached = self.cache.get(topic, difficulty, num_questions)
+            if cached:
+                self.remember(topic, cached)
+                return cached
+
+        if not self.upstream_available():
+            degraded = self.degraded_questions(topic, difficulty, num_questions)
+            if degraded:
+                return degraded
+
+        questions = []
+        last_error = None
+
+        for attempt in range(1 + MAX_TOP_UP_REQUESTS):
+            missing = num_questions - len(questions)
+            if missing <= 0:
+                break
+            if attempt == 0:
+                prompt = self.build_prompt(topic, difficulty, num_questions)
+            else:
+                self.top_up_requests += 1
+                metrics.increment("generator.top_up_requests")
+                prompt = self.top_up_prompt(topic, difficulty, missing, questions)
+
+            try:
+                batch = self.request_questions(prompt)
+            except CircuitOpenError as e:
+                last_error = e
+                break
+            except Exception as e:
+                print(f"error generating questions {e}")
+                metrics.increment("generator.errors")
+                last_error = e
+                continue
+            self.add_unique(questions, topic, batch, num_questions)
+
+        if not questions:
+            degraded = self.degraded_questions(topic, difficulty, num_questions)
+            if degraded:
+                return degraded
+            if not fallback:
+                raise last_error or ValueError("No questions generated")
+            metrics.increment("generator.fallbacks")
+            return self.get_fallback_questions(topic, difficulty)
+
+        self.save_generated(topic, difficulty, num_questions, questions)
+        return questions
+
+    def generate_questions_stream(self, topic, difficulty, num_questions = 5):
+        """Yield validated questions as soon as each one is parsed from the stream"""
+        if num_questions > LARGE_QUIZ_CHUNK_SIZE:
+            yield from self.generate_questions_chunked(topic, difficulty, num_questions)
+            return
+
+        if self.cache is not None:
+            cached = self.cache.get(topic, difficulty, num_questions)
+            if cached:
+                self.remember(topic, cached)
+                yield from cached
+                return
+
+        if not self.upstream_available():
+            degraded = self.degraded_questions(topic, difficulty, num_questions)
+            if degraded:
+                yield from degraded
+                return
+
+        prompt = self.build_prompt(topic, difficulty, num_questions)
+        if self.wire_format() == "lines":
+            parser = IncrementalLineParser()
+        else:
+            parser = IncrementalArrayParser()
+        questions = []
+        started = time.perf_counter()
+
+        try:
+            self.requests += 1
+            metrics.increment("generator.requests")
+            chunks = self.backend.generate_stream(prompt, json_schema=self.json_schema())
+            for chunk in itertools.chain(chunks, [None]):
+                # None marks the end of the stream and flushes a last unterminated line
+                items = parser.close() if chunk is None else parser.feed(chunk)
+                for item in items:
+                    # Skip malformed items instead of failing the whole stream
+                    q = coerce_question(item)
+                    if q is None:
+                        self.rejected_items += 1
+                        metrics.increment("generator.rejected_items")
+                        continue
+                    added = self.add_unique(questions, topic, [q], num_questions)
+                    if added and len(questions) == 1:
+                        metrics.observe("llm.stream.first_question", time.perf_counter() - started)
+                    yield from added
+                    if len(questions) == num_questions:
+                        break
+                if len(questions) == num_questions:
+                    break
+            # Release the stream now rather than when it is collected, so the
+            # backend sees a stream we stopped reading as finished
+            chunks.close()
+            # Malformed lines are counted by the line parser itself
+            rejected = getattr(parser, "rejected", 0)
+            self.rejected_items += rejected
+            metrics.increment("generator.rejected_items", rejected)
+            metrics.observe("llm.stream", time.perf_counter() - started)
+        except Exception as e:
+            print(f"error streaming questions {e}")
+            metrics.increment("generator.errors")
+
+        # Ask only for what the stream didn't deliver
+        for _ in range(MAX_TOP_UP_REQUESTS):
+            missing = num_questions - len(questions)
+            if missing <= 0 or not self.upstream_available():
+                break
+            self.top_up_requests += 1
+            metrics.increment("generator.top_up_requests")
+            try:
+                batch = self.request_questions(self.top_up_prompt(topic, difficulty, missing, questions))
+            except Exception as e:
+                print(f"error generating questions {e}")
+                metrics.increment("generator.errors")
+                continue
+            yield from self.add_unique(questions, topic, batch, num_questions)
+
+        if not questions:
+            degraded = self.degraded_questions(topic, difficulty, num_questions)
+            if degraded:
+                yield from degraded
+                return
+            metrics.increment("generator.fallbacks")
+            yield from self.get_fallback_questions(topic, difficulty)
+            return
+
+        self.save_generated(topic, difficulty, num_questions, questions)
+
+    def generate_chunk(self, topic, difficulty, num_questions, part, parts, rate_limiter):
+        """Generate one chunk of a large quiz"""
+        rate_limiter.acquire()
+        prompt = self.build_prompt(
+            topic, difficulty, num_questions,
+            extra_instructions=(
+                f"This is part {part + 1} of {parts} of a larger quiz, cover a different "
+                f"subtopic than the other parts so questions don't repeat"
+            )
+        )
+        return self.request_questions(prompt)
+
+    def generate_questions_chunked(self, topic, difficulty, num_questions,
+                                   chunk_size=LARGE_QUIZ_CHUNK_SIZE, max_workers=LARGE_QUIZ_WORKERS,
+                                   rate_limiter=None, max_rounds=3, fallback=True):
+        """Yield questions for a large quiz generated as concurrent chunks
+
+        Chunks run on a bounded worker pool behind a rate limiter, by
+        default the one every large quiz on this backend shares, and are
+        merged as they finish. Duplicates across chunks are dropped and the
+        questions are renumbered in merge order. A failed chunk only loses
+        its own questions; the shortfall is requested again in later rounds.
+        """
+        if self.cache is not None:
+            cached = self.cache.get(topic, difficulty, num_questions)
+            if cached:
+                self.remember(topic, cached)
+                yield from cached
+                return
+
+        if not self.upstream_available():
+            degraded = self.degraded_questions(topic, difficulty, num_questions)
+            if degraded:
+                yield from degraded
+                return
+
+        # Imported here since concurrent.futures loads logging, which slows startup
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        if rate_limiter is None:
+            rate_limiter = large_quiz_rate_limiter(self.backend)
+
+        questions = []
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quiz-chunk")
+
+        try:
+            for _ in range(max_rounds):
+                shortfall = num_questions - len(questions)
+                if shortfall <= 0 or not self.upstream_available():
+                    break
+
+                sizes = [chunk_size] * (shortfall // chunk_size)
+                if shortfall % chunk_size:
+                    sizes.append(shortfall % chunk_size)
+
+                futures = [
+                    executor.submit(self.generate_chunk, topic, difficulty, size, i, len(sizes), rate_limiter)
+                    for i, size in enumerate(sizes)
+                ]
+                for future in as_completed(futures):
+                    try:
+                        chunk = future.result()
+                    except Exception as e:
+                        print(f"error generating chunk {e}")
+                        metrics.increment("generator.errors")
+                        continue
+
+                    for q in chunk:
+                        q = dict(q, number=len(questions) + 1)
+                        yield from self.add_unique(questions, topic, [q], num_questions)
+
+                    if len(questions) == num_questions:
+                        break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if not questions:
+            degraded = self.degraded_questions(topic, difficulty, num_questions)
+            if degraded:
+                yield from degraded
+                return
+            if not fallback:
+                raise ValueError("No questions generated")
+            metrics.increment("generator.fallbacks")
+            yield from self.get_fallback_questions(topic, difficulty)
+            return
+
+        self.save_generated(topic, difficulty, num_questions, questions)
+
+    def get_fallback_questions(self, topic, difficulty):
+        """Fallback questions if AI generation fails"""
+        return [
+            {
+                "question": f"This is a sample {difficulty} question about {topic}. What is 2+2?",
+                "options": ["3", "4", "5", "6"],
+                "correct": 1
+            },
+            {
+                "question": f"Another {difficulty} {topic} question. Which is larger?",
+                "options": ["10", "5", "15", "8"],
+                "correct": 2
+            },
+            {
+                "question": f"Final {difficulty} question on {topic}. Best practice?",
+                "options": ["Option A", "Option B", "Option C", "Option D"],
+                "correct": 0
+            }
+        ]
+
+
+def grade_for_percentage(percentage):
+    if percentage >= 80:
+        return "Excellent! 🌟"
+    elif percentage >= 60:
+        return "Good! 👍"
+    elif percentage >= 40:
+        return "Fair 📚"
+    return "Keep practicing! 💪"
+
+
+def build_results(topic, difficulty, score, total):
+    """Final score summary shown at the end of a quiz"""
+    percentage = (score / total) * 100 if total else 0.0
+    return {
+        "topic": topic,
+        "difficulty": difficulty,
+        "score": score,
+        "total": total,
+        "percentage": percentage,
+        "grade": grade_for_percentage(percentage),
+    }
@@ -1,22 +1,157 @@
-print("welcome to quiz")
-print("do you want to play the game? answer in 'Yes' or 'No' ")
+"""Terminal quiz runner built on the same engine as the Tk app
 
-play_game = input()
+    python quiz_game_1.py                                  # the classic CPU question
+    python quiz_game_1.py --topic Science -n 5 --difficulty Hard
+    python quiz_game_1.py --topic Science --backend fake --timing
 
-def game():
-    print("what does CPU stands for?")
+Answers can be given as a letter, an option number or typed out; typed
+answers are graded with AnswerChecker. Quizzes come from the question
+bank when it has enough stock, so the model (and its SDK) is only
+loaded when new questions have to be generated.
+"""
+import time
+
+_STARTED = time.perf_counter()
+
+import argparse
+import os
+import sys
+
+from answer_checker import AnswerChecker, normalize_answer
+from catalog import DIFFICULTY_LEVELS
+from llm_backends import LazyBackend
+from question_bank import QuestionBank
+from quiz_engine import QuizGenerator, build_results, min_bank_stock
+from resilience import ResilientBackend
+from topic_index import TopicIndex
+
+OPTION_LETTERS = "ABCDEFGH"
+
+
+def get_checker(backend=None):
+    # Unsure answers only go to a model when one is configured
+    if backend is None and os.environ.get("QUIZ_LLM_BACKEND"):
+        backend = ResilientBackend(LazyBackend())
+    return AnswerChecker(backend=backend)
+
+
+def classic_game(checker):
+    question = "what does CPU stands for?"
+    print(question)
     ans = input()
-    if ans.lower() == 'central processing unit':
+    if checker.is_correct(question, ans, "Central Processing Unit"):
         print("Congratulations that is a correct answer")
     else:
         print("Unfortunately that is a wrong answer")
         print("the correct answer is Central Processing Unit")
 
 
-if play_game.lower() == 'yes':
-    print("Awesome let's Start the game")
-    game()
-else :
-    print("Sorry to hear that.. see you soon")
+def load_questions(topic, difficulty, num_questions, bank, backend):
+    """Sample the quiz from the bank, or generate it when stock is low"""
+    if bank is not None and bank.count(topic, difficulty) >= min_bank_stock(topic, num_questions):
+        return bank.sample(num_questions, topic, difficulty)
+    print(f"Generating {difficulty.lower()} questions about {topic}...")
+    generator = QuizGenerator(backend=backend, bank=bank)
+    return generator.generate_questions(topic, difficulty, num_questions)
+
+
+def read_choice(answer, options):
+    """Option index for an option's text, letter or number, None for free text
+
+    An option typed out wins over a letter or number that means another
+    one, and numbers only pick options when no option is itself a number.
+    """
+    answer = answer.strip()
+    normalized = normalize_answer(answer)
+    texts = [normalize_answer(option) for option in options]
+    if normalized in texts:
+        return texts.index(normalized)
+    if len(answer) == 1 and answer.upper() in OPTION_LETTERS[:len(options)]:
+        return OPTION_LETTERS.index(answer.upper())
+    numeric_options = any(text.replace(" ", "").isdigit() for text in texts)
+    if answer.isdigit() and not numeric_options and 1 <= int(answer) <= len(options):
+        return int(answer) - 1
+    return None
+
+
+def ask_question(number, total, question, checker):
+    print(f"\nQuestion {number} of {total}: {question['question']}")
+    for letter, option in zip(OPTION_LETTERS, question["options"]):
+        print(f"  {letter}) {option}")
+
+    answer = input("Your answer: ")
+    correct_text = question["options"][question["correct"]]
+    choice = read_choice(answer, question["options"])
+    if choice is not None:
+        correct = choice == question["correct"]
+    else:
+        correct = checker.is_correct(question["question"], answer, correct_text)
+
+    if correct:
+        print("Correct! ✓")
+    else:
+        print(f"Wrong! ✗  Correct answer: {correct_text}")
+    return correct
+
+
+def run_quiz(topic, difficulty, num_questions, bank, backend, checker, timing=False):
+    if bank is not None:
+        # Reuse questions stored under another spelling of the topic
+        topic = TopicIndex.from_bank(bank).canonical(topic)
+    questions = load_questions(topic, difficulty, num_questions, bank, backend)
+    if timing:
+        print(f"[ready in {(time.perf_counter() - _STARTED) * 1000:.1f} ms]")
+
+    score = 0
+    for number, question in enumerate(questions, 1):
+        if ask_question(number, len(questions), question, checker):
+            score += 1
+
+    results = build_results(topic, difficulty, score, len(questions))
+    print(f"""
+Quiz Complete!
+Topic: {results["topic"]}
+Difficulty: {results["difficulty"]}
+Final Score: {results["score"]}/{results["total"]}
+Percentage: {results["percentage"]:.1f}%
+Grade: {results["grade"]}""")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play a quiz in the terminal")
+    parser.add_argument("--topic", help="quiz topic; without one the classic CPU question is asked")
+    parser.add_argument("--difficulty", default="Medium", choices=DIFFICULTY_LEVELS)
+    parser.add_argument("-n", "--num-questions", type=int, default=5)
+    parser.add_argument("--backend", help='"gemini", "fake" or a model server URL (default: $QUIZ_LLM_BACKEND)')
+    parser.add_argument("--no-bank", action="store_true", help="always generate instead of using the question bank")
+    parser.add_argument("-y", "--yes", action="store_true", help="skip the 'do you want to play' prompt")
+    parser.add_argument("--timing", action="store_true", help="print how long the quiz took to be ready")
+    args = parser.parse_args(argv)
+
+    print("welcome to quiz")
+    if not args.yes:
+        print("do you want to play the game? answer in 'Yes' or 'No' ")
+        if input().strip().lower() != 'yes':
+            print("Sorry to hear that.. see you soon")
+            return 0
+        print("Awesome let's Start the game")
+
+    # Same deadlines, retries and circuit breaker as the Tk app
+    backend = ResilientBackend(LazyBackend(args.backend)) if args.backend else None
+    checker = get_checker(backend)
+    try:
+        if args.topic is None:
+            classic_game(checker)
+        else:
+            bank = None if args.no_bank else QuestionBank()
+            if backend is None:
+                backend = ResilientBackend(LazyBackend())
+            run_quiz(args.topic, args.difficulty, args.num_questions, bank, backend, checker, args.timing)
+    except (EOFError, KeyboardInterrupt):
+        print("\nSee you soon")
+    return 0
 
 
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,115 +1,37 @@
 # ask on what topic you want 5 questions
 # ask the level of difficulty in the questions three options-:easy medium difficult
 # generate prompt according to it and call llm specify the format {question, options, correct}
-import google.generativeai as genai
-import google.generativeai as genai
+import getpass
 import os
+import time
 import tkinter as tk
 from tkinter import messagebox, ttk
 import random
-import json
-import re
-
-genai.configure(api_key="")
-
-class QuizGenerator:
-    def __init__(self):
-        self.model = genai.GenerativeModel(model_name="gemini-1.5-flash")
-
-    def generate_questions(self, topic, difficulty, num_questions = 5):
-        """Generate quiz questions using Gemini AI"""
-        prompt = f"""
-        Create exactly {num_questions} multiple choice quiz questions about {topic} with {difficulty} difficulty level.
-
-        Requirements:
-        - Each question should have exactly 4 options (A, B, C, D)
-        - Only one correct answer per question
-        - Questions should be appropriate for {difficulty} level
-        - Return the response in valid JSON format only, no additional text
-
-        Format your response as a JSON array like this:
-        [
-            {{
-                "question": "Your question here?",
-                "options": ["Option A", "Option B", "Option C", "Option D"],
-                "correct": 0
-            }},
-            {{
-                "question": "Another question?",
-                "options": ["Option A", "Option B", "Option C", "Option D"], 
-                "correct": 2
-            }}
-        ]
-
-        Topic: {topic}
-        Difficulty: {difficulty}
-        Number of questions: {num_questions}
-        """
+from adaptive import AdaptiveQuiz, ItemPool
+from background_tasks import BackgroundTask
+from catalog import CATALOG_TOPICS, DIFFICULTY_LEVELS, catalog_topic
+from catalog_warmer import WarmJobQueue
+from leaderboard import LeaderboardSet, quiz_points
+from play_history import HistoryLocked, PlayHistory
+from question_bank import QuestionBank
+from quiz_engine import QuizGenerator, build_results, min_bank_stock
+from quiz_prefetch import QuizPrefetcher
+from quiz_widgets import FeedbackLabel, OptionPool, TransitionTimer
+from topic_index import TopicIndex
 
-        try:
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
-
-            json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-            if json_match:
-                json_text = json_match.group()
-            else:
-                json_text = response_text
-
-            questions = json.loads(json_text)
-            
-            # Validate the structure
-            if not isinstance(questions, list):
-                raise ValueError("Response is not a list")
-                
-            for q in questions:
-                if not all(key in q for key in ["question", "options", "correct"]):
-                    raise ValueError("Missing required keys in question")
-                if len(q["options"]) != 4:
-                    raise ValueError("Each question must have exactly 4 options")
-                if not (0 <= q["correct"] <= 3):
-                    raise ValueError("Correct answer index must be between 0-3")
-            
-            return questions
+# Difficulty choice that adapts to the player instead of staying fixed
+ADAPTIVE = "Adaptive"
 
-        except Exception as e:
-            print(f"error generating questions {e}")
-            return self.fall_back_questions(topic, difficulty)
-    
-    
-    def get_fallback_questions(self, topic, difficulty):
-        """Fallback questions if AI generation fails"""
-        return [
-            {
-                "question": f"This is a sample {difficulty} question about {topic}. What is 2+2?",
-                "options": ["3", "4", "5", "6"],
-                "correct": 1
-            },
-            {
-                "question": f"Another {difficulty} {topic} question. Which is larger?",
-                "options": ["10", "5", "15", "8"],
-                "correct": 2
-            },
-            {
-                "question": f"Final {difficulty} question on {topic}. Best practice?",
-                "options": ["Option A", "Option B", "Option C", "Option D"],
-                "correct": 0
-            }
-        ]
-    
 class TopicDifficultySelector:
-    def __init__(self, callback):
+    def __init__(self, parent, callback):
         self.callback = callback
-        self.setup_selection_window()
+        self.setup_selection_window(parent)
 
-    def setup_selection_window(self):
-        self.root = tk.Tk()
-        self.root.title("Quiz Setup")
-        self.root.geometry("400x300")
-        self.root.configure(bg="#f0f0f0")
+    def setup_selection_window(self, parent):
+        self.frame = tk.Frame(parent, bg="#f0f0f0")
 
         title_label = tk.Label(
-            self.root,
+            self.frame,
             text="Quiz Generator",
             font=("Arial", 18, "bold"),
             bg="#f0f0f0",
@@ -118,7 +40,7 @@ class TopicDifficultySelector:
         title_label.pack(pady=20)
 
         topic_label = tk.Label(
-            self.root,
+            self.frame,
             text="Select Topic",
             font=("Arial", 12, "bold"),
             bg="#f0f0f0",
@@ -129,11 +51,11 @@ class TopicDifficultySelector:
 
         self.topic_name = tk.StringVar()
         topic_frame = tk.Frame(
-            self.root,
+            self.frame,
              bg="#f0f0f0"
         )
         topic_frame.pack(pady=10)
-        topics = ["Python Programming", "Mathematics", "Science", "History", "Geography", "Literature", "Custom Topic"]
+        topics = CATALOG_TOPICS + ["Custom Topic"]
 
         for topic in topics:
             rb = tk.Radiobutton(
@@ -149,7 +71,7 @@ class TopicDifficultySelector:
 
         self.custom_topic_var = tk.StringVar()
         custom_label = tk.Label(
-            self.root,
+            self.frame,
             text="If Custom Topic, specify below:",
             font=("Arial", 10),
             bg="#f0f0f0",
@@ -158,7 +80,7 @@ class TopicDifficultySelector:
         custom_label.pack(pady=(10, 5))
 
         self.custom_entry = tk.Entry(
-            self.root,
+            self.frame,
             textvariable=self.custom_topic_var,
             font=("Arial", 10),
             width=30
@@ -167,7 +89,7 @@ class TopicDifficultySelector:
         self.custom_entry.pack(pady= 5)
 
         difficulty_label = tk.Label(
-            self.root,
+            self.frame,
             text="Select Difficulty:",
             font=("Arial", 12, "bold"),
             bg="#f0f0f0",
@@ -176,10 +98,10 @@ class TopicDifficultySelector:
         difficulty_label.pack(pady=(20, 10))
 
         self.difficulty_var = tk.StringVar()
-        difficulty_frame = tk.Frame(self.root, bg="#f0f0f0")
+        difficulty_frame = tk.Frame(self.frame, bg="#f0f0f0")
         difficulty_frame.pack(pady=10)
         
-        difficulties = ["Easy", "Medium", "Hard"]
+        difficulties = DIFFICULTY_LEVELS + [ADAPTIVE]
         for difficulty in difficulties:
             rb = tk.Radiobutton(
                 difficulty_frame,
@@ -190,10 +112,30 @@ class TopicDifficultySelector:
                 fg="#333",
                 font=("Arial", 10)
             )
-            rb.pack(side="left", padx=20)
+            rb.pack(side="left", padx=12)
+
+        count_label = tk.Label(
+            self.frame,
+            text="Number of Questions:",
+            font=("Arial", 12, "bold"),
+            bg="#f0f0f0",
+            fg="#333"
+        )
+        count_label.pack(pady=(20, 5))
+
+        self.num_questions_var = tk.IntVar(value=5)
+        count_spinbox = tk.Spinbox(
+            self.frame,
+            from_=1,
+            to=500,
+            textvariable=self.num_questions_var,
+            font=("Arial", 10),
+            width=6
+        )
+        count_spinbox.pack(pady=5)
 
         generate_btn = tk.Button(
-            self.root,
+            self.frame,
             text="Generate Quiz",
             command=self.generate_quiz,
             font=("Arial", 12, "bold"),
@@ -211,9 +153,8 @@ class TopicDifficultySelector:
 
     def generate_quiz(self):
         topic = self.topic_name.get()
-        if topic == "custom topic":
+        if topic == "Custom Topic":
             topic = self.custom_topic_var.get().strip()
-        else :
             if not topic:
                 messagebox.showerror("Error", "Please specify a custom topic!")
                 return
@@ -223,31 +164,44 @@ class TopicDifficultySelector:
             messagebox.showerror("Error", "Please select both topic and difficulty!")
             return
         
-        self.root.destroy()
-
-        self.callback(topic, difficulty)
-
-    def run(self):
-        self.root.mainloop()
+        try:
+            num_questions = int(self.num_questions_var.get())
+        except (tk.TclError, ValueError):
+            num_questions = 0
+        if not 1 <= num_questions <= 500:
+            messagebox.showerror("Error", "Number of questions must be between 1 and 500!")
+            return
+        
+        self.callback(topic, difficulty, num_questions)
 
 class QuizGame:
-    def __init__(self, root, questions, topic, difficulty):
-        self.root = root
-        self.root.title(f"Quiz: {topic} ({difficulty})")
-        self.root.geometry("700x500")
-        self.root.configure(bg="#f0f0f0")
+    def __init__(self, parent, questions, topic, difficulty, expected_total=None, on_complete=None,
+                 on_answer=None):
+        self.root = parent.winfo_toplevel()
+        self.frame = tk.Frame(parent, bg="#f0f0f0")
+        self.on_complete = on_complete
+        # Called as on_answer(game, question, choice, response_time) after every answer
+        self.on_answer = on_answer
+        self.quiz_id = random.getrandbits(63)
+        self.question_shown_at = time.monotonic()
         
         self.questions = questions
         self.topic = topic
         self.difficulty = difficulty
+
+        # While streaming, more questions arrive through add_question()
+        self.expected_total = expected_total
+        self.loading = expected_total is not None
         
         # Shuffle questions
-        random.shuffle(self.questions)
+        if not self.loading:
+            random.shuffle(self.questions)
         
         # Game state
         self.current_question = 0
         self.score = 0
         self.selected_option = tk.IntVar()
+        self.waiting_for_question = False
         
         # Create UI
         self.create_widgets()
@@ -257,7 +211,7 @@ class QuizGame:
         # Title with topic and difficulty
         title_text = f"Quiz: {self.topic} ({self.difficulty})"
         title_label = tk.Label(
-            self.root, 
+            self.frame, 
             text=title_text, 
             font=("Arial", 16, "bold"),
             bg="#f0f0f0",
@@ -268,7 +222,7 @@ class QuizGame:
         
         # Progress
         self.progress_label = tk.Label(
-            self.root,
+            self.frame,
             text="",
             font=("Arial", 12),
             bg="#f0f0f0",
@@ -277,7 +231,7 @@ class QuizGame:
         self.progress_label.pack(pady=5)
         
         # Question frame
-        question_frame = tk.Frame(self.root, bg="#f0f0f0")
+        question_frame = tk.Frame(self.frame, bg="#f0f0f0")
         question_frame.pack(pady=20, padx=40, fill="x")
         
         self.question_label = tk.Label(
@@ -292,15 +246,22 @@ class QuizGame:
         self.question_label.pack(anchor="w")
         
         # Options frame
-        self.options_frame = tk.Frame(self.root, bg="#f0f0f0")
-        self.options_frame.pack(pady=20, padx=60, fill="x")
+        self.options_frame = tk.Frame(self.frame, bg="#f0f0f0")
+        self.options_frame.pack(pady=(20, 5), padx=60, fill="x")
         
-        # Radio buttons (created dynamically)
-        self.option_buttons = []
+        # Radio buttons (reused for every question)
+        self.option_pool = OptionPool(self.options_frame, self.selected_option, wraplength=500)
+
+        # Inline answer feedback
+        self.feedback_label = FeedbackLabel(self.frame, wraplength=600)
+        self.feedback_label.pack(pady=5)
+
+        # Per-transition render timings
+        self.render_timings = TransitionTimer(self.root, name="ui.load_question")
         
         # Buttons frame
-        buttons_frame = tk.Frame(self.root, bg="#f0f0f0")
-        buttons_frame.pack(pady=30)
+        buttons_frame = tk.Frame(self.frame, bg="#f0f0f0")
+        buttons_frame.pack(pady=20)
         
         # Submit button
         self.submit_btn = tk.Button(
@@ -333,8 +294,8 @@ class QuizGame:
         
         # Score label
         self.score_label = tk.Label(
-            self.root,
-            text=f"Score: {self.score}/{len(self.questions)}",
+            self.frame,
+            text=f"Score: {self.score}/{self.total_questions()}",
             font=("Arial", 12, "bold"),
             bg="#f0f0f0",
             fg="#333"
@@ -342,48 +303,34 @@ class QuizGame:
         self.score_label.pack(side="bottom", pady=10)
     
     def load_question(self):
-        # Clear previous options
-        for button in self.option_buttons:
-            button.destroy()
-        self.option_buttons.clear()
-        
-        # Reset selection
+        self.render_timings.start()
+
+        # Reset selection and feedback
         self.selected_option.set(-1)
+        self.feedback_label.clear()
         
         # Update progress
         self.progress_label.config(
-            text=f"Question {self.current_question + 1} of {len(self.questions)}"
+            text=f"Question {self.current_question + 1} of {self.total_questions()}"
         )
         
         # Load current question
         question_data = self.questions[self.current_question]
         self.question_label.config(text=question_data["question"])
         
-        # Create option buttons
-        for i, option in enumerate(question_data["options"]):
-            rb = tk.Radiobutton(
-                self.options_frame,
-                text=option,
-                variable=self.selected_option,
-                value=i,
-                font=("Arial", 11),
-                bg="#f0f0f0",
-                fg="#333",
-                selectcolor="#e8e8e8",
-                anchor="w",
-                wraplength=500,
-                justify="left"
-            )
-            rb.pack(anchor="w", pady=5, fill="x")
-            self.option_buttons.append(rb)
+        # Reconfigure the pooled option buttons
+        self.option_pool.show(question_data["options"])
         
         # Show submit button, hide next button
         self.submit_btn.pack(side="left", padx=10)
         self.next_btn.pack_forget()
+
+        self.render_timings.stop()
+        self.question_shown_at = time.monotonic()
     
     def submit_answer(self):
         if self.selected_option.get() == -1:
-            messagebox.showwarning("Warning", "Please select an answer!")
+            self.feedback_label.warn("Please select an answer!")
             return
         
         question_data = self.questions[self.current_question]
@@ -393,110 +340,535 @@ class QuizGame:
         # Check if answer is correct
         if selected_answer == correct_answer:
             self.score += 1
-            messagebox.showinfo("Result", "Correct! ✓")
+            self.feedback_label.correct()
         else:
             correct_text = question_data["options"][correct_answer]
-            messagebox.showinfo("Result", f"Wrong! ✗\nCorrect answer: {correct_text}")
+            self.feedback_label.wrong(correct_text)
+        self.option_pool.mark(correct_answer, selected_answer)
+        self.answer_recorded(selected_answer == correct_answer)
+        if self.on_answer is not None:
+            self.on_answer(self, question_data, selected_answer, time.monotonic() - self.question_shown_at)
         
         # Update score display
-        self.score_label.config(text=f"Score: {self.score}/{len(self.questions)}")
+        self.score_label.config(text=f"Score: {self.score}/{self.total_questions()}")
         
         # Hide submit button, show next button
         self.submit_btn.pack_forget()
         if self.current_question < len(self.questions) - 1:
             self.next_btn.pack(side="left", padx=10)
+        elif self.loading:
+            # Next question is still streaming in
+            self.waiting_for_question = True
+            self.next_btn.config(text="Loading next question...", state="disabled")
+            self.next_btn.pack(side="left", padx=10)
         else:
             self.show_final_results()
     
+    def answer_recorded(self, correct):
+        """Hook for games that pick later questions from earlier answers"""
+
     def next_question(self):
         self.current_question += 1
         self.load_question()
+
+    def total_questions(self):
+        if self.loading:
+            return max(len(self.questions), self.expected_total)
+        return len(self.questions)
+
+    def add_question(self, question):
+        """Add a question that arrived after the quiz started"""
+        # Insert at a random unplayed position so streamed quizzes stay shuffled
+        position = random.randint(self.current_question + 1, len(self.questions))
+        self.questions.insert(position, question)
+
+        if self.waiting_for_question:
+            self.waiting_for_question = False
+            self.next_btn.config(text="Next Question", state="normal")
+
+    def finish_loading(self):
+        """Called once the stream is exhausted"""
+        self.loading = False
+        self.progress_label.config(
+            text=f"Question {self.current_question + 1} of {self.total_questions()}"
+        )
+        self.score_label.config(text=f"Score: {self.score}/{self.total_questions()}")
+
+        if self.waiting_for_question:
+            # The last answered question turned out to be the final one
+            self.waiting_for_question = False
+            self.next_btn.pack_forget()
+            self.next_btn.config(text="Next Question", state="normal")
+            self.show_final_results()
     
     def show_final_results(self):
-        percentage = (self.score / len(self.questions)) * 100
-        
-        if percentage >= 80:
-            grade = "Excellent! 🌟"
-        elif percentage >= 60:
-            grade = "Good! 👍"
-        elif percentage >= 40:
-            grade = "Fair 📚"
+        results = build_results(self.topic, self.difficulty, self.score, len(self.questions))
+        if self.on_complete is not None:
+            self.on_complete(results)
         else:
-            grade = "Keep practicing! 💪"
-        
-        result_message = f"""
-Quiz Complete!
+            self.root.quit()
 
-Topic: {self.topic}
-Difficulty: {self.difficulty}
-Final Score: {self.score}/{len(self.questions)}
-Percentage: {percentage:.1f}%
-Grade: {grade}
+    def destroy(self):
+        self.frame.destroy()
 
-Would you like to take another quiz?
-        """
-        
-        play_again = messagebox.askyesno("Quiz Complete", result_message)
-        
-        if play_again:
-            self.root.destroy()
-            main()  # Start over with topic/difficulty selection
-        else:
-            self.root.quit()
+class AdaptiveQuizGame(QuizGame):
+    """QuizGame that picks every next question at the player's estimated level"""
 
-def start_quiz(topic, difficulty):
-    """Generate questions and start the quiz"""
-    
-    # Show loading message
-    loading_root = tk.Tk()
-    loading_root.title("Generating Quiz...")
-    loading_root.geometry("300x150")
-    loading_root.configure(bg="#f0f0f0")
-    
-    loading_label = tk.Label(
-        loading_root,
-        text=f"Generating {difficulty.lower()} questions\nabout {topic}...\n\nPlease wait...",
-        font=("Arial", 12),
-        bg="#f0f0f0",
-        fg="#333",
-        justify="center"
-    )
-    loading_label.pack(expand=True)
-    
-    # Center the loading window
-    loading_root.update_idletasks()
-    width = loading_root.winfo_width()
-    height = loading_root.winfo_height()
-    x = (loading_root.winfo_screenwidth() // 2) - (width // 2)
-    y = (loading_root.winfo_screenheight() // 2) - (height // 2)
-    loading_root.geometry(f"{width}x{height}+{x}+{y}")
-    
-    loading_root.update()
-    
+    def __init__(self, parent, adaptive, topic, on_complete=None, on_answer=None):
+        self.adaptive = adaptive
+        first = adaptive.next_question()
+        super().__init__(parent, [first], topic, ADAPTIVE, on_complete=on_complete, on_answer=on_answer)
+
+    def total_questions(self):
+        if self.adaptive.finished():
+            return len(self.questions)
+        return self.adaptive.max_questions
+
+    def load_question(self):
+        super().load_question()
+        if self.current_question:
+            self.progress_label.config(
+                text=f"Question {self.current_question + 1} of up to {self.total_questions()}"
+                     f"  ·  level: {self.adaptive.level()}"
+            )
+
+    def answer_recorded(self, correct):
+        self.adaptive.record(correct)
+        question = self.adaptive.next_question()
+        if question is not None:
+            self.questions.append(question)
+
+    def show_final_results(self):
+        self.difficulty = f"{ADAPTIVE} ({self.adaptive.level()} level)"
+        super().show_final_results()
+
+GENERATION_TIMEOUT = 90
+
+# Adaptive quizzes need this many times the quiz size in the topic's pool
+ADAPTIVE_MIN_POOL_FACTOR = 3
+
+_bank = None
+_generator = None
+_prefetcher = None
+_warm_queue = None
+_topic_index = None
+_history = None
+_leaderboards = None
+# Quizzes finished before this are loaded from history, later ones are added as they finish
+_SESSION_STARTED = time.time()
+
+def get_bank():
+    global _bank
+    if _bank is None:
+        _bank = QuestionBank()
+    return _bank
+
+def get_generator():
+    """Generator shared by every round in this session"""
+    global _generator
+    if _generator is None:
+        _generator = QuizGenerator(bank=get_bank())
+    return _generator
+
+def get_prefetcher():
+    """Prefetcher shared by every round in this session"""
+    global _prefetcher
+    if _prefetcher is None:
+        # Bypass the cache so the next round gets fresh questions, but share
+        # the duplicate index so it doesn't repeat what was already played
+        generator = get_generator()
+        _prefetcher = QuizPrefetcher(QuizGenerator(
+            backend=generator.backend, use_cache=False, dedup_index=generator.dedup_index,
+            bank=generator.bank
+        ))
+    return _prefetcher
+
+def get_topic_index():
+    """Known topics, so custom topics reuse questions stored under another spelling"""
+    global _topic_index
+    if _topic_index is None:
+        _topic_index = TopicIndex.from_bank(get_bank())
+    return _topic_index
+
+def get_history():
+    """Play history shared by every round in this session
+
+    None when another window already writes to it; that window's
+    answers are then only counted on this session's leaderboards.
+    """
+    global _history
+    if _history is None:
+        try:
+            _history = PlayHistory()
+        except HistoryLocked as e:
+            print(f"not recording play history: {e}")
+            _history = False
+    return _history or None
+
+def get_leaderboards():
+    global _leaderboards
+    if _leaderboards is None:
+        _leaderboards = LeaderboardSet()
+        history = get_history()
+        if history is not None:
+            _leaderboards.load_history(history, until=_SESSION_STARTED)
+    return _leaderboards
+
+def get_player():
     try:
-        # Generate questions using AI
-        generator = QuizGenerator()
-        questions = generator.generate_questions(topic, difficulty)
-        
-        if not questions:
-            raise Exception("No questions generated")
-        
-        loading_root.destroy()
-        
-        # Start the quiz game
-        root = tk.Tk()
-        game = QuizGame(root, questions, topic, difficulty)
-        root.mainloop()
-        
-    except Exception as e:
-        loading_root.destroy()
-        messagebox.showerror("Error", f"Failed to generate quiz questions: {str(e)}\n\nPlease check your internet connection and API key.")
+        return getpass.getuser()
+    except Exception:
+        return "player"
+
+def request_catalog_refill(topic, difficulty):
+    """Ask catalog_warmer to refill a catalog slot the bank ran short of"""
+    global _warm_queue
+    if catalog_topic(topic) is None:
+        return
+    if _warm_queue is None:
+        _warm_queue = WarmJobQueue()
+    _warm_queue.enqueue(topic, difficulty, priority=1)
+
+def stock_adaptive_pool(topic, num_questions):
+    """Generate questions at every level for an adaptive quiz, then yield the pool"""
+    generator = get_generator()
+    for difficulty in DIFFICULTY_LEVELS:
+        try:
+            generator.generate_questions(topic, difficulty, num_questions, fallback=False)
+        except Exception as e:
+            print(f"Error generating {difficulty} questions: {e}")
+    pool = ItemPool.from_bank(get_bank(), topic)
+    if not len(pool):
+        raise RuntimeError("No questions generated")
+    yield pool
+
+class LoadingScreen:
+    """Loading screen that stays responsive while questions are generated"""
+
+    def __init__(self, parent, on_cancel):
+        self.task = None
+        self.frame = tk.Frame(parent, bg="#f0f0f0")
+
+        self.loading_label = tk.Label(
+            self.frame,
+            text="",
+            font=("Arial", 12),
+            bg="#f0f0f0",
+            fg="#333",
+            justify="center"
+        )
+        self.loading_label.pack(pady=(30, 10))
+
+        self.progress = ttk.Progressbar(self.frame, mode="indeterminate", length=240)
+        self.progress.pack(pady=5)
+
+        self.elapsed_label = tk.Label(
+            self.frame,
+            text="",
+            font=("Arial", 10),
+            bg="#f0f0f0",
+            fg="#666"
+        )
+        self.elapsed_label.pack(pady=5)
+
+        cancel_btn = tk.Button(
+            self.frame,
+            text="Cancel",
+            command=on_cancel,
+            font=("Arial", 11, "bold"),
+            bg="#f44336",
+            fg="white",
+            padx=15,
+            relief="flat",
+            cursor="hand2"
+        )
+        cancel_btn.pack(pady=10)
+
+    def start(self, topic, difficulty, task):
+        self.task = task
+        self.loading_label.config(
+            text=f"Generating {difficulty.lower()} questions\nabout {topic}..."
+        )
+        self.progress.start(15)
+        self.update_elapsed()
+
+    def stop(self):
+        self.task = None
+        self.progress.stop()
+
+    def update_elapsed(self):
+        if self.task is None:
+            return
+        text = f"Elapsed: {self.task.elapsed():.1f}s"
+        if self.task.timeout is not None:
+            text += f" (timeout {self.task.timeout}s)"
+        self.elapsed_label.config(text=text)
+        self.frame.after(100, self.update_elapsed)
+
+class ResultsScreen:
+    """Final score with play again / quit buttons"""
+
+    def __init__(self, parent, on_play_again, on_quit):
+        self.frame = tk.Frame(parent, bg="#f0f0f0")
+
+        title_label = tk.Label(
+            self.frame,
+            text="Quiz Complete!",
+            font=("Arial", 18, "bold"),
+            bg="#f0f0f0",
+            fg="#333"
+        )
+        title_label.pack(pady=20)
+
+        self.summary_label = tk.Label(
+            self.frame,
+            text="",
+            font=("Arial", 12),
+            bg="#f0f0f0",
+            fg="#333",
+            justify="left"
+        )
+        self.summary_label.pack(pady=10)
+
+        buttons_frame = tk.Frame(self.frame, bg="#f0f0f0")
+        buttons_frame.pack(pady=20)
+
+        play_again_btn = tk.Button(
+            buttons_frame,
+            text="Take Another Quiz",
+            command=on_play_again,
+            font=("Arial", 12, "bold"),
+            bg="#4CAF50",
+            fg="white",
+            padx=20,
+            pady=10,
+            relief="flat",
+            cursor="hand2"
+        )
+        play_again_btn.pack(side="left", padx=10)
+
+        quit_btn = tk.Button(
+            buttons_frame,
+            text="Quit",
+            command=on_quit,
+            font=("Arial", 12, "bold"),
+            bg="#9e9e9e",
+            fg="white",
+            padx=20,
+            pady=10,
+            relief="flat",
+            cursor="hand2"
+        )
+        quit_btn.pack(side="left", padx=10)
+
+    def show(self, results, standing=None):
+        text = f"""Topic: {results["topic"]}
+Difficulty: {results["difficulty"]}
+Final Score: {results["score"]}/{results["total"]}
+Percentage: {results["percentage"]:.1f}%
+Grade: {results["grade"]}"""
+        if standing is not None:
+            text += f"""
+This week on {results["topic"]}: #{standing["rank"]} of {standing["players"]} ({standing["points"]} points)"""
+        self.summary_label.config(text=text)
+
+class QuizApp:
+    """One long-lived Tk root that swaps screens: setup -> loading -> quiz -> results
+
+    Every screen is a frame packed into the same root. The setup, loading
+    and results frames are built once and reused; only the quiz frame is
+    rebuilt per round and destroyed when the round ends, so replays don't
+    grow the call stack or leave interpreters behind.
+    """
+
+    SCREEN_SIZES = {
+        "setup": "400x620",
+        "loading": "400x240",
+        "quiz": "700x540",
+        "results": "480x410",
+    }
+
+    def __init__(self, stream=True, timeout=GENERATION_TIMEOUT):
+        self.stream = stream
+        self.timeout = timeout
+
+        self.root = tk.Tk()
+        self.root.configure(bg="#f0f0f0")
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.state = None
+        self.current_frame = None
+        self.game = None
+        self.task = None
+        self.rounds_played = 0
+
+        self.selector = TopicDifficultySelector(self.root, self.start_quiz)
+        self.loading = LoadingScreen(self.root, self.cancel_generation)
+        self.results = ResultsScreen(self.root, self.show_setup, self.close)
+
+    def show(self, state, frame, title):
+        if self.current_frame is not None:
+            self.current_frame.pack_forget()
+        frame.pack(fill="both", expand=True)
+        self.root.title(title)
+        self.root.geometry(self.SCREEN_SIZES[state])
+        self.state = state
+        self.current_frame = frame
+
+    def show_setup(self):
+        self.show("setup", self.selector.frame, "Quiz Setup")
+
+    def start_quiz(self, topic, difficulty, num_questions=5):
+        """Generate questions off the UI thread and start the quiz"""
+        topic = get_topic_index().canonical(topic)
+        if difficulty == ADAPTIVE:
+            self.start_adaptive_quiz(topic, num_questions)
+            return
+
+        prefetcher = get_prefetcher()
+        prefetched = prefetcher.take(topic, difficulty, num_questions)
+        if prefetched:
+            # The next round was generated while the previous one was played
+            self.open_quiz(prefetched, topic, difficulty)
+            prefetcher.prefetch(topic, difficulty, num_questions)
+            return
+
+        bank = get_bank()
+        if bank.count(topic, difficulty) >= min_bank_stock(topic, num_questions):
+            # Enough stored questions for a varied quiz without calling the model
+            self.open_quiz(bank.sample(num_questions, topic, difficulty), topic, difficulty)
+            return
+        # Only a cold bank gets here for catalog topics
+        request_catalog_refill(topic, difficulty)
+
+        generator = get_generator()
+        if self.stream:
+            generate = generator.generate_questions_stream
+        else:
+            generate = generator.generate_questions
+        task = BackgroundTask(generate, topic, difficulty, num_questions, timeout=self.timeout)
+        self.task = task
+
+        def first_question_arrived(question):
+            # One question is enough to open the quiz
+            task.detach()
+            self.loading.stop()
+            game = self.open_quiz([question], topic, difficulty, expected_total=num_questions)
+            task.attach(self.root, game.add_question, generation_finished)
+
+        def generation_finished(status, error):
+            self.task = None
+            self.game.finish_loading()
+            # The network is idle while the quiz is played, get the next round ready
+            prefetcher.prefetch(topic, difficulty, num_questions)
+
+        def generation_failed(status, error):
+            self.task = None
+            self.loading.stop()
+            if status == "timeout":
+                error = f"Timed out after {self.timeout} seconds"
+            else:
+                error = error or "No questions generated"
+            messagebox.showerror("Error", f"Failed to generate quiz questions: {str(error)}\n\nPlease check your internet connection and API key.")
+            self.show_setup()
+
+        self.loading.start(topic, difficulty, task)
+        self.show("loading", self.loading.frame, "Generating Quiz...")
+        task.attach(self.root, first_question_arrived, generation_failed)
+
+    def start_adaptive_quiz(self, topic, num_questions):
+        bank = get_bank()
+        pool = ItemPool.from_bank(bank, topic)
+        if len(pool) >= num_questions * ADAPTIVE_MIN_POOL_FACTOR:
+            self.open_adaptive_quiz(pool, topic, num_questions)
+            return
+
+        # Stock every level once; later adaptive rounds on the topic reuse the bank
+        task = BackgroundTask(stock_adaptive_pool, topic, num_questions, timeout=self.timeout)
+        self.task = task
+
+        def pool_ready(pool):
+            self.task = None
+            self.loading.stop()
+            self.open_adaptive_quiz(pool, topic, num_questions)
+
+        def generation_finished(status, error):
+            if status == "done":
+                return
+            self.task = None
+            self.loading.stop()
+            if status == "timeout":
+                error = f"Timed out after {self.timeout} seconds"
+            messagebox.showerror("Error", f"Failed to generate quiz questions: {str(error)}")
+            self.show_setup()
+
+        self.loading.start(topic, "mixed", task)
+        self.show("loading", self.loading.frame, "Generating Quiz...")
+        task.attach(self.root, pool_ready, generation_finished)
+
+    def open_adaptive_quiz(self, pool, topic, num_questions):
+        if self.game is not None:
+            self.game.destroy()
+        adaptive = AdaptiveQuiz(pool, get_bank(), max_questions=min(num_questions, len(pool)))
+        self.game = AdaptiveQuizGame(
+            self.root, adaptive, topic, on_complete=self.show_results, on_answer=self.record_answer
+        )
+        self.show("quiz", self.game.frame, f"Quiz: {topic} ({ADAPTIVE})")
+        return self.game
+
+    def cancel_generation(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        self.loading.stop()
+        self.show_setup()
+
+    def open_quiz(self, questions, topic, difficulty, expected_total=None):
+        if self.game is not None:
+            self.game.destroy()
+        self.game = QuizGame(
+            self.root, questions, topic, difficulty,
+            expected_total=expected_total, on_complete=self.show_results, on_answer=self.record_answer
+        )
+        self.show("quiz", self.game.frame, f"Quiz: {topic} ({difficulty})")
+        return self.game
+
+    def show_results(self, results):
+        self.rounds_played += 1
+        boards = get_leaderboards()
+        player = get_player()
+        boards.record(player, results["topic"], results["difficulty"],
+                      quiz_points(results["score"], results["difficulty"]))
+        self.results.show(results, boards.rank(player, "topic", results["topic"], "weekly"))
+        self.show("results", self.results.frame, "Quiz Complete")
+        # The finished round's widgets aren't needed any more
+        self.game.destroy()
+        self.game = None
+
+    def record_answer(self, game, question, choice, response_time):
+        history = get_history()
+        if history is None:
+            return
+        history.record(
+            get_player(), game.quiz_id, game.topic, game.difficulty, question.get("id"),
+            choice, choice == question["correct"], response_time
+        )
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        if _history:
+            _history.close()
+        self.root.destroy()
+
+    def run(self):
+        self.show_setup()
+        self.root.mainloop()
 
 def main():
     """Main function to start the application"""
-    # Create topic and difficulty selector
-    selector = TopicDifficultySelector(start_quiz)
-    selector.run()
+    app = QuizApp()
+    app.run()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from catalog import DIFFICULTY_LEVELS
+from question_cache import QuestionCache
+
+
+def adjacent_difficulties(difficulty):
+    """Difficulties one step easier and harder than `difficulty`"""
+    names = [d.lower() for d in DIFFICULTY_LEVELS]
+    if difficulty.lower() not in names:
+        return []
+    i = names.index(difficulty.lower())
+    return [DIFFICULTY_LEVELS[j] for j in (i + 1, i - 1) if 0 <= j < len(DIFFICULTY_LEVELS)]
+
+
+class QuizPrefetcher:
+    """Generate the next quiz in the background while the current one is played
+
+    At most `max_in_flight` generations run at once. Finished batches are
+    keyed by (topic, difficulty, size), so changing the quiz settings never
+    serves one made for other settings; they are kept until taken, and
+    anything older than `max_age` seconds is discarded as stale.
+    """
+
+    def __init__(self, generator, max_in_flight=2, max_age=15 * 60, executor=None):
+        self.generator = generator
+        self.max_in_flight = max_in_flight
+        self.max_age = max_age
+        # Its own workers, so quizzes the player cancelled, whose model calls
+        # still hold shared workers until they return, can't starve prefetches
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="quiz-prefetch"
+        )
+
+        self._lock = threading.Lock()
+        self._ready = {}
+        self._in_flight = {}
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    def prefetch(self, topic, difficulty, num_questions=5, include_adjacent=True):
+        """Start background generation for this quiz and, if slots allow, its neighbours"""
+        wanted = [difficulty]
+        if include_adjacent:
+            wanted += adjacent_difficulties(difficulty)
+
+        with self._lock:
+            self._drop_expired()
+            for level in wanted:
+                key = QuestionCache.make_key(topic, level, num_questions)
+                if key in self._ready or key in self._in_flight:
+                    continue
+                if len(self._in_flight) >= self.max_in_flight:
+                    break
+                self._in_flight[key] = self.executor.submit(
+                    self._fetch, key, topic, level, num_questions
+                )
+
+    def _fetch(self, key, topic, difficulty, num_questions):
+        try:
+            questions = self.generator.generate_questions(
+                topic, difficulty, num_questions, fallback=False
+            )
+        except Exception as e:
+            print(f"error prefetching questions {e}")
+            questions = None
+
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if not questions:
+                self.discarded += 1
+                return
+            self._ready[key] = (questions, time.monotonic())
+
+    def _drop_expired(self):
+        now = time.monotonic()
+        for key in [k for k, (_, t) in self._ready.items() if now - t > self.max_age]:
+            del self._ready[key]
+            self.discarded += 1
+
+    def take(self, topic, difficulty, num_questions=5):
+        """Return a prefetched batch and remove it, or None if there isn't a fresh one"""
+        key = QuestionCache.make_key(topic, difficulty, num_questions)
+        with self._lock:
+            self._drop_expired()
+            entry = self._ready.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "discarded": self.discarded,
+                "ready": len(self._ready),
+                "in_flight": len(self._in_flight),
+            }
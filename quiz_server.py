@@ -0,0 +1,358 @@
+"""Async HTTP quiz service built on QuizGenerator
+
+    pip install fastapi uvicorn
+    uvicorn quiz_server:app
+
+Generation runs on a thread pool so the event loop never blocks, and
+concurrent requests for the same topic/difficulty/count share one LLM call.
+"""
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Literal, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+import grading
+import metrics
+from catalog import DIFFICULTY_LEVELS, catalog_topic
+from catalog_warmer import WarmJobQueue
+from leaderboard import LeaderboardSet, quiz_points
+from play_history import MAX_RESPONSE_MS, SERVER_HISTORY_DIR, PlayHistory, quiz_id_from_token
+from question_bank import QuestionBank
+from question_cache import QuestionCache
+from quiz_engine import QuizGenerator, build_results, min_bank_stock
+from session_store import SharedQuestionCache, ShardedSessionStore
+from topic_index import TopicIndex
+
+GENERATION_WORKERS = 16
+
+SESSION_IDLE_TIMEOUT = 30 * 60
+SESSION_SWEEP_INTERVAL = 5
+
+# Client topics are only indexed once they have produced questions, up to this many
+MAX_INDEXED_TOPICS = 50_000
+
+# How often answers are graded in bulk to update question difficulty labels
+ANALYTICS_INTERVAL = 60
+
+
+class RequestCoalescer:
+    """Share one in-flight call between concurrent identical requests"""
+
+    def __init__(self, executor):
+        self.executor = executor
+        self._in_flight = {}
+
+        # Counters
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key, func, *args):
+        future = self._in_flight.get(key)
+        if future is None:
+            self.calls += 1
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, func, *args)
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shield so one disconnecting client doesn't cancel the call others wait on
+        return await asyncio.shield(future)
+
+
+class CreateQuizRequest(BaseModel):
+    topic: str = Field(min_length=1, max_length=200)
+    difficulty: Literal[tuple(DIFFICULTY_LEVELS)] = "Medium"
+    num_questions: int = Field(5, ge=1, le=500)
+    player: str = Field("anonymous", min_length=1, max_length=64)
+
+
+class AnswerRequest(BaseModel):
+    question_index: int = Field(ge=0)
+    choice: int = Field(ge=0, le=3)
+    # Measured by the client; otherwise the time since the previous answer
+    response_ms: Optional[int] = Field(None, ge=0, le=MAX_RESPONSE_MS)
+
+
+executor = ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix="quiz-server")
+coalescer = RequestCoalescer(executor)
+bank = QuestionBank()
+generator = QuizGenerator(bank=bank)
+# Refill requests for catalog_warmer, which runs as its own process
+warm_queue = WarmJobQueue()
+questions_by_id = SharedQuestionCache(bank)
+sessions = ShardedSessionStore(idle_timeout=SESSION_IDLE_TIMEOUT)
+# Free-text topics are mapped onto known ones so they share cache and bank entries
+topic_index = TopicIndex.from_bank(bank, max_topics=MAX_INDEXED_TOPICS)
+# (question_id, choice, correct_index, quiz_id) per answer since the last flush
+pending_answers = []
+# Every answer, for player and question history; the Tk app keeps its own
+history = PlayHistory(SERVER_HISTORY_DIR)
+# Updated on every correct answer; earlier results are loaded from history at startup
+leaderboards = LeaderboardSet()
+# Set when loading history failed, so boards that would be incomplete aren't served
+leaderboards_error = None
+SERVER_STARTED = time.time()
+
+app = FastAPI(title="Quiz Service")
+
+metrics.enable()
+
+
+async def expire_sessions():
+    # Sweep a few shards at a time so expiry never stalls the loop
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        sessions.expire_idle(max_shards=8)
+
+
+def update_question_stats(answers):
+    question_ids, choices, correct, quiz_ids = zip(*answers)
+    stats = grading.item_statistics(question_ids, choices, correct, quiz_ids)
+    return grading.apply_to_bank(bank, stats)
+
+
+async def flush_answer_stats():
+    global pending_answers
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(ANALYTICS_INTERVAL)
+        if not pending_answers:
+            continue
+        answers, pending_answers = pending_answers, []
+        await loop.run_in_executor(executor, update_question_stats, answers)
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    loop = asyncio.get_running_loop()
+    loop.create_task(expire_sessions())
+    if grading.np is not None:
+        loop.create_task(flush_answer_stats())
+    # Quizzes from before this start are only in the history; loaded before
+    # serving so the boards are never partial
+    global leaderboards_error
+    try:
+        await loop.run_in_executor(executor, leaderboards.load_history, history, SERVER_STARTED)
+    except Exception as e:
+        print(f"error loading leaderboards from history {e}")
+        metrics.increment("leaderboards.load_errors")
+        leaderboards_error = str(e)
+
+
+@app.on_event("shutdown")
+async def close_history():
+    await asyncio.get_running_loop().run_in_executor(executor, history.close)
+
+
+def public_question(question, index):
+    """Question as sent to players, without the answer"""
+    return {
+        "index": index,
+        "question": question["question"],
+        "options": question["options"],
+    }
+
+
+def get_session(quiz_id):
+    session = sessions.get(quiz_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    return session
+
+
+def session_question(session, index):
+    if not 0 <= index < len(session):
+        raise HTTPException(status_code=404, detail="Question not found")
+    question = questions_by_id.get(session.question_ids[index])
+    if question is None:
+        raise HTTPException(status_code=410, detail="Question no longer available")
+    return question
+
+
+async def load_questions(topic, difficulty, num_questions):
+    loop = asyncio.get_running_loop()
+    stock = await loop.run_in_executor(executor, bank.count, topic, difficulty)
+    if stock >= min_bank_stock(topic, num_questions):
+        return await loop.run_in_executor(executor, bank.sample, num_questions, topic, difficulty)
+    if catalog_topic(topic) is not None:
+        # Only a cold bank gets here; have the warmer refill this slot first
+        await loop.run_in_executor(executor, warm_queue.enqueue, topic, difficulty, 1)
+
+    key = QuestionCache.make_key(topic, difficulty, num_questions)
+    try:
+        questions = await coalescer.run(
+            key, generator.generate_questions, topic, difficulty, num_questions, False
+        )
+    except Exception:
+        raise HTTPException(status_code=503, detail="Question generation failed")
+
+    # Older cache entries predate bank ids
+    missing = [q for q in questions if "id" not in q]
+    if missing:
+        ids = await loop.run_in_executor(executor, bank.add_questions, missing, topic, difficulty)
+        for q, question_id in zip(missing, ids):
+            q["id"] = question_id
+    return questions
+
+
+@app.post("/quizzes", status_code=201)
+async def create_quiz(request: CreateQuizRequest):
+    loop = asyncio.get_running_loop()
+    topic = await loop.run_in_executor(executor, topic_index.resolve, request.topic)
+    questions = await load_questions(topic, request.difficulty, request.num_questions)
+    if not questions:
+        raise HTTPException(status_code=503, detail="No questions generated")
+    # Only now that it has questions can other spellings be mapped onto it
+    await loop.run_in_executor(executor, topic_index.add, topic)
+
+    # Sessions only keep bank ids, the question dicts are shared
+    questions_by_id.put(questions)
+    question_ids = [q["id"] for q in questions]
+    random.shuffle(question_ids)
+
+    session = sessions.create(topic, request.difficulty, question_ids, request.player)
+    return {
+        "quiz_id": session.id,
+        "player": session.player,
+        "topic": session.topic,
+        "difficulty": session.difficulty,
+        "num_questions": len(session),
+    }
+
+
+@app.get("/quizzes/{quiz_id}")
+async def get_quiz(quiz_id: str):
+    session = get_session(quiz_id)
+    return {
+        "quiz_id": session.id,
+        "player": session.player,
+        "topic": session.topic,
+        "difficulty": session.difficulty,
+        "num_questions": len(session),
+        "answered": session.answered,
+        "score": session.score,
+    }
+
+
+@app.get("/quizzes/{quiz_id}/questions")
+async def list_questions(quiz_id: str):
+    session = get_session(quiz_id)
+    return [public_question(session_question(session, i), i) for i in range(len(session))]
+
+
+@app.get("/quizzes/{quiz_id}/questions/{index}")
+async def get_question(quiz_id: str, index: int):
+    session = get_session(quiz_id)
+    return public_question(session_question(session, index), index)
+
+
+@app.post("/quizzes/{quiz_id}/answers")
+async def submit_answer(quiz_id: str, answer: AnswerRequest):
+    session = get_session(quiz_id)
+    question = session_question(session, answer.question_index)
+    if session.is_answered(answer.question_index):
+        raise HTTPException(status_code=409, detail="Question already answered")
+
+    if answer.response_ms is not None:
+        response_time = answer.response_ms / 1000
+    else:
+        response_time = time.monotonic() - session.answered_at
+    correct = session.record_answer(answer.question_index, answer.choice, question["correct"])
+    history.record(
+        session.player, quiz_id_from_token(session.id), session.topic, session.difficulty,
+        question["id"], answer.choice, correct, response_time
+    )
+    if correct:
+        leaderboards.record(session.player, session.topic, session.difficulty,
+                            quiz_points(1, session.difficulty))
+    if grading.np is not None:
+        pending_answers.append((question["id"], answer.choice, question["correct"], session.id))
+    return {
+        "correct": correct,
+        "correct_index": question["correct"],
+        "score": session.score,
+        "answered": session.answered,
+    }
+
+
+@app.get("/quizzes/{quiz_id}/results")
+async def get_results(quiz_id: str):
+    session = get_session(quiz_id)
+    results = build_results(session.topic, session.difficulty, session.score, len(session))
+    results["answered"] = session.answered
+    results["complete"] = session.is_complete()
+    return results
+
+
+@app.get("/players/{player}/history")
+async def get_player_history(player: str, limit: int = 10):
+    loop = asyncio.get_running_loop()
+    quizzes = await loop.run_in_executor(executor, history.recent_quizzes, player, limit)
+    topics = await loop.run_in_executor(executor, history.player_topics, player)
+    return {"player": player, "quizzes": quizzes, "topics": topics}
+
+
+@app.get("/questions/{question_id}/history")
+async def get_question_history(question_id: int):
+    summary = await asyncio.get_running_loop().run_in_executor(executor, history.question_history, question_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Question has no recorded answers")
+    return summary
+
+
+def require_leaderboards():
+    if leaderboards_error is not None:
+        raise HTTPException(status_code=503, detail="Leaderboards are unavailable")
+
+
+@app.get("/leaderboards")
+async def get_leaderboard(scope: str = "global", key: str = "", window: str = "all", k: int = 10):
+    require_leaderboards()
+    try:
+        return leaderboards.top(min(max(k, 1), 100), scope, key, window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/leaderboards/players/{player}")
+async def get_player_standing(player: str, scope: str = "global", key: str = "", window: str = "all"):
+    require_leaderboards()
+    try:
+        standing = leaderboards.rank(player, scope, key, window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if standing is None:
+        raise HTTPException(status_code=404, detail="Player has no points on this leaderboard")
+    standing["neighbours"] = leaderboards.around(player, 2, scope, key, window)
+    return standing
+
+
+@app.get("/stats")
+async def get_stats():
+    stats = {
+        "sessions": len(sessions),
+        "sessions_expired": sessions.expired,
+        "generation_calls": coalescer.calls,
+        "coalesced_requests": coalescer.coalesced,
+    }
+    if generator.cache is not None:
+        stats["cache"] = generator.cache.stats()
+    if hasattr(generator.backend, "stats"):
+        stats["backend"] = generator.backend.stats()
+    stats["degraded_quizzes"] = generator.degraded
+    stats["topics"] = topic_index.stats()
+    stats["history"] = history.stats()
+    stats["leaderboards"] = leaderboards.stats()
+    return stats
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    return metrics.export_prometheus()
@@ -0,0 +1,144 @@
+import time
+import tkinter as tk
+from collections import deque
+
+import metrics
+
+BG_COLOR = "#f0f0f0"
+CORRECT_COLOR = "#c8e6c9"
+WRONG_COLOR = "#ffcdd2"
+
+
+class OptionPool:
+    """Pool of option radio buttons reconfigured in place for every question
+
+    Buttons are only created when a question has more options than any
+    question before it; otherwise existing ones are retargeted and the
+    extras hidden, so moving to the next question allocates no widgets.
+    """
+
+    def __init__(self, parent, variable, wraplength=500):
+        self.parent = parent
+        self.variable = variable
+        self.wraplength = wraplength
+        self.buttons = []
+        self.visible = 0
+
+    def _create_button(self):
+        return tk.Radiobutton(
+            self.parent,
+            variable=self.variable,
+            font=("Arial", 11),
+            bg=BG_COLOR,
+            fg="#333",
+            selectcolor="#e8e8e8",
+            anchor="w",
+            wraplength=self.wraplength,
+            justify="left"
+        )
+
+    def show(self, options):
+        """Display `options`, reusing the pooled buttons"""
+        while len(self.buttons) < len(options):
+            self.buttons.append(self._create_button())
+
+        for i, option in enumerate(options):
+            button = self.buttons[i]
+            button.config(text=option, value=i, state="normal", bg=BG_COLOR)
+            if i >= self.visible:
+                button.pack(anchor="w", pady=5, fill="x")
+
+        # Hide buttons left over from a question with more options
+        for button in self.buttons[len(options):self.visible]:
+            button.pack_forget()
+        self.visible = len(options)
+
+    def mark(self, correct_index, selected_index):
+        """Highlight the right answer and a wrong pick, and lock the options"""
+        for i in range(self.visible):
+            button = self.buttons[i]
+            if i == correct_index:
+                button.config(bg=CORRECT_COLOR)
+            elif i == selected_index:
+                button.config(bg=WRONG_COLOR)
+            button.config(state="disabled")
+
+
+class FeedbackLabel(tk.Label):
+    """Inline correct/wrong message shown under the options instead of a dialog"""
+
+    def __init__(self, parent, **kwargs):
+        super().__init__(
+            parent,
+            text="",
+            font=("Arial", 12, "bold"),
+            bg=BG_COLOR,
+            **kwargs
+        )
+
+    def correct(self):
+        self.config(text="Correct! ✓", fg="#2e7d32")
+
+    def wrong(self, correct_text):
+        self.config(text=f"Wrong! ✗  Correct answer: {correct_text}", fg="#c62828")
+
+    def warn(self, message):
+        self.config(text=message, fg="#ef6c00")
+
+    def clear(self):
+        self.config(text="")
+
+
+class TransitionTimer:
+    """Record how long each question transition takes to render
+
+    `update` is the time spent reconfiguring widgets and `idle` the time
+    until Tk has processed the resulting layout work, measured from the
+    same start. The last `max_samples` transitions are kept, and every
+    sample is also reported to metrics under `name`.
+    """
+
+    def __init__(self, widget, max_samples=1000, name="ui.transition"):
+        self.widget = widget
+        self.name = name
+        self.update_samples = deque(maxlen=max_samples)
+        self.idle_samples = deque(maxlen=max_samples)
+        self._start = None
+
+    def start(self):
+        self._start = time.perf_counter()
+
+    def stop(self):
+        if self._start is None:
+            return
+        start = self._start
+        self._start = None
+        elapsed = time.perf_counter() - start
+        self.update_samples.append(elapsed)
+        metrics.observe(self.name + ".update", elapsed)
+        self.widget.after_idle(lambda: self._record_idle(start))
+
+    def _record_idle(self, start):
+        elapsed = time.perf_counter() - start
+        self.idle_samples.append(elapsed)
+        metrics.observe(self.name + ".idle", elapsed)
+
+    @staticmethod
+    def _summarize(samples):
+        if not samples:
+            return {"count": 0}
+        ordered = sorted(samples)
+        n = len(ordered)
+        return {
+            "count": n,
+            "mean_ms": sum(ordered) / n * 1000,
+            "p50_ms": ordered[n // 2] * 1000,
+            "p95_ms": ordered[min(n - 1, int(n * 0.95))] * 1000,
+            "max_ms": ordered[-1] * 1000,
+        }
+
+    def summary(self):
+        return {
+            "update": self._summarize(self.update_samples),
+            "idle": self._summarize(self.idle_samples),
+        }
@@ -1,43 +1,54 @@
 import tkinter as tk
 from tkinter import messagebox
 import random
+from question_bank import QuestionBank
+from quiz_widgets import FeedbackLabel, OptionPool, TransitionTimer
+
+STARTER_TOPIC = "General Knowledge"
+STARTER_DIFFICULTY = "Easy"
+
+STARTER_QUESTIONS = [
+    {
+        "question": "What is the capital of France?",
+        "options": ["London", "Berlin", "Paris", "Madrid"],
+        "correct": 2
+    },
+    {
+        "question": "Which programming language is known for its simplicity?",
+        "options": ["C++", "Python", "Assembly", "Java"],
+        "correct": 1
+    },
+    {
+        "question": "What is 2 + 2?",
+        "options": ["3", "4", "5", "6"],
+        "correct": 1
+    },
+    {
+        "question": "Which planet is closest to the Sun?",
+        "options": ["Venus", "Mercury", "Earth", "Mars"],
+        "correct": 1
+    },
+    {
+        "question": "What does HTML stand for?",
+        "options": ["Hyper Text Markup Language", "Home Tool Markup Language", 
+                  "Hyperlinks and Text Markup Language", "Hyperlinking Text Marking Language"],
+        "correct": 0
+    }
+]
 
 
 class QuizGame:
-    def __init__(self, root):
+    def __init__(self, root, bank=None, num_questions=5):
         self.root = root
         self.root.title("quiz app")
-        self.root.geometry("600x400")
+        self.root.geometry("600x460")
         self.root.configure(bg="#f0f0f0")
 
-        self.questions = [
-            {
-                "question": "What is the capital of France?",
-                "options": ["London", "Berlin", "Paris", "Madrid"],
-                "correct": 2
-            },
-            {
-                "question": "Which programming language is known for its simplicity?",
-                "options": ["C++", "Python", "Assembly", "Java"],
-                "correct": 1
-            },
-            {
-                "question": "What is 2 + 2?",
-                "options": ["3", "4", "5", "6"],
-                "correct": 1
-            },
-            {
-                "question": "Which planet is closest to the Sun?",
-                "options": ["Venus", "Mercury", "Earth", "Mars"],
-                "correct": 1
-            },
-            {
-                "question": "What does HTML stand for?",
-                "options": ["Hyper Text Markup Language", "Home Tool Markup Language", 
-                          "Hyperlinks and Text Markup Language", "Hyperlinking Text Marking Language"],
-                "correct": 0
-            }
-        ]
+        # Questions come from the shared question bank
+        self.bank = bank if bank is not None else QuestionBank()
+        if self.bank.count(STARTER_TOPIC) == 0:
+            self.bank.add_questions(STARTER_QUESTIONS, STARTER_TOPIC, STARTER_DIFFICULTY, source="starter")
+        self.questions = self.bank.sample(num_questions, STARTER_TOPIC)
 
         random.shuffle(self.questions)
 
@@ -89,10 +100,17 @@ class QuizGame:
         # Options frame
         
         self.option_frame = tk.Frame(self.root, bg="#f0f0f0")
-        self.option_frame.pack(pady= 20, padx=40, fill='x')
+        self.option_frame.pack(pady= (20, 5), padx=40, fill='x')
+
+        # Radio buttons for options (reused for every question)
+        self.option_pool = OptionPool(self.option_frame, self.selected_option, wraplength=400)
 
-        # Radio buttons for options (will be created dynamically)
-        self.option_buttons = []
+        # Inline answer feedback
+        self.feedback_label = FeedbackLabel(self.root, wraplength=500)
+        self.feedback_label.pack(pady=5)
+
+        # Per-transition render timings
+        self.render_timings = TransitionTimer(self.root)
 
         # Buttons frame
         button_frame = tk.Frame(
@@ -100,7 +118,7 @@ class QuizGame:
             bg = "#f0f0f0"
         )
 
-        button_frame.pack(pady= 30)
+        button_frame.pack(pady= 20)
 
         # Submit button
         self.submit_btn = tk.Button(
@@ -143,13 +161,11 @@ class QuizGame:
 
 
     def load_questions(self):
-        # Clear previous options
-        for button in self.option_buttons:
-            button.destroy()
-        self.option_buttons.clear()
+        self.render_timings.start()
 
-        # Reset selection
+        # Reset selection and feedback
         self.selected_option.set(-1)
+        self.feedback_label.clear()
         
         # Update progress
         self.progress_label.config(
@@ -160,33 +176,20 @@ class QuizGame:
         question_data = self.questions[self.current_question]
         self.questions_label.config(text=question_data["question"])
         
-        # Create option buttons
-        for i, option in enumerate(question_data["options"]):
-            rb = tk.Radiobutton(
-                self.option_frame,
-                text=option,
-                variable=self.selected_option,
-                value=i,
-                font=("Arial", 11),
-                bg="#f0f0f0",
-                fg="#333",
-                selectcolor="#e8e8e8",
-                anchor="w",
-                wraplength=400,
-                justify="left"
-            )
-            rb.pack(anchor="w", pady=5, fill="x")
-            self.option_buttons.append(rb)
+        # Reconfigure the pooled option buttons
+        self.option_pool.show(question_data["options"])
         
         # Show submit button, hide next button
         self.submit_btn.pack(side="left", padx=10)
         self.next_btn.pack_forget()
+
+        self.render_timings.stop()
         
 
     def submit_answer(self):
         # validation
         if self.selected_option.get() == -1:
-            messagebox.showwarning("Warning", "Please select an answer!")
+            self.feedback_label.warn("Please select an answer!")
             return
         
         # check if answer selected is correct
@@ -196,10 +199,11 @@ class QuizGame:
 
         if option_selected == correct_answer :
             self.score+=1
-            messagebox.showinfo("Result", "Correct! ✓")
+            self.feedback_label.correct()
         else:
             correct_text = question_data["options"][correct_answer]
-            messagebox.showinfo("Result", f"Wrong! ✗\nCorrect answer: {correct_text}")
+            self.feedback_label.wrong(correct_text)
+        self.option_pool.mark(correct_answer, option_selected)
         
         # update score display
         self.score_label.config(text=f"Score: {self.score}/{len(self.questions)}")
@@ -248,7 +252,7 @@ Would you like to play again?
     def restart_quiz(self):
         self.current_question = 0
         self.score = 0
-        random.shuffle(self.questions)
+        self.questions = self.bank.sample(len(self.questions), STARTER_TOPIC)
         self.score_label.config(text=f"Score: {self.score}/{len(self.questions)}")
         self.load_questions()
 
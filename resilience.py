@@ -0,0 +1,341 @@
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import metrics
+from llm_backends import BackendError, LLMBackend
+
+
+_END_OF_STREAM = object()
+
+
+class DeadlineExceeded(BackendError):
+    """The call did not finish within its deadline"""
+
+
+class CircuitOpenError(BackendError):
+    """The upstream is marked unhealthy and calls are being refused"""
+
+
+class Deadline:
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+
+def backoff_delay(attempt, base=0.5, cap=8.0, rng=random):
+    """Exponential backoff with full jitter for retry number `attempt` (0-based)"""
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Stop calling an upstream after repeated failures
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    allow() refuses calls. Once `reset_timeout` seconds have passed one
+    trial call is let through (half-open): success closes the circuit,
+    failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+        # Counters
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_running = False
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            return False
+
+    def available(self):
+        """Whether a call would currently be allowed, without claiming the trial"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            return not self._trial_running
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_running = False
+
+    def release_trial(self):
+        """Let another half-open trial through without recording an outcome"""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                    metrics.increment("resilience.circuit_opened")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._trial_running = False
+
+
+class LatencyTracker:
+    """Recent successful call latencies, for picking the hedging delay"""
+
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, q):
+        with self._lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def __len__(self):
+        return len(self.samples)
+
+
+class ResilientBackend(LLMBackend):
+    """Deadlines, hedging, retries and a circuit breaker around another backend
+
+    Every generate() call gets `deadline` seconds in total. If a request
+    is still running once the p95 of recent latencies has passed, a
+    duplicate is sent and whichever finishes first wins. Failures are
+    retried with jittered exponential backoff while the deadline allows,
+    and consecutive failures open the circuit breaker so callers can
+    serve stored questions instead of waiting on an unhealthy upstream.
+    Streams go through the breaker and the deadline, without hedging or
+    retries.
+    """
+
+    def __init__(self, backend, deadline=30.0, max_attempts=3, hedge=True,
+                 initial_hedge_delay=10.0, min_hedge_delay=1.0, min_samples=20,
+                 breaker=None, max_workers=8):
+        self.backend = backend
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.hedge = hedge
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = LatencyTracker()
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+        # Counters
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.retries = 0
+        self.deadlines_exceeded = 0
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    @property
+    def supports_json_mode(self):
+        return self.backend.supports_json_mode
+
+    @property
+    def wire_format(self):
+        return self.backend.wire_format
+
+    def available(self):
+        return self.breaker.available()
+
+    def hedge_delay(self):
+        if len(self.latencies) < self.min_samples:
+            return self.initial_hedge_delay
+        return max(self.min_hedge_delay, self.latencies.percentile(0.95))
+
+    def _get_executor(self):
+        from concurrent.futures import ThreadPoolExecutor
+        with self._executor_lock:
+            if self._executor is None:
+                # Abandoned calls past their deadline keep a worker busy until they return
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="quiz-hedge")
+            return self._executor
+
+    def _timed(self, func):
+        started = time.monotonic()
+        result = func()
+        self.latencies.add(time.monotonic() - started)
+        return result
+
+    def _call_hedged(self, func, deadline):
+        """Run func, sending a duplicate if it is slow; first success wins"""
+        from concurrent.futures import FIRST_COMPLETED, wait
+
+        executor = self._get_executor()
+        started = time.monotonic()
+        primary = executor.submit(self._timed, func)
+        pending = {primary}
+        hedge_at = started + self.hedge_delay() if self.hedge else None
+        error = None
+
+        while pending:
+            timeout = deadline.remaining()
+            if hedge_at is not None:
+                timeout = min(timeout, max(0.0, hedge_at - time.monotonic()))
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if future is not primary:
+                    self.hedge_wins += 1
+                    metrics.increment("resilience.hedge_wins")
+                return result
+
+            if deadline.expired():
+                self.deadlines_exceeded += 1
+                metrics.increment("resilience.deadline_exceeded")
+                raise DeadlineExceeded(f"No response within {self.deadline:g}s")
+
+            if hedge_at is not None and time.monotonic() >= hedge_at:
+                hedge_at = None
+                if pending:
+                    self.hedges += 1
+                    metrics.increment("resilience.hedges")
+                    pending.add(executor.submit(self._timed, func))
+
+        raise error
+
+    def generate(self, prompt, json_schema=None):
+        if not self.breaker.allow():
+            metrics.increment("resilience.circuit_rejected")
+            raise CircuitOpenError("Model backend is unavailable, try again shortly")
+
+        deadline = Deadline(self.deadline)
+        attempt = 0
+        while True:
+            try:
+                result = self._call_hedged(lambda: self.backend.generate(prompt, json_schema), deadline)
+            except DeadlineExceeded:
+                self.breaker.record_failure()
+                raise
+            except Exception:
+                self.breaker.record_failure()
+                attempt += 1
+                if attempt >= self.max_attempts or self.breaker.state != "closed":
+                    raise
+                delay = backoff_delay(attempt - 1)
+                if delay >= deadline.remaining():
+                    raise
+                self.retries += 1
+                metrics.increment("resilience.retries")
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def generate_stream(self, prompt, json_schema=None):
+        """Stream through the breaker within the same per-call deadline
+
+        The upstream stream is read on its own thread so a stalled read
+        can't outlive the deadline. A stream the caller closes early
+        counts as a success once any text has arrived.
+        """
+        if not self.breaker.allow():
+            metrics.increment("resilience.circuit_rejected")
+            raise CircuitOpenError("Model backend is unavailable, try again shortly")
+
+        deadline = Deadline(self.deadline)
+        chunks = queue.Queue()
+        stop = threading.Event()
+        threading.Thread(target=self._read_stream, args=(prompt, json_schema, chunks, stop),
+                         daemon=True, name="quiz-stream").start()
+
+        received = False
+        finished = False
+        failed = False
+        try:
+            while True:
+                try:
+                    chunk, error = chunks.get(timeout=deadline.remaining())
+                except queue.Empty:
+                    self.deadlines_exceeded += 1
+                    metrics.increment("resilience.deadline_exceeded")
+                    raise DeadlineExceeded(f"No complete response within {self.deadline:g}s")
+                if error is not None:
+                    raise error
+                if chunk is _END_OF_STREAM:
+                    finished = True
+                    break
+                received = True
+                yield chunk
+        except Exception:
+            failed = True
+            raise
+        finally:
+            stop.set()
+            if failed:
+                self.breaker.record_failure()
+            elif received or finished:
+                self.breaker.record_success()
+            else:
+                # Closed before anything arrived: no verdict, but free the half-open trial
+                self.breaker.release_trial()
+
+    def _read_stream(self, prompt, json_schema, chunks, stop):
+        stream = self.backend.generate_stream(prompt, json_schema)
+        try:
+            for chunk in stream:
+                if stop.is_set():
+                    return
+                chunks.put((chunk, None))
+        except Exception as e:
+            chunks.put((None, e))
+            return
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+        chunks.put((_END_OF_STREAM, None))
+
+    def stats(self):
+        return {
+            "breaker_state": self.breaker.state,
+            "breaker_opened": self.breaker.times_opened,
+            "breaker_rejected": self.breaker.rejected,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "retries": self.retries,
+            "deadlines_exceeded": self.deadlines_exceeded,
+            "hedge_delay": self.hedge_delay(),
+        }
@@ -0,0 +1,156 @@
+import secrets
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+UNANSWERED = -1
+
+
+class PlayerSession:
+    """Compact, UI-independent quiz state for one player
+
+    Questions are referenced by their question bank ids and answers are
+    kept in a byte array, so a session costs a few hundred bytes no matter
+    how many players share the same questions.
+    """
+
+    __slots__ = ("id", "player", "topic", "difficulty", "question_ids", "answers",
+                 "answered", "score", "last_seen", "answered_at")
+
+    def __init__(self, session_id, topic, difficulty, question_ids, player="anonymous"):
+        self.id = session_id
+        self.player = sys.intern(player)
+        # Interned so every session on the same topic shares one string
+        self.topic = sys.intern(topic)
+        self.difficulty = sys.intern(difficulty)
+        self.question_ids = array("q", question_ids)
+        self.answers = array("b", [UNANSWERED]) * len(question_ids)
+        self.answered = 0
+        self.score = 0
+        self.last_seen = time.monotonic()
+        # When the previous answer (or the quiz) arrived, for response times
+        self.answered_at = self.last_seen
+
+    def __len__(self):
+        return len(self.question_ids)
+
+    def is_answered(self, index):
+        return self.answers[index] != UNANSWERED
+
+    def record_answer(self, index, choice, correct_index):
+        """Store the answer to question `index` and return whether it was right"""
+        if self.answers[index] != UNANSWERED:
+            raise ValueError("Question already answered")
+        self.answers[index] = choice
+        self.answered += 1
+        self.answered_at = time.monotonic()
+        correct = choice == correct_index
+        if correct:
+            self.score += 1
+        return correct
+
+    def is_complete(self):
+        return self.answered == len(self.question_ids)
+
+
+class ShardedSessionStore:
+    """Sessions spread over independently locked shards with idle expiry
+
+    Locks are only taken to add, remove or expire sessions, and each one
+    covers a single shard, so concurrent players rarely contend. Lookups
+    are plain dict reads. expire_idle() sweeps a few shards per call so
+    expiry can run incrementally from a periodic task.
+    """
+
+    def __init__(self, num_shards=64, idle_timeout=30 * 60):
+        if num_shards & (num_shards - 1):
+            raise ValueError("num_shards must be a power of two")
+        self.num_shards = num_shards
+        self.idle_timeout = idle_timeout
+        self._shards = [{} for _ in range(num_shards)]
+        self._locks = [threading.Lock() for _ in range(num_shards)]
+        self._next_sweep = 0
+
+        # Counters
+        self.created = 0
+        self.expired = 0
+
+    def _shard_index(self, session_id):
+        return hash(session_id) & (self.num_shards - 1)
+
+    def create(self, topic, difficulty, question_ids, player="anonymous"):
+        session_id = secrets.token_hex(8)
+        session = PlayerSession(session_id, topic, difficulty, question_ids, player)
+        i = self._shard_index(session_id)
+        with self._locks[i]:
+            self._shards[i][session_id] = session
+            self.created += 1
+        return session
+
+    def get(self, session_id):
+        """Return the session and mark it active, or None if unknown or expired"""
+        session = self._shards[self._shard_index(session_id)].get(session_id)
+        if session is not None:
+            session.last_seen = time.monotonic()
+        return session
+
+    def remove(self, session_id):
+        i = self._shard_index(session_id)
+        with self._locks[i]:
+            return self._shards[i].pop(session_id, None)
+
+    def expire_idle(self, max_shards=None, now=None):
+        """Drop sessions idle for longer than idle_timeout; returns how many"""
+        if now is None:
+            now = time.monotonic()
+        cutoff = now - self.idle_timeout
+        count = self.num_shards if max_shards is None else min(max_shards, self.num_shards)
+        removed = 0
+
+        for _ in range(count):
+            i = self._next_sweep
+            self._next_sweep = (i + 1) % self.num_shards
+            with self._locks[i]:
+                shard = self._shards[i]
+                stale = [sid for sid, s in shard.items() if s.last_seen < cutoff]
+                for sid in stale:
+                    del shard[sid]
+                removed += len(stale)
+
+        self.expired += removed
+        return removed
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+
+class SharedQuestionCache:
+    """Bounded LRU of question dicts by bank id, shared by every session"""
+
+    def __init__(self, bank, max_items=100_000):
+        self.bank = bank
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, questions):
+        with self._lock:
+            for q in questions:
+                self._items[q["id"]] = q
+                self._items.move_to_end(q["id"])
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def get(self, question_id):
+        with self._lock:
+            q = self._items.get(question_id)
+            if q is not None:
+                self._items.move_to_end(question_id)
+                return q
+        found = self.bank.get([question_id])
+        if not found:
+            return None
+        self.put(found)
+        return found[0]
@@ -0,0 +1,277 @@
+"""Map free-text topics onto topics that already have cached or stored questions
+
+"python", "Python programming" and "python 3 basics" should all reuse
+the questions generated for one of them. A topic is first reduced to a
+key: accents, punctuation other than "+" and "#", version numbers and
+filler words like "basics" are dropped and synonyms are spelled out. Equal keys match
+straight away. Otherwise the nearest known topic by character n-gram
+TF-IDF cosine is taken, as long as it scores above the threshold and
+every content word on each side has a partner on the other, equal or a
+typo of it, so "java" never lands on "javascript", "art history" never
+lands on "history" and "germany" never lands on "german".
+"""
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from answer_checker import edit_distance, normalize_answer
+from catalog import CATALOG_TOPICS
+
+# Words that make a topic sound different without changing what it covers
+FILLER_WORDS = frozenset(
+    "basic basics beginner beginners intro introduction introductory fundamental "
+    "fundamentals essential essentials overview general concept concepts "
+    "principle principles programming language 101 for dummies and of to in on".split()
+)
+
+# Alternative spellings, abbreviations and aliases, applied to whole words or phrases
+SYNONYMS = {
+    "math": "mathematics",
+    "maths": "mathematics",
+    "py": "python",
+    "python3": "python",
+    "js": "javascript",
+    "ts": "typescript",
+    "cs": "computer science",
+    "ai": "artificial intelligence",
+    "ml": "machine learning",
+    "geo": "geography",
+    "lit": "literature",
+    "english literature": "literature",
+    "bio": "biology",
+    "chem": "chemistry",
+    "ww1": "world war i",
+    "wwi": "world war i",
+    "world war 1": "world war i",
+    "first world war": "world war i",
+    "ww2": "world war ii",
+    "wwii": "world war ii",
+    "world war 2": "world war ii",
+    "second world war": "world war ii",
+    "us": "united states",
+    "usa": "united states",
+    "uk": "united kingdom",
+    "cpp": "c++",
+    "c plus plus": "c++",
+    "csharp": "c#",
+    "c sharp": "c#",
+}
+
+# Low on purpose: a transposed letter costs a short word half its
+# trigrams, and the word rule below is what keeps matches precise
+DEFAULT_THRESHOLD = 0.25
+
+# Nearest neighbours checked against the word rule before giving up
+CANDIDATES = 5
+
+# IDF weights are recomputed once the index is this many times its size
+# at the last rebuild; until then new topics use the existing weights
+REBUILD_GROWTH = 2
+
+_VERSION = re.compile(r"^v?\d+(\.\d+)*$")
+_PHRASES = sorted((s for s in SYNONYMS if " " in s), key=len, reverse=True)
+
+
+def _stem(word):
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "ics")):
+        return word[:-1]
+    return word
+
+
+def _is_filler(word):
+    if word in FILLER_WORDS:
+        return True
+    # Misspelt filler such as "programing" or "fundamentls"
+    return len(word) >= 7 and any(
+        len(filler) >= 7 and edit_distance(word, filler, 1) <= 1 for filler in FILLER_WORDS
+    )
+
+
+def topic_key(topic):
+    """Normalized form of a topic; equal keys mean the same topic"""
+    text = f" {normalize_answer(topic, keep_symbols=True)} "
+    for phrase in _PHRASES:
+        text = text.replace(f" {phrase} ", f" {SYNONYMS[phrase]} ")
+    # A lone "+" or "#" isn't a word
+    words = " ".join(SYNONYMS.get(w, w) for w in text.split() if w.strip("+#")).split()
+    kept = [_stem(w) for w in words if not _is_filler(w) and not _VERSION.match(w)]
+    # "Programming" on its own is still a topic
+    return " ".join(kept or words)
+
+
+def char_ngrams(key, n=3):
+    padded = f" {key} "
+    return Counter(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def _transposed(a, b):
+    """Two neighbouring letters swapped, like pyhton for python"""
+    if len(a) != len(b):
+        return False
+    diffs = [i for i in range(len(a)) if a[i] != b[i]]
+    return len(diffs) == 2 and diffs[1] == diffs[0] + 1 and \
+        a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]]
+
+
+def words_match(a, b):
+    """Equal, or close enough to be a typo of each other
+
+    Short words must be equal, and so must the last letter, where a
+    different ending usually means a different word ("german", "germany").
+    """
+    if a == b:
+        return True
+    shortest = min(len(a), len(b))
+    if shortest < 5 or a[-1] != b[-1]:
+        return False
+    if _transposed(a, b):
+        return True
+    limit = 2 if shortest >= 8 else 1
+    return edit_distance(a, b, limit) <= limit
+
+
+def tidy_topic(topic):
+    return " ".join(str(topic).split())
+
+
+def covers(words, other_words):
+    return all(any(words_match(w, o) for o in other_words) for w in words)
+
+
+class TopicIndex:
+    """Nearest known topic for a free-text topic string
+
+    Known topics are kept as L2-normalized TF-IDF vectors over character
+    trigrams in an inverted index, so a lookup only scores topics
+    sharing an n-gram with the query. A new topic is added to the
+    postings straight away with the current IDF weights; the weights are
+    only recomputed once the index has grown by REBUILD_GROWTH times, so
+    adding costs O(1) amortized. With `max_topics`, topics past the limit
+    are still returned by add() but not indexed.
+    """
+
+    def __init__(self, topics=(), threshold=DEFAULT_THRESHOLD, max_topics=None):
+        self.threshold = threshold
+        self.max_topics = max_topics
+        self._lock = threading.Lock()
+        self._names = []
+        self._keys = []
+        self._grams = []
+        self._by_key = {}
+        self._df = Counter()
+        self._postings = {}
+        self._idf = {}
+        self._default_idf = 1.0
+        self._rebuilt_size = 0
+
+        # Counters
+        self.exact = 0
+        self.fuzzy = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.refused = 0
+
+        with self._lock:
+            for topic in topics:
+                self._add(topic, index=False)
+            self._rebuild()
+
+    @classmethod
+    def from_bank(cls, bank, threshold=DEFAULT_THRESHOLD, max_topics=None):
+        """Index of the catalog topics plus every topic in the bank"""
+        return cls(CATALOG_TOPICS + bank.topics(), threshold, max_topics)
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, topic):
+        """Register `topic` unless its key is already known; returns the stored name"""
+        with self._lock:
+            return self._add(topic)
+
+    def _add(self, topic, index=True):
+        # Called with self._lock held
+        key = topic_key(topic)
+        if key in self._by_key:
+            return self._names[self._by_key[key]]
+        name = tidy_topic(topic)
+        if self.max_topics is not None and len(self._names) >= self.max_topics:
+            self.refused += 1
+            return name
+        self._by_key[key] = len(self._names)
+        self._names.append(name)
+        self._keys.append(key)
+        grams = char_ngrams(key)
+        self._grams.append(grams)
+        self._df.update(grams.keys())
+        if index:
+            if len(self._names) >= REBUILD_GROWTH * self._rebuilt_size:
+                self._rebuild()
+            else:
+                self._index(len(self._names) - 1)
+        return name
+
+    def _weights(self, grams):
+        vector = {g: tf * self._idf.get(g, self._default_idf) for g, tf in grams.items()}
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        return {g: w / norm for g, w in vector.items()}
+
+    def _index(self, i):
+        for g, w in self._weights(self._grams[i]).items():
+            self._postings.setdefault(g, []).append((i, w))
+
+    def _rebuild(self):
+        total = len(self._grams)
+        self._idf = {g: math.log((1 + total) / (1 + n)) + 1 for g, n in self._df.items()}
+        self._default_idf = math.log(1 + total) + 1
+        self._postings = {}
+        for i in range(total):
+            self._index(i)
+        self._rebuilt_size = total
+        self.rebuilds += 1
+
+    def lookup(self, topic):
+        """(known topic, similarity) for the best match, or None"""
+        key = topic_key(topic)
+        with self._lock:
+            i = self._by_key.get(key)
+            if i is not None:
+                self.exact += 1
+                return self._names[i], 1.0
+
+            query = self._weights(char_ngrams(key))
+            scores = defaultdict(float)
+            for g, w in query.items():
+                for i, weight in self._postings.get(g, ()):
+                    scores[i] += w * weight
+
+            words = key.split()
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:CANDIDATES]
+            for i, score in best:
+                if score < self.threshold:
+                    break
+                other = self._keys[i].split()
+                if covers(words, other) and covers(other, words):
+                    self.fuzzy += 1
+                    return self._names[i], score
+            self.misses += 1
+        return None
+
+    def resolve(self, topic):
+        """The known topic `topic` refers to, or `topic` tidied up; never registers it"""
+        match = self.lookup(topic)
+        if match is not None:
+            return match[0]
+        return tidy_topic(topic)
+
+    def canonical(self, topic):
+        """The known topic `topic` refers to, registering it if it is new"""
+        match = self.lookup(topic)
+        if match is not None:
+            return match[0]
+        return self.add(topic)
+
+    def stats(self):
+        return {"topics": len(self), "exact": self.exact, "fuzzy": self.fuzzy, "misses": self.misses,
+                "rebuilds": self.rebuilds, "refused": self.refused}